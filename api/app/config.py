@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic import Field, AliasChoices
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -27,7 +28,43 @@ class Settings(BaseSettings):
         validation_alias=AliasChoices("OLLAMA_BASE_URL", "api_base", "OLLAMA_HOST"), 
     )
 
+    # varios endpoints do Ollama com o mesmo modelo (JSON: ["http://a:11434", "http://b:11434"]);
+    # cada exec roda no que tiver menos execs em andamento. Vazio usa OLLAMA_BASE_URL
+    OLLAMA_BASE_URLS: list[str] = Field(default_factory=list)
+    OLLAMA_KEEP_ALIVE: str = "30m"  # quanto tempo o Ollama mantem o modelo carregado apos o preload
+    OLLAMA_PRELOAD: bool = True  # carrega o modelo em cada endpoint no startup da API
+    OLLAMA_KEEPALIVE_INTERVAL_SECONDS: float = 600  # renova o preload enquanto a API roda; 0 desativa
+
     ALLOW_ORIGINS: list[str] = Field(default_factory=lambda: ["http://localhost:3000"])
 
+    # armazenamento das execucoes: "sqlite" (duravel, compartilhado entre workers) ou "memory" (testes)
+    RUN_STORE_BACKEND: Literal["sqlite", "memory"] = "sqlite"
+    RUN_STORE_PATH: str = ".data/runs.sqlite3"
+    RUN_RETENTION_HOURS: float = 72  # execs finalizadas mais antigas que isso sao removidas
+    RUN_STORE_MAX_RUNS: int = 10000  # limite de execs guardadas (remove as finalizadas mais antigas)
+
+    # agendamento das execs
+    MAX_CONCURRENT_RUNS: int = 2  # crews rodando ao mesmo tempo (contra o mesmo backend LLM)
+    MAX_QUEUED_RUNS: int = 50  # execs esperando na fila; acima disso POST /runs retorna 429
+    MAX_BATCH_QUEUED_RUNS: int = 1000  # execs de lotes esperando (somando todos os lotes)
+    MAX_BATCH_TOPICS: int = 500  # topics por POST /runs/batch
+    SHUTDOWN_DRAIN_SECONDS: float = 30  # tempo para drenar a fila no shutdown
+    RUN_TIMEOUT_SECONDS: float = 1800  # prazo de cada exec (a partir do inicio); 0 desativa
+    # cancela a exec quando o ultimo cliente SSE (deste processo) desconecta e nao volta dentro da folga
+    # (exec compartilhada com pedidos coalescidos/lotes: so desvincula o cliente do stream)
+    AUTO_CANCEL_ON_DISCONNECT: bool = False
+    AUTO_CANCEL_GRACE_SECONDS: float = 15  # cobre a reconexao automatica do EventSource
+
+    # memoizacao: topic igual (mesmo modelo e config da crew) reaproveita o resultado por esse tempo
+    RESULT_CACHE_TTL_HOURS: float = 24  # 0 desativa
+
+    # minimo de palavras no corpo do artigo; abaixo disso o editor expande o texto
+    MIN_BODY_WORDS: int = 300
+    # paginas do Wikipedia lidas em paralelo antes do pesquisador (o material entra na research_task); 0 desativa
+    RESEARCH_PREFETCH_PAGES: int = Field(default=3, ge=0, le=10)
+
+    def ollama_endpoints(self) -> list[str]:
+        return self.OLLAMA_BASE_URLS or [self.OLLAMA_BASE_URL]
+
 #carregar as configurações
 settings = Settings()
@@ -1,9 +1,72 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI  
 from fastapi.middleware.cors import CORSMiddleware  
+from content_creation_crew.ollama import close_http_client
+from content_creation_crew.tools.wiki_async import close_async_clients
 from .config import settings  
-from .routers import runs, stream  
+from .routers import batches, metrics, runs, stream  
+from .services.runner import drain_runs
+from .services.scheduler import SCHEDULER
 
-app = FastAPI(title="Crew Content API")  
+logger = logging.getLogger(__name__)
+
+
+def _warm_crew() -> None:
+    """
+    Importa o CrewAI e monta a crew uma vez no startup (tira a latencia da primeira exec)
+    """
+    try:
+        from content_creation_crew.factory import configure_crew_factory, get_crew_factory
+        configure_crew_factory(
+            settings.MODEL_ID, settings.ollama_endpoints(), settings.OLLAMA_KEEP_ALIVE,
+            prefetch_pages=settings.RESEARCH_PREFETCH_PAGES,
+        )
+        get_crew_factory().warm()
+    except Exception:
+        logger.exception("crew warm-up failed; runs will build it on demand")
+
+
+async def _keep_model_resident() -> None:
+    """
+    Carrega o modelo nos endpoints do Ollama (sem bloquear o startup) e renova o keep-alive
+    a cada OLLAMA_KEEPALIVE_INTERVAL_SECONDS: a primeira exec apos um periodo ocioso nao paga o load
+    """
+    from content_creation_crew.factory import get_crew_factory
+
+    while True:
+        try:
+            # erro de config/factory fica no log (a tarefa tenta de novo no proximo intervalo)
+            pool = (await asyncio.to_thread(get_crew_factory)).pool
+            if pool is None:
+                return
+            await asyncio.to_thread(pool.preload)
+        except Exception:
+            logger.exception("ollama preload failed")
+        if settings.OLLAMA_KEEPALIVE_INTERVAL_SECONDS <= 0:
+            return
+        await asyncio.sleep(settings.OLLAMA_KEEPALIVE_INTERVAL_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ciclo de vida da API: aquece a crew, carrega o modelo no Ollama e sobe o pool de execs;
+    no shutdown drena a fila e fecha os pools HTTP (Ollama e Wikipedia)
+    """
+    await asyncio.to_thread(_warm_crew)
+    keep_alive = asyncio.get_running_loop().create_task(_keep_model_resident()) if settings.OLLAMA_PRELOAD else None
+    SCHEDULER.start()
+    yield
+    if keep_alive is not None:
+        keep_alive.cancel()
+    await asyncio.to_thread(drain_runs, settings.SHUTDOWN_DRAIN_SECONDS)
+    close_http_client()
+    await close_async_clients()
+
+
+app = FastAPI(title="Crew Content API", lifespan=lifespan)  
 
 # CORS para o front-end
 app.add_middleware(
@@ -15,5 +78,7 @@ app.add_middleware(
 )
 
 # routers depois que a instancia do app foi criada
+app.include_router(batches.router)  # antes de runs: /runs/batch nao pode cair em /runs/{run_id}
 app.include_router(runs.router)  
 app.include_router(stream.router)  
+app.include_router(metrics.router)  
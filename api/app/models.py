@@ -1,5 +1,25 @@
-from pydantic import BaseModel
-from typing import Literal, Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, Dict, List, Literal, Optional
+
+# agentes cuja config de LLM pode ser sobrescrita por exec
+AgentName = Literal["researcher", "writer", "editor"]
+
+#LLM de um agente
+class AgentLLMSettings(BaseModel):
+    """
+    Sobrescreve o `llm_settings` do agente no agents.yaml (campos vazios mantem o do YAML)
+
+    """
+    model: Optional[str] = None  # ex: "ollama/llama3.2:3b" (somente modelos do Ollama)
+    context_window: Optional[int] = Field(default=None, ge=1024)  # num_ctx do Ollama
+    max_tokens: Optional[int] = Field(default=None, ge=1)  # limite de cada resposta
+
+    @field_validator("model")
+    @classmethod
+    def _ollama_only(cls, v: Optional[str]) -> Optional[str]:
+        if v is not None and not v.startswith(("ollama/", "ollama_chat/")):
+            raise ValueError("model must be an Ollama model (ollama/<name>)")
+        return v
 
 # request nova exec
 class RunRequest(BaseModel):
@@ -9,6 +29,28 @@ class RunRequest(BaseModel):
     """
     topic: str  #assunto
     use_wikipedia: bool = True  # Wikipedia usada como fonte
+    force_refresh: bool = False  # ignora resultados em cache e execs iguais em andamento
+    # LLM por agente (ex: modelo menor para o researcher); entra na chave do cache de resultados
+    agent_models: Dict[AgentName, AgentLLMSettings] = Field(default_factory=dict)
+
+    def agent_overrides(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Overrides nao vazios por agente, no formato do `llm_settings`
+        """
+        out = {name: s.model_dump(exclude_none=True) for name, s in self.agent_models.items()}
+        return {name: s for name, s in out.items() if s}
+
+# request de lote
+class BatchRequest(BaseModel):
+    """
+    Varios topics com as mesmas opcoes (uma exec por topic)
+
+    """
+    topics: List[str] = Field(min_length=1)
+    use_wikipedia: bool = True
+    force_refresh: bool = False
+    agent_models: Dict[AgentName, AgentLLMSettings] = Field(default_factory=dict)
+    warm_cache: bool = True  # aquece o cache do Wikipedia com a busca de cada topic antes das execs
 
 #status de exec
 class RunStatus(BaseModel):
@@ -17,8 +59,31 @@ class RunStatus(BaseModel):
 
     """
     run_id: str  #id da exec
-    status: Literal["queued", "running", "finished", "failed"] 
+    status: Literal["queued", "running", "finished", "failed", "cancelled"] 
+    step: Optional[str] = None  # etapa atual da crew (em "failed", a etapa em que parou)
+    queue_position: Optional[int] = None  # posicao na fila (1 = proxima) quando "queued"
     error: Optional[str] = None  # erro se houver
+    error_type: Optional[str] = None  # classe do erro (ex: "RunTimedOut", "ConnectionError")
+
+#exec de um lote
+class BatchRun(BaseModel):
+    run_id: str
+    topic: str
+    status: str  # status da exec ("unknown" se ja foi removida pela retencao)
+    step: Optional[str] = None
+    error: Optional[str] = None
+
+#status de lote
+class BatchStatus(BaseModel):
+    """
+    Estado agregado do lote
+
+    """
+    batch_id: str
+    total: int
+    counts: Dict[str, int] = Field(default_factory=dict)  # execs por status
+    done: bool = False  # todas as execs em status final
+    runs: List[BatchRun] = Field(default_factory=list)
 
 #resultado
 class RunResult(BaseModel):
@@ -28,3 +93,19 @@ class RunResult(BaseModel):
     """
     run_id: str  # Identificador único da execução.
     markdown: str  # O conteúdo gerado pela execução, formatado em Markdown.
+    word_count: Optional[int] = None  # palavras no corpo do artigo (medidas em Python)
+    partial: bool = False  # True enquanto roda: `markdown` e o artigo ainda em geracao pelo editor
+
+#trace
+class RunTrace(BaseModel):
+    """
+    Spans da exec (tasks, chamadas ao LLM, tools, requisicoes ao Wikipedia) e um resumo
+    de onde o tempo foi gasto
+
+    """
+    run_id: str
+    status: Optional[str] = None  # status atual da exec (None se nao existir)
+    spans: List[Dict[str, Any]] = Field(default_factory=list)  # id, parent, name, kind, start, duration_ms, attrs
+    dropped: int = 0  # spans descartados acima do limite por exec
+    attrs: Dict[str, Any] = Field(default_factory=dict)  # dados da exec inteira (ex: uso de tokens)
+    summary: Dict[str, Any] = Field(default_factory=dict)  # totais por tipo, task e agente + spans mais lentos
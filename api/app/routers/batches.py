@@ -0,0 +1,173 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from ..models import BatchRequest, BatchRun, BatchStatus, RunRequest
+from ..services.admission import admit_runs
+from ..services.runner import create_run_id, release_run
+from ..services.scheduler import QueueFull, SchedulerClosed
+from ..services.store import DB, FINAL_STATUSES
+from ..deps import SettingsDep
+
+logger = logging.getLogger(__name__)
+
+#router para lotes
+router = APIRouter(prefix="/runs/batch", tags=["batches"])
+
+# status do registro do lote enquanto alguma exec nao terminou (nao e final: a retencao nao o remove)
+BATCH_ACTIVE = "active"
+
+# intervalo entre consultas ao store no download com `wait=true`
+RESULTS_POLL_SECONDS = 2.0
+
+# aquecimentos do cache em andamento (referencia forte ate terminarem)
+_WARMUPS: set = set()
+
+
+async def _warm(topics: List[str]) -> None:
+    try:
+        from content_creation_crew.tools.wiki_warmup import warm_topics
+        stats = await warm_topics(topics)
+        logger.info("batch warm-up: %s", stats)
+    except Exception:
+        logger.exception("batch warm-up failed")
+
+
+def _load(batch_id: str) -> Dict[str, Any]:
+    data = DB.get(batch_id)
+    if not data or data.get("kind") != "batch":
+        raise HTTPException(status_code=404, detail="batch not found")
+    return data
+
+
+#novo lote
+@router.post("", response_model=dict)
+async def create_batch(req: BatchRequest, settings: SettingsDep = None):
+    """
+    Cria uma exec por topic (mesmas opcoes para todas) e retorna o `batch_id`
+    As execs entram numa fila propria do lote no scheduler, atendida em rodizio com as
+    execs individuais e com outros lotes; topics repetidos ou ja em cache reaproveitam execs
+    Com a fila de lotes cheia nada e criado e a resposta e 429
+    """
+    topics = [t.strip() for t in req.topics]
+    if any(not t for t in topics):
+        raise HTTPException(status_code=422, detail="topics must not be blank")
+    if len(topics) > settings.MAX_BATCH_TOPICS:
+        raise HTTPException(status_code=413, detail=f"at most {settings.MAX_BATCH_TOPICS} topics per batch")
+
+    batch_id = create_run_id()
+    reqs = [
+        RunRequest(topic=t, use_wikipedia=req.use_wikipedia, force_refresh=req.force_refresh, agent_models=req.agent_models)
+        for t in topics
+    ]
+    try:
+        admitted = await asyncio.to_thread(
+            admit_runs, reqs, settings.MODEL_ID, f"batch:{batch_id}"
+        )
+    except (QueueFull, SchedulerClosed) as e:
+        raise HTTPException(status_code=429 if isinstance(e, QueueFull) else 503, detail=str(e), headers={"Retry-After": "60"})
+
+    # o estado do lote vem das execs; o registro fica "active" (fora da retencao do store) ate
+    # uma consulta ver todas as execs em status final
+    runs = [{"run_id": a["run_id"], "topic": t} for a, t in zip(admitted, topics)]
+    await asyncio.to_thread(DB.put, batch_id, {"kind": "batch", "status": BATCH_ACTIVE, "runs": runs})
+
+    fresh = [t for a, t in zip(admitted, topics) if not (a["cached"] or a["coalesced"])]
+    if req.use_wikipedia and req.warm_cache and fresh:
+        task = asyncio.get_running_loop().create_task(_warm(fresh))
+        _WARMUPS.add(task)
+        task.add_done_callback(_WARMUPS.discard)
+
+    return {
+        "batch_id": batch_id,
+        "total": len(runs),
+        "queued": len(fresh),
+        "reused": len(runs) - len(fresh),
+        "runs": [{**r, **{k: a[k] for k in ("cached", "coalesced")}} for r, a in zip(runs, admitted)],
+    }
+
+
+def _batch_status(batch_id: str, data: Dict[str, Any]) -> BatchStatus:
+    runs: List[BatchRun] = []
+    counts: Dict[str, int] = {}
+    for item in data["runs"]:
+        run = DB.get(item["run_id"]) or {}
+        status = run.get("status") or "unknown"
+        counts[status] = counts.get(status, 0) + 1
+        runs.append(BatchRun(
+            run_id=item["run_id"], topic=item["topic"], status=status,
+            step=run.get("step"), error=run.get("error"),
+        ))
+    done = all(r.status in FINAL_STATUSES or r.status == "unknown" for r in runs)
+    if done and data.get("status") == BATCH_ACTIVE:
+        DB.update(batch_id, status="finished")  # a partir daqui a retencao pode remover o lote
+    return BatchStatus(batch_id=batch_id, total=len(runs), counts=counts, done=done, runs=runs)
+
+
+#status do lote
+@router.get("/{batch_id}", response_model=BatchStatus)
+def get_batch(batch_id: str):
+    """
+    Estado agregado do lote: execs por status, se todas terminaram e o status de cada uma
+    """
+    return _batch_status(batch_id, _load(batch_id))
+
+
+#cancelamento do lote
+@router.delete("/{batch_id}", response_model=BatchStatus)
+def cancel_batch(batch_id: str):
+    """
+    Cancela as execs do lote que ainda nao terminaram (as da fila saem na hora); execs
+    compartilhadas com outros pedidos/lotes so deixam de contar com este lote
+    """
+    data = _load(batch_id)
+    for item in data["runs"]:
+        release_run(item["run_id"], "batch cancelled by client")
+    return _batch_status(batch_id, data)
+
+
+def _result_line(item: Dict[str, Any], run: Optional[Dict[str, Any]]) -> str:
+    run = run or {}
+    status = run.get("status") or "unknown"
+    line = {"run_id": item["run_id"], "topic": item["topic"], "status": status}
+    if status == "finished":
+        line.update(markdown=run.get("markdown", ""), word_count=run.get("word_count"))
+    elif run.get("error"):
+        line.update(error=run.get("error"), error_type=run.get("error_type"))
+    return json.dumps(line, ensure_ascii=False) + "\n"
+
+
+async def _results_iter(data: Dict[str, Any], wait: bool):
+    """
+    Uma linha JSON por exec; com `wait` as que ainda nao terminaram saem conforme terminam
+    """
+    pending = list(data["runs"])
+    while pending:
+        still = []
+        for item in pending:
+            run = await asyncio.to_thread(DB.get, item["run_id"])
+            if wait and run and run.get("status") not in FINAL_STATUSES:
+                still.append(item)
+                continue
+            yield _result_line(item, run)
+        pending = still
+        if pending:
+            await asyncio.sleep(RESULTS_POLL_SECONDS)
+
+
+#resultados do lote
+@router.get("/{batch_id}/results")
+async def batch_results(batch_id: str, wait: bool = False):
+    """
+    Download dos resultados em NDJSON (uma linha por topic, gerada sob demanda)
+    `markdown` para as execs finalizadas, `error` para as que falharam
+    Com `wait=true` o stream fica aberto e cada exec sai quando termina (ordem de conclusao)
+    """
+    data = await asyncio.to_thread(_load, batch_id)
+    return StreamingResponse(
+        _results_iter(data, wait),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="batch-{batch_id}.ndjson"'},
+    )
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..services.metrics import REGISTRY
+
+router = APIRouter(tags=["metrics"])
+
+# formato texto de exposicao do Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Metricas deste processo no formato do Prometheus: fila e execs em andamento,
+    duracao das execs, requisicoes ao Wikipedia, conexoes SSE e tamanho do store
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
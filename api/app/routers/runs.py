@@ -1,27 +1,28 @@
-from fastapi import APIRouter, BackgroundTasks
-from ..models import RunRequest, RunStatus, RunResult
-from ..services.runner import create_run_id, run_crew_sync
-from ..services.store import DB
+from fastapi import APIRouter, HTTPException, Response
+from ..models import RunRequest, RunStatus, RunResult, RunTrace
+from ..services.admission import admit_runs
+from ..services.runner import get_trace, reap_if_stale, release_run
+from ..services.scheduler import SCHEDULER, QueueFull, SchedulerClosed
+from ..services.store import DB, FINAL_STATUSES
 from ..deps import SettingsDep
 
 router = APIRouter(prefix="/runs", tags=["runs"])
 
 #nova execução
 @router.post("", response_model=dict)
-def create_run(req: RunRequest, bg: BackgroundTasks, settings: SettingsDep = None):
+def create_run(req: RunRequest, settings: SettingsDep = None):
     """
     Cria uma execucao para o processo de criação de conteúdo com base na pergunta do user (topic)
-    A exec fica na fila e a task e add para processamento
-    A execucao e colocada na fila e a tarefa e adicionada ao background para processamento
+    A execucao e colocada na fila do scheduler, que limita quantas crews rodam ao mesmo tempo
+    Com a fila cheia retorna 429 (o cliente deve tentar de novo depois)
+    Topic igual ja concluido (dentro do TTL) ou em andamento reaproveita a exec existente,
+    a menos que `force_refresh` seja enviado
     Retorna o `run_id` gerado para a exec, que e usado para rastrear o status e o resultado
     """
-    run_id = create_run_id()  # gera id
-    DB[run_id] = {"status": "queued"}  # status em fila no banco
-    
-    # tarefa em exec no background
-    bg.add_task(run_crew_sync, run_id, req, settings.MODEL_ID, settings.OLLAMA_BASE_URL)
-    
-    return {"run_id": run_id}  
+    try:
+        return admit_runs([req], settings.MODEL_ID)[0]
+    except (QueueFull, SchedulerClosed) as e:
+        raise HTTPException(status_code=429 if isinstance(e, QueueFull) else 503, detail=str(e), headers={"Retry-After": "30"})
 
 #status
 @router.get("/{run_id}", response_model=RunStatus)
@@ -31,9 +32,40 @@ def get_status(run_id: str):
     Se nao for encontrada, retorna "failed" com a mensagem "not found".
     """
     data = DB.get(run_id)  # dados da exec
-    if not data:
+    if not data or data.get("kind") == "batch":
         return RunStatus(run_id=run_id, status="failed", error="not found")  
-    return RunStatus(run_id=run_id, status=data["status"], error=data.get("error"))  
+    return _run_status(run_id, reap_if_stale(run_id, data))
+
+
+def _run_status(run_id: str, data: dict) -> RunStatus:
+    position = SCHEDULER.position(run_id) if data["status"] == "queued" else None
+    return RunStatus(
+        run_id=run_id,
+        status=data["status"],
+        step=data.get("step"),
+        queue_position=position,
+        error=data.get("error"),
+        error_type=data.get("error_type"),
+    )  
+
+#cancelamento
+@router.delete("/{run_id}", response_model=RunStatus)
+def delete_run(run_id: str, response: Response):
+    """
+    Cancela a exec: sai da fila se ainda nao comecou; se estiver rodando, a crew para
+    entre tasks/chamadas de tool e o status vira "cancelled" (streams SSE sao encerrados)
+    Exec compartilhada (pedidos iguais coalescidos ou lotes): so este pedido e desvinculado e a
+    exec segue para os outros interessados; o cancelamento vem quando o ultimo desiste
+    Exec ja finalizada nao muda; 202 quando o pedido foi repassado ao worker que roda a exec
+    """
+    data = DB.get(run_id)
+    if data and data.get("kind") != "batch":
+        data = release_run(run_id)
+    if not data or data.get("kind") == "batch":
+        raise HTTPException(status_code=404, detail="run not found")
+    if data.get("status") not in FINAL_STATUSES and not data.get("owners"):
+        response.status_code = 202
+    return _run_status(run_id, data)
 
 #resultado
 @router.get("/{run_id}/result", response_model=RunResult)
@@ -41,9 +73,35 @@ def get_result(run_id: str):
     """
     Consulta o resultado final com base no `run_id`
     Retorna o conteudo gerado se a exec for `finished`
+    Rodando nas etapas finais, retorna o artigo parcial (`partial=true`)
     Se nao concluida ou nao existir, retorna vazio.
     """
     data = DB.get(run_id)
-    if not data or data.get("status") != "finished":
+    if not data or data.get("kind") == "batch":
+        return RunResult(run_id=run_id, markdown="")
+    if data.get("status") == "running" and data.get("partial_markdown"):
+        return RunResult(run_id=run_id, markdown=data["partial_markdown"], partial=True)
+    if data.get("status") != "finished":
         return RunResult(run_id=run_id, markdown="")  
-    return RunResult(run_id=run_id, markdown=data["markdown"])  
+    return RunResult(run_id=run_id, markdown=data["markdown"], word_count=data.get("word_count"))
+
+#trace
+@router.get("/{run_id}/trace", response_model=RunTrace)
+def get_run_trace(run_id: str):
+    """
+    Spans da exec com base no `run_id` (ao vivo enquanto roda neste processo)
+    Se a exec nao existir ou ainda nao tiver trace, retorna a lista vazia
+    """
+    from content_creation_crew.tracing import summarize
+
+    data = DB.get(run_id)
+    trace = get_trace(run_id) or {}
+    spans = trace.get("spans") or []
+    return RunTrace(
+        run_id=run_id,
+        status=data.get("status") if data else None,
+        spans=spans,
+        dropped=trace.get("dropped", 0),
+        attrs=trace.get("attrs") or {},
+        summary=summarize(spans) if spans else {},
+    )
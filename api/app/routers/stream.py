@@ -1,50 +1,137 @@
-from fastapi import APIRouter
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Header
 from fastapi.responses import StreamingResponse
-from api.app.services.store import DB
-import asyncio, json
+from api.app.services import metrics
+from api.app.services.events import BUS
+from api.app.config import settings
+from api.app.services.runner import reap_if_stale, release_run
+from api.app.services.store import DB, FINAL_STATUSES
+import json
 
 #router para gerenciamento
 router = APIRouter(prefix="/runs", tags=["runs-stream"])
 
+# intervalo do heartbeat; a cada heartbeat o store tambem e consultado
+# (cobre execs rodando em outro worker, que nao publicam neste processo)
+HEARTBEAT_SECONDS = 15
+
+
+def _sse(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    """
+    Formata um evento SSE
+    """
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# tarefas de auto-cancelamento pendentes (referencia forte ate terminarem)
+_AUTO_CANCELS: set = set()
+
+
+async def _auto_cancel(run_id: str) -> None:
+    """
+    Se ninguem voltou a assinar dentro da folga (AUTO_CANCEL_ON_DISCONNECT), o cliente do stream
+    desiste da exec: cancela se ele era o unico interessado, senao so o desvincula
+    (pedidos coalescidos e lotes que so consultam o status seguem com a exec)
+    """
+    await asyncio.sleep(settings.AUTO_CANCEL_GRACE_SECONDS)
+    if BUS.subscriber_count(run_id) == 0:
+        await asyncio.to_thread(release_run, run_id, "cancelled: all clients disconnected")
+
+
+def _schedule_auto_cancel(run_id: str) -> None:
+    try:
+        task = asyncio.get_running_loop().create_task(_auto_cancel(run_id))
+    except RuntimeError:
+        return  # gerador fechado fora do loop
+    _AUTO_CANCELS.add(task)
+    task.add_done_callback(_AUTO_CANCELS.discard)
+
+
+def _status_data(data: dict) -> dict:
+    return {"status": data.get("status"), "step": data.get("step"), "error": data.get("error"), "error_type": data.get("error_type")}
+
+
+def _current(run_id: str) -> Optional[dict]:
+    """
+    Registro atual da exec (exec abandonada ja marcada como "failed"); None se nao existe
+    """
+    data = DB.get(run_id)
+    return reap_if_stale(run_id, data) if data else None
+
+
 # enviar dados via SSE
-async def sse_iter(run_id: str):
+async def sse_iter(run_id: str, last_event_id: Optional[int] = None):
     """
-    Funcao async que gera eventos de att sobre o status da exec via SSE
-    A cada att de status "update" e enviado
-    
+    Funcao async que gera os eventos da exec via SSE a partir do bus (push, sem polling)
+    Eventos: "update" (status/etapa), "task", "tool", "token" e "ping" (heartbeat)
+    "token" traz um trecho do artigo em geracao: `text` vai na posicao `offset` (0 recomeca o artigo)
+    Com `last_event_id` reenvia o que o cliente perdeu; se o historico nao cobre, manda o estado atual
+    (e o artigo parcial gravado no store como um "token" com offset 0)
     """
     # envia um evento inicial de "ping" para manter a conexao viva
     yield "event: ping\ndata: ok\n\n"
-    last = None  # ultimo estado enviado
-    while True:
-        # estado atual
-        data = DB.get(run_id) or {}
-        
-        # verifica mudanca
-        if data != last:
-            status_data = {"status": data.get("status"), "error": data.get("error")}
-            
-            # envia os dados como um evento SSE
-            yield "event: update\ndata: " + json.dumps(status_data) + "\n\n"
-            last = data 
-            
-            # status "finished"/"failed" encerra o loop
-            if data.get("status") in ("finished", "failed"):
-                break
-        
-        # 1 segundo antes de verificar novamente
-        await asyncio.sleep(1)
+
+    # assina antes de ler o store para nao perder transicoes entre as duas coisas
+    sub, replay, complete = BUS.subscribe(run_id, last_event_id)
+    metrics.SSE_CONNECTIONS.inc()
+    metrics.SSE_CONNECTIONS_TOTAL.inc()
+    disconnected = False
+    try:
+        # leituras do store (e o reap, que pode gravar) fora do event loop
+        data = await asyncio.to_thread(_current, run_id)
+        if not data:
+            yield _sse("update", {"status": "failed", "step": None, "error": "not found"})
+            return
+
+        if complete:
+            for event_id, event, payload in replay:
+                yield _sse(event, payload, event_id)
+                if event == "update" and payload.get("status") in FINAL_STATUSES:
+                    return
+        else:
+            yield _sse("update", _status_data(data))
+            if data.get("status") == "running" and data.get("partial_markdown"):
+                yield _sse("token", {"text": data["partial_markdown"], "offset": 0})
+        if data.get("status") in FINAL_STATUSES:
+            return
+
+        while True:
+            item = await sub.get(HEARTBEAT_SECONDS)
+            if item is None:
+                yield "event: ping\ndata: ok\n\n"
+                data = await asyncio.to_thread(_current, run_id) or {}
+                if data.get("status") in FINAL_STATUSES or not data:
+                    yield _sse("update", _status_data(data) if data else {"status": "failed", "error": "not found"})
+                    return
+                continue
+            event_id, event, payload = item
+            yield _sse(event, payload, event_id)
+            # status final ("finished"/"failed"/"cancelled") encerra o stream
+            if event == "update" and payload.get("status") in FINAL_STATUSES:
+                return
+    except (GeneratorExit, asyncio.CancelledError):
+        disconnected = True  # cliente fechou a conexao com a exec em andamento
+        raise
+    finally:
+        remaining = BUS.unsubscribe(run_id, sub)
+        metrics.SSE_CONNECTIONS.dec()
+        if disconnected and remaining == 0 and settings.AUTO_CANCEL_ON_DISCONNECT:
+            _schedule_auto_cancel(run_id)
 
 # endpoint de streaming dos status da exec
 @router.get("/{run_id}/stream")
-async def stream_run(run_id: str):
+async def stream_run(run_id: str, last_event_id: Optional[str] = Header(default=None)):
     """
-    Rota para enviar o status de uma exec via SSE    
-    Retorna uma StreamingResponse com os dados de status da exec
+    Rota para enviar o status de uma exec via SSE
+    Retorna uma StreamingResponse com os eventos da exec
+    Suporta retomada pelo cabecalho `Last-Event-ID` (enviado automaticamente pelo EventSource)
     """
+    resume = int(last_event_id) if last_event_id and last_event_id.strip().isdigit() else None
     return StreamingResponse(
-        sse_iter(run_id),  # chama a funcao que ira gerar os eventos SSE
-        media_type="text/event-stream", 
+        sse_iter(run_id, resume),  # chama a funcao que ira gerar os eventos SSE
+        media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",  # impede o cache da resposta
             "X-Accel-Buffering": "no",  # evita buffering em proxies
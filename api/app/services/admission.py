@@ -0,0 +1,64 @@
+import os
+from typing import Any, Dict, List, Sequence
+
+from . import metrics
+from .events import BUS
+from .result_cache import CREATE_LOCK, find_reusable, result_key
+from .runner import create_run_id, run_crew_sync, set_state
+from .scheduler import DEFAULT_LANE, SCHEDULER, QueueFull, SchedulerClosed
+from .store import DB
+from ..models import RunRequest
+
+
+def admit_runs(reqs: Sequence[RunRequest], model_id: str, lane: str = DEFAULT_LANE) -> List[Dict[str, Any]]:
+    """
+    Uma exec por request: reaproveita uma igual (em andamento ou no cache de resultados, a menos
+    que `force_refresh`) ou cria uma nova; as novas entram juntas na `lane` do scheduler
+    Tudo ou nada: com a fila cheia nenhuma exec nova fica registrada e `QueueFull` e propagada
+    Cada request conta como um interessado (`owners`) na exec nova ou coalescida
+    Retorna, na ordem dos requests: run_id, queue_position, cached e coalesced
+    """
+    admitted: List[Dict[str, Any]] = []
+    jobs = []
+    with CREATE_LOCK:
+        for req in reqs:
+            cache_key = result_key(req, model_id)
+            if not req.force_refresh:
+                existing, in_flight = find_reusable(cache_key)
+                if existing:
+                    if in_flight:
+                        # mais um interessado: um DELETE/desconexao dos outros nao cancela a exec
+                        DB.increment(existing, "owners", 1, default=1)
+                    admitted.append({
+                        "run_id": existing,
+                        "queue_position": SCHEDULER.position(existing),
+                        "cached": not in_flight,
+                        "coalesced": in_flight,
+                    })
+                    continue
+
+            run_id = create_run_id()  # gera id
+            # status em fila no banco; `worker` identifica o processo dono (exec orfa se ele morrer)
+            set_state(run_id, replace=True, status="queued", cache_key=cache_key, owners=1, worker=os.getpid())
+            jobs.append((run_id, run_crew_sync, (run_id, req, model_id)))
+            admitted.append({"run_id": run_id, "queue_position": None, "cached": False, "coalesced": False})
+
+        # enfileira as execs novas no pool limitado
+        try:
+            positions = SCHEDULER.submit_many(jobs, lane) if jobs else []
+        except (QueueFull, SchedulerClosed):
+            # os run_ids nao foram devolvidos a ninguem: remove o registro e o canal do "queued"
+            for run_id, _fn, _args in jobs:
+                DB.delete(run_id)
+                BUS.discard(run_id)
+            metrics.RUNS_CREATED.inc(len(jobs), outcome="rejected")
+            raise
+
+    by_id = {run_id: pos for (run_id, _fn, _args), pos in zip(jobs, positions)}
+    for item in admitted:
+        if item["run_id"] in by_id and not (item["cached"] or item["coalesced"]):
+            item["queue_position"] = by_id[item["run_id"]]
+            metrics.RUNS_CREATED.inc(outcome="queued")
+        else:
+            metrics.RUNS_CREATED.inc(outcome="coalesced" if item["coalesced"] else "cached")
+    return admitted
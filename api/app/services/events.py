@@ -0,0 +1,140 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+# exec associada a thread/contexto atual (usada pelos listeners de eventos da crew)
+CURRENT_RUN: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_run", default=None)
+
+# evento: (id sequencial por exec, nome, dados)
+Event = Tuple[int, str, Dict[str, Any]]
+
+
+class _Subscription:
+    """
+    Assinatura de um cliente SSE: fila asyncio alimentada pelo bus (thread-safe)
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue()
+
+    def push(self, event: Event) -> None:
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    async def get(self, timeout: float) -> Optional[Event]:
+        """
+        Proximo evento ou None se nada chegar ate `timeout`
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class _Channel:
+    def __init__(self, history_size: int) -> None:
+        self.next_id = 1
+        self.history: Deque[Event] = deque(maxlen=history_size)
+        self.subscribers: Set[_Subscription] = set()
+        self.closed_at: Optional[float] = None
+
+
+class EventBus:
+    """
+    Pub/sub em processo, um canal por exec
+    - `publish` pode ser chamado de qualquer thread (ex: worker da crew)
+    - guarda os ultimos eventos de cada exec para retomar via `Last-Event-ID`
+    - canais encerrados sao descartados depois de `keep_closed_s` (verificado a cada evento final)
+    """
+
+    def __init__(self, history_size: int = 1000, keep_closed_s: float = 300) -> None:
+        self.history_size = history_size
+        self.keep_closed_s = keep_closed_s
+        self._channels: Dict[str, _Channel] = {}
+        self._lock = threading.Lock()
+
+    def _channel(self, run_id: str) -> _Channel:
+        ch = self._channels.get(run_id)
+        if ch is None:
+            ch = self._channels[run_id] = _Channel(self.history_size)
+        return ch
+
+    def publish(self, run_id: str, event: str, data: Dict[str, Any], final: bool = False) -> int:
+        """
+        Publica o evento para todos os assinantes da exec; `final=True` encerra o canal
+        """
+        with self._lock:
+            ch = self._channel(run_id)
+            item = (ch.next_id, event, data)
+            ch.next_id += 1
+            ch.history.append(item)
+            subscribers = list(ch.subscribers)
+            if final:
+                ch.closed_at = time.time()
+                # a varredura roda so nos eventos finais (nao a cada chunk de token)
+                self._drop_expired()
+        for sub in subscribers:
+            sub.push(item)
+        return item[0]
+
+    def subscribe(self, run_id: str, last_event_id: Optional[int] = None) -> Tuple[_Subscription, List[Event], bool]:
+        """
+        Registra um assinante no loop atual
+        Retorna (assinatura, eventos a reenviar apos `last_event_id`, se o historico cobre o pedido)
+        """
+        sub = _Subscription(asyncio.get_running_loop())
+        with self._lock:
+            ch = self._channel(run_id)
+            ch.subscribers.add(sub)
+            history = list(ch.history)
+        if last_event_id is None:
+            return sub, [], False
+        replay = [e for e in history if e[0] > last_event_id]
+        # sem historico (canal expirado, restart, outro worker) nao ha como reenviar: o
+        # chamador manda o estado do store
+        complete = bool(history) and history[0][0] <= last_event_id + 1
+        return sub, replay, complete
+
+    def unsubscribe(self, run_id: str, sub: _Subscription) -> int:
+        """
+        Remove o assinante; retorna quantos ainda restam na exec
+        """
+        with self._lock:
+            ch = self._channels.get(run_id)
+            if ch is None:
+                return 0
+            ch.subscribers.discard(sub)
+            if not ch.subscribers and not ch.history:
+                del self._channels[run_id]  # canal criado so pela assinatura (ex: exec inexistente)
+            return len(ch.subscribers)
+
+    def discard(self, run_id: str) -> None:
+        """
+        Descarta o canal da exec (ex: exec removida antes de ser exposta a qualquer cliente)
+        """
+        with self._lock:
+            self._channels.pop(run_id, None)
+
+    def subscriber_count(self, run_id: Optional[str] = None) -> int:
+        with self._lock:
+            if run_id is not None:
+                ch = self._channels.get(run_id)
+                return len(ch.subscribers) if ch else 0
+            return sum(len(ch.subscribers) for ch in self._channels.values())
+
+    def _drop_expired(self) -> None:
+        # chamado com o lock adquirido
+        now = time.time()
+        expired = [
+            rid for rid, ch in self._channels.items()
+            if ch.closed_at is not None and not ch.subscribers and now - ch.closed_at > self.keep_closed_s
+        ]
+        for rid in expired:
+            del self._channels[rid]
+
+
+# bus compartilhado do processo
+BUS = EventBus()
@@ -0,0 +1,297 @@
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from content_creation_crew import factory
+from content_creation_crew.tools.wiki_ratelimit import RATE_LIMITER, WAIT_BUCKETS
+from content_creation_crew.tools.wiki_stats import LATENCY_BUCKETS, REQUEST_STATS
+from content_creation_crew.tools.wikipedia_tool import _SHARED_CACHE
+
+# metricas no formato texto do Prometheus (0.0.4), sem dependencia externa
+# os contadores sao por processo (cada worker do uvicorn expoe os seus)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        return ()
+
+    def render(self) -> List[str]:
+        lines = _header(self.name, self.kind, self.help)
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(_Metric):
+    """
+    Contador monotonicamente crescente (`inc`)
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        # sem labels a serie existe desde o inicio (valor 0)
+        self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Gauge(_Metric):
+    """
+    Valor que sobe e desce (`inc`/`dec`/`set`) ou lido na hora da coleta (`fn`)
+    """
+    kind = "gauge"
+
+    def __init__(
+        self, name: str, help_text: str, labelnames: Sequence[str] = (),
+        fn: Optional[Callable[[], float]] = None,
+    ) -> None:
+        super().__init__(name, help_text, labelnames)
+        # sem labels a serie existe desde o inicio (valor 0)
+        self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0}
+        self._fn = fn
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> Iterable[str]:
+        if self._fn is not None:
+            yield f"{self.name} {_number(self._fn())}"
+            return
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram(_Metric):
+    """
+    Histograma com buckets fixos (`observe`), exportado como _bucket/_sum/_count
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # por label: (contagem por bucket, soma, total)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total, n = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, n + 1)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(k, list(c), s, n) for k, (c, s, n) in self._values.items()]
+        for key, counts, total, n in items:
+            yield from histogram_samples(self.name, self.labelnames, key, self.buckets, counts, total, n)
+
+
+def histogram_samples(
+    name: str, labelnames: Sequence[str], key: Sequence[str], buckets: Sequence[float],
+    counts: Sequence[int], total: float, n: int,
+) -> Iterable[str]:
+    """
+    Linhas _bucket/_sum/_count de um histograma (`counts` por bucket, nao acumulados)
+    """
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        le = f'le="{_number(bound)}"'
+        yield f"{name}_bucket{_labels(labelnames, key, le)} {cumulative}"
+    yield f"{name}_sum{_labels(labelnames, key)} {_number(total)}"
+    yield f"{name}_count{_labels(labelnames, key)} {n}"
+
+
+def _header(name: str, kind: str, help_text: str) -> List[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+class Registry:
+    """
+    Conjunto de metricas + coletores chamados na hora do scrape (valores de outros modulos)
+    Um coletor devolve linhas ja formatadas (com # HELP/# TYPE)
+    """
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn: Callable[[], Iterable[str]]) -> None:
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# execs
+RUNS_CREATED = REGISTRY.register(Counter(
+    "crew_runs_created_total", "POST /runs by outcome (queued, cached, coalesced, rejected)", ("outcome",)))
+RUNS_COMPLETED = REGISTRY.register(Counter(
+    "crew_runs_completed_total", "Runs that reached a final status (finished, failed, timed_out, cancelled)", ("status",)))
+RUN_DURATION = REGISTRY.register(Histogram(
+    "crew_run_duration_seconds", "Crew run time (from start to final status)",
+    (5, 15, 30, 60, 120, 180, 300, 600, 900, 1800, 3600), ("status",)))
+RUN_QUEUE_WAIT = REGISTRY.register(Histogram(
+    "crew_run_queue_wait_seconds", "Time a run waited in the queue before starting",
+    (0.1, 1, 5, 15, 30, 60, 120, 300, 600, 1800)))
+RUN_STEP_DURATION = REGISTRY.register(Histogram(
+    "crew_run_step_duration_seconds", "Time spent in each crew step",
+    (1, 5, 15, 30, 60, 120, 300, 600, 1200), ("step",)))
+
+# SSE
+SSE_CONNECTIONS = REGISTRY.register(Gauge("crew_sse_connections", "Open SSE streams"))
+SSE_CONNECTIONS_TOTAL = REGISTRY.register(Counter("crew_sse_connections_total", "SSE streams opened"))
+
+
+# valores lidos de outros modulos so na hora do scrape (nada a atualizar no caminho quente)
+def _collect_runs() -> Iterable[str]:
+    from .events import BUS
+    from .scheduler import SCHEDULER
+    from .store import DB
+
+    yield from _header("crew_runs_queued", "gauge", "Runs waiting in the scheduler queue")
+    yield f"crew_runs_queued {SCHEDULER.queue_depth()}"
+    yield from _header("crew_runs_in_flight", "gauge", "Runs executing in this process")
+    yield f"crew_runs_in_flight {SCHEDULER.running_count()}"
+    yield from _header("crew_run_queue_capacity", "gauge", "Maximum queued runs before POST /runs returns 429")
+    yield f"crew_run_queue_capacity {SCHEDULER.max_queued}"
+    yield from _header("crew_run_workers", "gauge", "Maximum concurrent runs")
+    yield f"crew_run_workers {SCHEDULER.max_concurrent}"
+    yield from _header("crew_sse_subscribers", "gauge", "Event bus subscriptions (SSE clients) in this process")
+    yield f"crew_sse_subscribers {BUS.subscriber_count()}"
+    yield from _header("crew_run_store_records", "gauge", "Runs kept in the run store")
+    yield f"crew_run_store_records {DB.count()}"
+
+
+def _collect_wikipedia() -> Iterable[str]:
+    snap = REQUEST_STATS.snapshot()
+
+    yield from _header("wikipedia_requests_total", "counter", "HTTP requests to the Wikipedia API by endpoint and status")
+    errors: Dict[str, int] = {}
+    for (endpoint, status), n in sorted(snap["requests"].items()):
+        yield f"wikipedia_requests_total{_labels(('endpoint', 'status'), (endpoint, status))} {n}"
+        if not status.startswith(("2", "3")):
+            errors[endpoint] = errors.get(endpoint, 0) + n
+    yield from _header("wikipedia_request_errors_total", "counter", "Wikipedia requests that failed (HTTP >= 400 or network error)")
+    for endpoint, n in sorted(errors.items()):
+        yield f"wikipedia_request_errors_total{_labels(('endpoint',), (endpoint,))} {n}"
+    yield from _header("wikipedia_request_retries_total", "counter", "Retries made for Wikipedia requests (429/403/5xx)")
+    for endpoint, n in sorted(snap["retries"].items()):
+        yield f"wikipedia_request_retries_total{_labels(('endpoint',), (endpoint,))} {n}"
+    yield from _header("wikipedia_request_duration_seconds", "histogram", "Wikipedia request latency, retries included")
+    buckets = tuple(LATENCY_BUCKETS) + (math.inf,)
+    for endpoint, (counts, total, n) in sorted(snap["latency"].items()):
+        yield from histogram_samples("wikipedia_request_duration_seconds", ("endpoint",), (endpoint,), buckets, counts, total, n)
+
+    yield from _collect_wiki_rate_limit()
+
+    cache = _SHARED_CACHE.stats()
+    if cache:
+        yield from _header("wikipedia_cache_events_total", "counter", "Wikipedia response cache hits, misses, sets and evictions")
+        for event in ("memory_hits", "disk_hits", "misses", "sets", "evictions"):
+            if event in cache:
+                yield f"wikipedia_cache_events_total{_labels(('event',), (event,))} {cache[event]}"
+        yield from _header("wikipedia_cache_memory_entries", "gauge", "Entries in the in-memory layer of the Wikipedia cache")
+        yield f"wikipedia_cache_memory_entries {cache.get('memory_size', 0)}"
+
+
+def _collect_wiki_rate_limit() -> Iterable[str]:
+    snap = RATE_LIMITER.snapshot()
+    yield from _header("wikipedia_ratelimit_wait_seconds", "histogram", "Time requests waited for their turn in the per-host token bucket")
+    buckets = tuple(WAIT_BUCKETS) + (math.inf,)
+    for host, (counts, total, n) in sorted(snap["waits"].items()):
+        yield from histogram_samples("wikipedia_ratelimit_wait_seconds", ("host",), (host,), buckets, counts, total, n)
+    yield from _header("wikipedia_ratelimit_waiting", "gauge", "Requests of this process currently waiting for the rate limiter")
+    for host, n in sorted(snap["waiting"].items()):
+        yield f"wikipedia_ratelimit_waiting{_labels(('host',), (host,))} {n}"
+    yield from _header("wikipedia_ratelimit_backoffs_total", "counter", "Host-wide pauses set after 429/403/5xx or maxlag responses, by reason")
+    for (host, reason), n in sorted(snap["backoffs"].items()):
+        yield f"wikipedia_ratelimit_backoffs_total{_labels(('host', 'reason'), (host, reason))} {n}"
+    yield from _header("wikipedia_ratelimit_rejected_total", "counter", "Requests refused because their turn was beyond WIKI_RATE_MAX_WAIT")
+    for host, n in sorted(snap["rejected"].items()):
+        yield f"wikipedia_ratelimit_rejected_total{_labels(('host',), (host,))} {n}"
+
+
+def _collect_ollama() -> Iterable[str]:
+    pool = factory._FACTORY.pool if factory._FACTORY is not None else None
+    if pool is None:
+        return
+    snap = pool.snapshot()
+    yield from _header("crew_ollama_endpoint_runs", "gauge", "Runs leased to each Ollama endpoint")
+    for endpoint, state in snap.items():
+        yield f"crew_ollama_endpoint_runs{_labels(('endpoint',), (endpoint,))} {state['in_flight']}"
+    yield from _header("crew_ollama_endpoint_up", "gauge", "1 if the endpoint is eligible for routing (last preload succeeded)")
+    for endpoint, state in snap.items():
+        yield f"crew_ollama_endpoint_up{_labels(('endpoint',), (endpoint,))} {int(state['up'])}"
+
+
+REGISTRY.add_collector(_collect_runs)
+REGISTRY.add_collector(_collect_wikipedia)
+REGISTRY.add_collector(_collect_ollama)
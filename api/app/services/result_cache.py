@@ -0,0 +1,76 @@
+import hashlib
+import json
+import threading
+import time
+from functools import lru_cache
+from importlib import resources
+from typing import Optional, Tuple
+
+from ..config import settings
+from ..models import RunRequest
+from .runner import reap_if_stale
+from .store import DB
+
+# status de uma exec que ainda vai produzir resultado (pedidos iguais se juntam a ela)
+IN_FLIGHT_STATUSES = ("queued", "running")
+
+# serializa "procura + cria" para que POSTs simultaneos do mesmo topic virem uma exec so
+CREATE_LOCK = threading.Lock()
+
+
+def normalize_topic(topic: str) -> str:
+    """
+    Topic normalizado para a chave: minusculas e espacos simples
+    """
+    return " ".join(topic.casefold().split())
+
+
+@lru_cache(maxsize=1)
+def config_hash() -> str:
+    """
+    Hash dos YAML de agents/tasks da crew: mudar prompts invalida os resultados em cache
+    """
+    h = hashlib.sha256()
+    folder = resources.files("content_creation_crew") / "config"
+    for name in ("agents.yaml", "tasks.yaml"):
+        h.update(name.encode())
+        h.update((folder / name).read_bytes())
+    return h.hexdigest()[:16]
+
+
+def result_key(req: RunRequest, model_id: str) -> str:
+    """
+    Chave de conteudo da exec: topic normalizado + modelo + config da crew + opcoes
+    (os modelos por agente do agents.yaml entram no hash da config; os do request, aqui)
+    """
+    parts = [
+        normalize_topic(req.topic), model_id, config_hash(),
+        f"wiki={int(req.use_wikipedia)}", f"min_words={settings.MIN_BODY_WORDS}",
+        f"prefetch={settings.RESEARCH_PREFETCH_PAGES}",
+    ]
+    overrides = req.agent_overrides()
+    if overrides:
+        parts.append("agents=" + json.dumps(overrides, sort_keys=True))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def find_reusable(cache_key: str) -> Tuple[Optional[str], bool]:
+    """
+    Procura uma exec reaproveitavel para a chave
+    Retorna (run_id, em_andamento): primeiro uma exec na fila/rodando (que passe pelo
+    `reap_if_stale`: dono vivo e dentro do prazo), depois um resultado finalizado dentro do TTL;
+    (None, False) se nao houver
+    """
+    # cada exec abandonada encontrada vira "failed" e a proxima mais recente e conferida
+    while True:
+        found = DB.find_by_cache_key(cache_key, IN_FLIGHT_STATUSES)
+        if not found:
+            break
+        if reap_if_stale(*found).get("status") in IN_FLIGHT_STATUSES:
+            return found[0], True
+    ttl_s = settings.RESULT_CACHE_TTL_HOURS * 3600
+    if ttl_s > 0:
+        found = DB.find_by_cache_key(cache_key, ("finished",), newer_than=time.time() - ttl_s)
+        if found:
+            return found[0], False
+    return None, False
@@ -1,7 +1,39 @@
+import logging
+import os
+import threading
+import time
 import uuid
-from .store import DB 
+from typing import Any, Dict, List, Optional, Sequence
+from . import metrics
+from .events import BUS, CURRENT_RUN
+from .scheduler import SCHEDULER
+from .store import DB, FINAL_STATUSES
+from ..config import settings
 from ..models import RunRequest  
 
+logger = logging.getLogger(__name__)
+
+# traces das execs rodando neste processo (consultados ao vivo por GET /runs/{id}/trace)
+_LIVE_TRACES: Dict[str, Any] = {}
+
+# controles das execs rodando neste processo (cancelamento local)
+_CONTROLS: Dict[str, "_RunControl"] = {}
+
+# artigo parcial das execs rodando neste processo (chunks de streaming do editor)
+_PARTIALS: Dict[str, "_PartialArticle"] = {}
+
+# folga do `reap_if_stale` alem de RUN_TIMEOUT_SECONDS; tambem o tempo minimo sem atualizacao
+# antes de uma exec sem dono vivo ser considerada abandonada
+STALE_GRACE_S = 60
+# intervalo minimo entre consultas ao store por pedido de cancelamento vindo de outro worker
+CANCEL_POLL_S = 1.0
+# etapas em que a resposta do LLM e o proprio artigo (revisao e expansao do editor)
+STREAM_STEPS = ("editing", "enforce_min_words")
+# intervalo minimo entre gravacoes do artigo parcial no store
+PARTIAL_FLUSH_S = 0.5
+# marcador do formato ReAct do CrewAI: o texto depois dele e a resposta da task
+_FINAL_ANSWER = "Final Answer:"
+
 # criar um ID para cada exec
 def create_run_id() -> str:
     """
@@ -10,21 +42,539 @@ def create_run_id() -> str:
     return uuid.uuid4().hex  
 
 
+def set_state(run_id: str, replace: bool = False, **fields: Any) -> Dict[str, Any]:
+    """
+    Grava o estado da exec no store e publica o evento "update" para os clientes SSE
+    `replace=True` substitui o registro inteiro (senao mescla os campos)
+    """
+    record = DB.put(run_id, fields) if replace else (DB.update(run_id, **fields) or DB.put(run_id, fields))
+    status = record.get("status")
+    BUS.publish(
+        run_id,
+        "update",
+        {"status": status, "step": record.get("step"), "error": record.get("error"), "error_type": record.get("error_type")},
+        final=status in FINAL_STATUSES,
+    )
+    return record
+
+
+class RunInterrupted(BaseException):
+    """
+    Interrompe a crew no proximo checkpoint (callbacks de passo/task e antes da etapa final)
+    BaseException para atravessar os `except Exception` (e retries) do CrewAI
+    """
+
+
+class RunTimedOut(RunInterrupted):
+    """
+    A exec passou do prazo (RUN_TIMEOUT_SECONDS)
+    """
+
+
+class RunCancelled(RunInterrupted):
+    """
+    Exec cancelada (DELETE /runs/{id} ou ultimo cliente SSE desconectado, sem outros interessados)
+    """
+
+
+class ServerShutdown(RunInterrupted):
+    """
+    O servidor desligou antes de a exec terminar (prazo de SHUTDOWN_DRAIN_SECONDS)
+    """
+
+
+class _RunControl:
+    """
+    Prazo/cancelamento da exec e quem grava o status final: a propria exec ou uma interrupcao
+    (watchdog no prazo ou cancelamento), gravada na hora mesmo com a crew presa numa chamada ao LLM
+    O primeiro `claim()` vence; o outro lado so limpa. A crew para no proximo `check()`
+    """
+
+    def __init__(self, run_id: str, timeout: float) -> None:
+        self.run_id = run_id
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout > 0 else None
+        self._lock = threading.Lock()
+        self._claimed = False
+        self._timer: Optional[threading.Timer] = None
+        self._on_interrupt: Any = None
+        self._interrupt: Optional[RunInterrupted] = None
+        self._next_poll = 0.0
+
+    def start(self, on_interrupt: Any) -> None:
+        """
+        `on_interrupt(error)` grava o status final de uma interrupcao
+        """
+        self._on_interrupt = on_interrupt
+        if self.deadline is None:
+            return
+        self._timer = threading.Timer(self.timeout, lambda: self.interrupt(self.timed_out()))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def timed_out(self) -> RunTimedOut:
+        return RunTimedOut(f"run timed out after {self.timeout:g}s")
+
+    def interrupt(self, error: RunInterrupted) -> None:
+        self._interrupt = error
+        if self._on_interrupt is not None:
+            self._on_interrupt(error)
+
+    def check(self) -> None:
+        if self._interrupt is not None:
+            raise self._interrupt
+        if self._claimed:
+            raise RunInterrupted("run already finalized")
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise self.timed_out()
+        # cancelamento pedido por outro worker (flag no store compartilhado)
+        now = time.monotonic()
+        if now >= self._next_poll:
+            self._next_poll = now + CANCEL_POLL_S
+            data = DB.get(self.run_id) or {}
+            if data.get("cancel_requested"):
+                self.interrupt(RunCancelled(str(data["cancel_requested"])))
+                raise self._interrupt
+
+    def claim(self) -> bool:
+        with self._lock:
+            if self._claimed:
+                return False
+            self._claimed = True
+        if self._timer is not None:
+            self._timer.cancel()
+        return True
+
+
+class _PartialArticle:
+    """
+    Artigo em geracao, montado com os chunks de streaming do LLM nas etapas finais
+    So o texto depois de "Final Answer:" conta (o raciocinio do agente fica de fora)
+    Cada trecho novo vira um evento "token" com `offset` (tamanho do texto antes dele):
+    offset 0 recomeca o artigo (ex: a expansao reescreve o texto da revisao)
+    O texto acumulado vai para `partial_markdown` no store, no maximo a cada PARTIAL_FLUSH_S
+    Os chunks chegam na thread da crew, a mesma que chama `arm`/`disarm`
+    """
+
+    def __init__(self, run_id: str) -> None:
+        self.run_id = run_id
+        self.active = False
+        self._preamble = ""
+        self._in_answer = False
+        self._parts: List[str] = []
+        self.length = 0
+        self._flushed_at = 0.0
+        self._flushed_length = 0
+
+    def arm(self) -> None:
+        """
+        Nova resposta do LLM a caminho: o texto publicado fica ate ela chegar ao "Final Answer:"
+        """
+        self.active = True
+        self._preamble = ""
+        self._in_answer = False
+
+    def disarm(self) -> None:
+        self.active = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> None:
+        if not self.active or not chunk:
+            return
+        if not self._in_answer:
+            self._preamble += chunk
+            pos = self._preamble.find(_FINAL_ANSWER)
+            if pos < 0:
+                return
+            self._in_answer = True
+            chunk = self._preamble[pos + len(_FINAL_ANSWER):].lstrip()
+            self._preamble = ""
+            self._parts = []
+            self.length = 0
+            if not chunk:
+                return
+        BUS.publish(self.run_id, "token", {"text": chunk, "offset": self.length})
+        self._parts.append(chunk)
+        self.length += len(chunk)
+        self.flush()
+
+    def flush(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if self.length == self._flushed_length or (not force and now - self._flushed_at < PARTIAL_FLUSH_S):
+            return
+        self._flushed_at = now
+        self._flushed_length = self.length
+        DB.update(self.run_id, partial_markdown=self.text)
+
+
+def _agent_usage(agent: Any) -> Optional[Any]:
+    process = getattr(agent, "_token_process", None)
+    return process.get_summary() if process is not None else None
+
+
+class _RunProgress:
+    """
+    Callbacks da crew que viram eventos: cada task concluida avanca a etapa,
+    cada passo de agente com tool vira um evento "tool"
+    Com um trace, cada task vira um span (tokens do agente medidos no inicio e no fim)
+    Os callbacks tambem sao os checkpoints do prazo da exec (`control`)
+    Nas STREAM_STEPS o artigo parcial (`partial`) recebe os chunks do LLM
+    """
+
+    def __init__(self, run_id: str, steps: Sequence[str], trace: Any = None, control: Optional[_RunControl] = None) -> None:
+        self.run_id = run_id
+        self.steps = steps
+        self.control = control
+        self.index = 0
+        self.trace = trace
+        self.tasks: List[Any] = []
+        self._span: Any = None
+        self._usage: Any = None
+        self.step_started = time.perf_counter()
+        self.partial = _PartialArticle(run_id)
+
+    def start(self, tasks: Sequence[Any]) -> None:
+        """
+        Recebe as tasks da crew (na ordem) e abre o span da primeira
+        """
+        self.tasks = list(tasks)
+        self._enter_step()
+        self._open_task()
+
+    def _enter_step(self) -> None:
+        if self.current_step in STREAM_STEPS:
+            self.partial.arm()
+        else:
+            self.partial.disarm()
+
+    def _open_task(self) -> None:
+        from content_creation_crew import tracing
+
+        self._span = None
+        if self.trace is None or self.index >= len(self.tasks):
+            return
+        task = self.tasks[self.index]
+        agent = getattr(task, "agent", None)
+        self._span = self.trace.open(self.steps[self.index], "task", agent=str(getattr(agent, "role", "") or "").strip())
+        self._usage = _agent_usage(agent)
+        self.trace.register_task(task, self._span)
+        tracing.set_parent(self._span)  # spans das tools (ex: Wikipedia) ficam dentro da task
+
+    @property
+    def current_step(self) -> str:
+        return self.steps[min(self.index, len(self.steps) - 1)]
+
+    def abort(self, error: BaseException) -> None:
+        """
+        Fecha o span da task em andamento com o erro
+        """
+        span, self._span = self._span, None
+        if span is not None:
+            self.trace.close(span, error=type(error).__name__)
+
+    def _close_task(self, output: Any) -> None:
+        from content_creation_crew import tracing
+
+        if self._span is None:
+            return
+        attrs: Dict[str, Any] = {"output_chars": len(str(getattr(output, "raw", "") or ""))}
+        after = _agent_usage(getattr(self.tasks[self.index], "agent", None))
+        if after is not None and self._usage is not None:
+            attrs["prompt_tokens"] = after.prompt_tokens - self._usage.prompt_tokens
+            attrs["completion_tokens"] = after.completion_tokens - self._usage.completion_tokens
+        self.trace.close(self._span, **attrs)
+        tracing.set_parent(None)
+
+    def on_step(self, step_output: Any) -> None:
+        if self.control is not None:
+            self.control.check()
+        tool = getattr(step_output, "tool", None)
+        if tool:
+            BUS.publish(self.run_id, "tool", {
+                "step": self.current_step,
+                "tool": tool,
+                "input": str(getattr(step_output, "tool_input", ""))[:500],
+            })
+
+    def end_step(self, step: str) -> None:
+        now = time.perf_counter()
+        metrics.RUN_STEP_DURATION.observe(now - self.step_started, step=step)
+        self.step_started = now
+
+    def on_task(self, output: Any) -> None:
+        done = self.current_step
+        BUS.publish(self.run_id, "task", {"step": done, "agent": str(getattr(output, "agent", "") or "").strip()})
+        self.end_step(done)
+        self._close_task(output)
+        self.index += 1
+        if self.control is not None:
+            self.control.check()
+        if self.index < len(self.steps):
+            set_state(self.run_id, step=self.steps[self.index])
+        self._enter_step()
+        self._open_task()
+
+
+def get_trace(run_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Trace da exec: ao vivo se estiver rodando neste processo, senao o gravado no store
+    """
+    trace = _LIVE_TRACES.get(run_id)
+    if trace is not None:
+        return trace.to_dict()
+    data = DB.get(run_id)
+    return data.get("trace") if data else None
+
+
+def _finish_trace(run_id: str, trace: Any) -> Dict[str, Any]:
+    """
+    Encerra o trace e devolve o dict a gravar; eventos atrasados (handlers do CrewAI
+    rodam em outra thread) regravam o trace no store
+    """
+    from content_creation_crew import tracing
+
+    trace.finish()
+    trace.on_change = lambda t: DB.update(run_id, trace=t.to_dict())
+    data = trace.to_dict()
+    _LIVE_TRACES.pop(run_id, None)
+    try:
+        tracing.export_otel(data)
+    except Exception:
+        logger.exception("OpenTelemetry export failed for run %s", run_id)
+    return data
+
+
+def _observe_run(status: str, started: float) -> None:
+    metrics.RUNS_COMPLETED.inc(status=status)
+    metrics.RUN_DURATION.observe(time.perf_counter() - started, status=status)
+
+
+_stream_listener_registered = False
+
+def _register_stream_listener() -> None:
+    """
+    Repassa os chunks de streaming do LLM (quando o LLM usa stream=True) ao artigo parcial da exec
+    O CrewAI chama esse handler na propria thread da crew, entao CURRENT_RUN identifica a exec
+    """
+    global _stream_listener_registered
+    if _stream_listener_registered:
+        return
+    from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def _on_chunk(_source: Any, event: Any) -> None:
+        partial = _PARTIALS.get(CURRENT_RUN.get() or "")
+        if partial is not None and event.chunk:
+            partial.feed(event.chunk)
+
+    _stream_listener_registered = True
+
+
+def _fail(run_id: str, control: _RunControl, progress: _RunProgress, trace: Any, error: BaseException, started: float) -> None:
+    """
+    Grava a falha (mensagem, classe do erro e etapa) e o trace ate ali; o status final publica
+    o "update" que encerra os streams SSE da exec. Cancelamento vira status "cancelled"
+    Nao faz nada se o status final ja foi gravado (ex: pelo watchdog)
+    """
+    if not control.claim():
+        _LIVE_TRACES.pop(run_id, None)
+        return
+    _CONTROLS.pop(run_id, None)
+    _PARTIALS.pop(run_id, None)
+    step = progress.current_step
+    progress.abort(error)
+    trace.attrs["error"] = {"type": type(error).__name__, "step": step}
+    cancelled = isinstance(error, RunCancelled)
+    set_state(
+        run_id, status="cancelled" if cancelled else "failed", step=step, error=str(error) or type(error).__name__,
+        error_type=type(error).__name__, trace=_finish_trace(run_id, trace),
+    )
+    if cancelled:
+        _observe_run("cancelled", started)
+    else:
+        _observe_run("timed_out" if isinstance(error, RunTimedOut) else "failed", started)
+
+
+def cancel_run(run_id: str, reason: str = "cancelled by client") -> Optional[Dict[str, Any]]:
+    """
+    Cancela a exec: tira da fila se ainda nao comecou; se estiver rodando neste processo
+    grava "cancelled" na hora e a crew para no proximo checkpoint (entre tasks ou chamadas de tool),
+    liberando o worker e o LLM; rodando em outro worker, marca `cancel_requested` no store
+    Retorna o registro atualizado (None se a exec nao existe); execs finalizadas nao mudam
+    """
+    data = DB.get(run_id)
+    if not data or data.get("status") in FINAL_STATUSES:
+        return data
+    if SCHEDULER.cancel(run_id):
+        metrics.RUNS_COMPLETED.inc(status="cancelled")
+        return set_state(run_id, status="cancelled", step=None, error=reason, error_type="RunCancelled")
+    control = _CONTROLS.get(run_id)
+    if control is not None:
+        control.interrupt(RunCancelled(reason))
+        return DB.get(run_id)
+    return DB.update(run_id, cancel_requested=reason)
+
+
+def release_run(run_id: str, reason: str = "cancelled by client") -> Optional[Dict[str, Any]]:
+    """
+    Um interessado desiste da exec (DELETE /runs/{id}, cancelamento do lote ou stream SSE abandonado)
+    A exec e compartilhada por pedidos iguais coalescidos e por lotes (`owners` no registro):
+    so e cancelada quando quem desiste e o unico interessado; senao ele so e desvinculado
+    Retorna o registro atualizado (None se a exec nao existe); execs finalizadas nao mudam
+    """
+    data = DB.get(run_id)
+    if not data or data.get("status") in FINAL_STATUSES:
+        return data
+    remaining = DB.increment(run_id, "owners", -1, default=1)
+    if remaining is None:
+        return None
+    if remaining > 0:
+        return DB.get(run_id)
+    return cancel_run(run_id, reason)
+
+
+def drain_runs(timeout: float) -> None:
+    """
+    Shutdown: drena o scheduler ate `timeout`; as execs que ficaram na fila viram "failed" e as
+    que ainda rodam sao interrompidas (status final gravado na hora, a crew para no proximo checkpoint)
+    Os status finais publicam o "update" que encerra os streams SSE
+    """
+    leftover, running = SCHEDULER.shutdown(timeout)
+    for run_id in leftover:
+        metrics.RUNS_COMPLETED.inc(status="failed")
+        set_state(run_id, status="failed", step=None, error="server shutting down", error_type="ServerShutdown")
+    for run_id in running:
+        control = _CONTROLS.get(run_id)
+        if control is not None:
+            control.interrupt(ServerShutdown("server shutting down"))
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # existe, mas de outro usuario
+    return True
+
+
+def _orphaned(run_id: str, data: Dict[str, Any]) -> bool:
+    """
+    Exec na fila/rodando cujo dono (`worker`, pid do processo no mesmo host) nao a tem mais:
+    o processo morreu (crash, SIGKILL, sem passar pelo `drain_runs`) ou, sendo este processo,
+    o scheduler nao a tem (ex: restart com o mesmo pid). A folga cobre a gravacao do "queued"
+    antes do `submit` e a passagem da fila para o worker
+    """
+    pid = data.get("worker")
+    if not isinstance(pid, int) or time.time() - data["updated_at"] < STALE_GRACE_S:
+        return False
+    if pid == os.getpid():
+        return not SCHEDULER.holds(run_id) and run_id not in _CONTROLS
+    return not _pid_alive(pid)
+
+
+def reap_if_stale(run_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Exec "queued"/"running" abandonada: o processo dono morreu (ou nao tem mais a exec) ou,
+    rodando, ficou sem atualizacao ha mais que o prazo + folga (uma exec viva teria sido
+    finalizada pelo proprio watchdog). Marca como "failed"
+    """
+    status = data.get("status")
+    if status not in ("queued", "running") or not data.get("updated_at"):
+        return data
+    if _orphaned(run_id, data):
+        metrics.RUNS_COMPLETED.inc(status="failed")
+        return set_state(run_id, status="failed", step=None, error="run abandoned (its worker process is gone)", error_type="RunAbandoned")
+    timeout = settings.RUN_TIMEOUT_SECONDS
+    if timeout <= 0 or status != "running" or time.time() - data["updated_at"] < timeout + STALE_GRACE_S:
+        return data
+    return set_state(run_id, status="failed", error="run abandoned (no progress past the deadline)", error_type="RunAbandoned")
+
+
 # exec a crew de forma sincrona
-def run_crew_sync(run_id: str, req: RunRequest, model_id: str, base_url: str):
+def run_crew_sync(run_id: str, req: RunRequest, model_id: str):
     """
     Att o status da exec e armazena o resultado no banco
-    
-    """
-    from content_creation_crew.crew import ContentCreationCrewCrew
-    
-    DB[run_id] = {"status": "running", "step": "research"}
-    
-    # Cria a instancia da crew 
-    crew = ContentCreationCrewCrew()
-    
-    # Inicia o processamento da exec
-    result = crew.crew().kickoff(inputs={"topic": req.topic})
-    
-    # atualiza o status para "finished" e armazena o conteudo
-    DB[run_id] = {"status": "finished", "markdown": str(result)}  
+    Cada transicao de estado e publicada no bus de eventos (SSE)
+    A crew usa o modelo da factory (MODEL_ID) no endpoint do Ollama menos ocupado (OLLAMA_BASE_URLS)
+    Erros, prazo estourado (RUN_TIMEOUT_SECONDS) e interrupcoes viram status "failed"
+    (ou "cancelled") com `error`, `error_type` e a etapa em que a exec parou
+    """
+    from content_creation_crew import tracing
+    from content_creation_crew.crew import RUN_STEPS
+    from content_creation_crew.factory import get_crew_factory
+    from content_creation_crew.tools.wiki_chunks import topic_scope
+
+    started = time.perf_counter()
+    control = _CONTROLS[run_id] = _RunControl(run_id, settings.RUN_TIMEOUT_SECONDS)
+    set_state(run_id, status="running", step=RUN_STEPS[0], worker=os.getpid())
+    trace = _LIVE_TRACES[run_id] = tracing.Trace(run_id)
+    progress = _RunProgress(run_id, RUN_STEPS, trace, control)
+    _PARTIALS[run_id] = progress.partial
+    control.start(lambda error: _fail(run_id, control, progress, trace, error, started))
+
+    token = CURRENT_RUN.set(run_id)
+    try:
+        control.check()  # cancelada enquanto esperava na fila de outro worker
+        _register_stream_listener()
+        tracing.install()
+        factory = get_crew_factory()
+        if factory.model_id != model_id:
+            logger.warning("run %s asked for model %s; crew factory serves %s", run_id, model_id, factory.model_id)
+        # Cria a instancia da crew a partir da factory (LLM, tools e YAML ja prontos)
+        # o tema da exec ranqueia os trechos das paginas que as tools devolvem
+        with factory.endpoint() as endpoint, tracing.activate(trace), topic_scope(req.topic):
+            overrides = req.agent_overrides()
+            trace.attrs["llm"] = {"model": factory.model_id, "endpoint": endpoint}
+            if factory.pool is not None:
+                trace.attrs["llm"]["agents"] = factory.agent_settings(overrides)
+            crew = factory.new_crew(
+                step_callback=progress.on_step,
+                task_callback=progress.on_task,
+                min_body_words=settings.MIN_BODY_WORDS,
+                endpoint=endpoint,
+                agent_models=overrides,
+            )
+
+            # Inicia o processamento da exec
+            built = crew.crew()
+            progress.start(built.tasks)
+            result = built.kickoff(inputs={"topic": req.topic})
+            control.check()
+            progress.partial.flush(force=True)
+            # contagem de palavras em Python; o LLM so e chamado se o corpo ficou curto
+            # (a etapa "enforce_min_words" ja foi marcada pelo callback da ultima task)
+            markdown, word_count = crew.enforce_min_words(str(result))
+            progress.end_step(RUN_STEPS[-1])
+    except BaseException as e:
+        if isinstance(e, Exception):
+            logger.exception("run %s failed in step %s", run_id, progress.current_step)
+        _fail(run_id, control, progress, trace, e, started)
+        if not isinstance(e, (Exception, RunInterrupted)):
+            raise  # KeyboardInterrupt/SystemExit seguem adiante
+        return
+    finally:
+        CURRENT_RUN.reset(token)
+        tracing.set_parent(None)
+        _PARTIALS.pop(run_id, None)
+
+    if not control.claim():
+        # prazo estourado ou cancelamento gravado enquanto a crew terminava
+        logger.warning("run %s finished after it was interrupted; result discarded", run_id)
+        _LIVE_TRACES.pop(run_id, None)
+        return
+    _CONTROLS.pop(run_id, None)
+    usage = getattr(result, "token_usage", None)
+    if usage is not None:
+        trace.attrs["usage"] = usage.model_dump() if hasattr(usage, "model_dump") else dict(usage)
+
+    # atualiza o status para "finished" e armazena o conteudo (e o trace da exec)
+    set_state(
+        run_id, status="finished", step=None, markdown=markdown, word_count=word_count, partial_markdown=None,
+        trace=_finish_trace(run_id, trace),
+    )
+    _observe_run("finished", started)
@@ -0,0 +1,192 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from ..config import settings
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """
+    Fila de execs cheia (admissao recusada -> HTTP 429)
+    """
+
+
+class SchedulerClosed(Exception):
+    """
+    Scheduler em shutdown, nao aceita novas execs
+    """
+
+
+class _Job:
+    __slots__ = ("run_id", "fn", "args", "enqueued_at")
+
+    def __init__(self, run_id: str, fn: Callable[..., Any], args: Tuple[Any, ...]) -> None:
+        self.run_id = run_id
+        self.fn = fn
+        self.args = args
+        self.enqueued_at = time.time()
+
+
+# fila das execs individuais (POST /runs); lotes usam uma fila propria cada
+DEFAULT_LANE = "default"
+
+
+class RunScheduler:
+    """
+    Pool de threads limitado para as execs da crew, com filas FIFO por "lane"
+    - no maximo `max_concurrent` crews ao mesmo tempo (protege o backend LLM)
+    - cada lote (POST /runs/batch) tem sua lane; os workers alternam entre as lanes (round-robin),
+      entao um lote com centenas de topics nao segura as execs individuais nem outros lotes
+    - lane padrao com ate `max_queued` execs esperando; as lanes de lote somam ate `max_batch_queued`;
+      acima disso `submit` lanca `QueueFull` (workers ociosos contam como vagas extras: toda exec
+      passa pela fila, entao `max_queued=0` ainda aceita execs que comecam na hora)
+    - `shutdown` para de aceitar execs, drena a fila ate o prazo e devolve o que sobrou
+    Threads (e nao processos) porque a crew passa a maior parte do tempo esperando I/O do LLM
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int, max_batch_queued: int = 0) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max(0, max_queued)
+        self.max_batch_queued = max(0, max_batch_queued)
+        # lanes com execs esperando, na ordem de atendimento (a atendida vai para o fim)
+        self._lanes: "OrderedDict[str, Deque[_Job]]" = OrderedDict()
+        self._running: Dict[str, _Job] = {}
+        self._cond = threading.Condition()
+        self._workers: list[threading.Thread] = []
+        self._closed = False
+
+    def start(self) -> None:
+        """
+        Sobe as threads de trabalho (idempotente)
+        """
+        with self._cond:
+            if self._workers or self._closed:
+                return
+            for i in range(self.max_concurrent):
+                t = threading.Thread(target=self._worker, name=f"crew-run-{i}", daemon=True)
+                t.start()
+                self._workers.append(t)
+
+    def submit(self, run_id: str, fn: Callable[..., Any], *args: Any) -> int:
+        """
+        Enfileira a exec na lane padrao e retorna a posicao na fila (1 = proxima a rodar)
+        """
+        return self.submit_many([(run_id, fn, args)])[0]
+
+    def submit_many(self, jobs: Sequence[Tuple[str, Callable[..., Any], Tuple[Any, ...]]], lane: str = DEFAULT_LANE) -> List[int]:
+        """
+        Enfileira varias execs de uma vez na `lane` (tudo ou nada) e retorna a posicao de cada uma
+        """
+        self.start()
+        with self._cond:
+            if self._closed:
+                raise SchedulerClosed("scheduler is shutting down")
+            if lane == DEFAULT_LANE:
+                waiting, limit = len(self._lanes.get(DEFAULT_LANE, ())), self.max_queued
+            else:
+                waiting = sum(len(q) for name, q in self._lanes.items() if name != DEFAULT_LANE)
+                limit = self.max_batch_queued
+            # workers livres que ainda nao tem exec esperando por eles pegam as novas na hora
+            idle = max(0, self.max_concurrent - len(self._running) - sum(len(q) for q in self._lanes.values()))
+            if waiting + len(jobs) > limit + idle:
+                raise QueueFull(f"run queue is full ({waiting} waiting, limit {limit})")
+            queue = self._lanes.setdefault(lane, deque())
+            positions = []
+            for run_id, fn, args in jobs:
+                queue.append(_Job(run_id, fn, args))
+                positions.append(len(queue))
+            self._cond.notify(len(jobs))
+            return positions
+
+    def position(self, run_id: str) -> Optional[int]:
+        """
+        Posicao atual na fila da lane (1-based) ou None se nao estiver esperando
+        """
+        with self._cond:
+            for queue in self._lanes.values():
+                for i, job in enumerate(queue):
+                    if job.run_id == run_id:
+                        return i + 1
+        return None
+
+    def holds(self, run_id: str) -> bool:
+        """
+        Se a exec esta na fila ou rodando neste scheduler (deste processo)
+        """
+        with self._cond:
+            return run_id in self._running or any(job.run_id == run_id for q in self._lanes.values() for job in q)
+
+    def cancel(self, run_id: str) -> bool:
+        """
+        Tira a exec da fila; False se ela nao estiver esperando (ja comecou ou nao existe)
+        """
+        with self._cond:
+            for name, queue in self._lanes.items():
+                for job in queue:
+                    if job.run_id == run_id:
+                        queue.remove(job)
+                        if not queue:
+                            del self._lanes[name]
+                        return True
+        return False
+
+    def queue_depth(self) -> int:
+        with self._cond:
+            return sum(len(q) for q in self._lanes.values())
+
+    def running_count(self) -> int:
+        with self._cond:
+            return len(self._running)
+
+    def _next_job(self) -> _Job:
+        # chamado com o lock adquirido e com alguma lane nao vazia
+        name, queue = next(iter(self._lanes.items()))
+        job = queue.popleft()
+        del self._lanes[name]
+        if queue:
+            self._lanes[name] = queue  # volta para o fim da rodada
+        return job
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._lanes and not self._closed:
+                    self._cond.wait()
+                if not self._lanes:
+                    return  # fechado e sem trabalho
+                job = self._next_job()
+                self._running[job.run_id] = job
+            metrics.RUN_QUEUE_WAIT.observe(time.time() - job.enqueued_at)
+            try:
+                job.fn(*job.args)
+            except Exception:
+                logger.exception("run %s crashed in the scheduler", job.run_id)
+            finally:
+                with self._cond:
+                    self._running.pop(job.run_id, None)
+                    self._cond.notify_all()
+
+    def shutdown(self, timeout: float) -> Tuple[List[str], List[str]]:
+        """
+        Para de aceitar execs e espera a fila/execs em andamento terminarem ate `timeout`
+        Retorna (execs que ficaram na fila, execs ainda rodando) depois do prazo; quem chama
+        grava o status final delas (`runner.drain_runs`)
+        """
+        deadline = time.time() + max(0.0, timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            while (self._lanes or self._running) and time.time() < deadline:
+                self._cond.wait(timeout=max(0.0, deadline - time.time()))
+            leftover = [job.run_id for queue in self._lanes.values() for job in queue]
+            self._lanes.clear()
+            return leftover, list(self._running)
+
+
+# scheduler compartilhado do processo
+SCHEDULER = RunScheduler(settings.MAX_CONCURRENT_RUNS, settings.MAX_QUEUED_RUNS, settings.MAX_BATCH_QUEUED_RUNS)
@@ -1,4 +1,304 @@
-from typing import Dict, Any
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, Sequence, Tuple
 
-# Banco de dados em memoria para armazenar o status e os resultados das exec
-DB: Dict[str, Dict[str, Any]] = {}
+from ..config import settings
+
+# status em que a exec nao muda mais (pode ser removida pela retencao)
+FINAL_STATUSES = ("finished", "failed", "cancelled")
+
+
+class RunStore(ABC):
+    """
+    Interface do armazenamento de execucoes (status, resultado e metadados por `run_id`)
+    Cada registro e um dict JSON; `created_at`/`updated_at` sao preenchidos pelo store
+    """
+
+    def __init__(self, retention_hours: float = 72, max_runs: int = 10000) -> None:
+        self.retention_s = max(0.0, retention_hours) * 3600
+        self.max_runs = max(1, max_runs)
+        self._writes = 0
+
+    @abstractmethod
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Registro da exec ou None"""
+
+    @abstractmethod
+    def put(self, run_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Substitui o registro inteiro (mantem o `created_at` original)"""
+
+    @abstractmethod
+    def update(self, run_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        """Mescla campos no registro existente; None se a exec nao existir"""
+
+    @abstractmethod
+    def increment(self, run_id: str, field: str, delta: int, default: int = 0) -> Optional[int]:
+        """Soma `delta` ao campo inteiro (`default` se ausente) de forma atomica; None se a exec nao existir"""
+
+    @abstractmethod
+    def delete(self, run_id: str) -> None:
+        """Remove a exec"""
+
+    @abstractmethod
+    def purge(self) -> int:
+        """Aplica a retencao (idade e quantidade maxima); retorna quantas foram removidas"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Quantidade de execs armazenadas"""
+
+    @abstractmethod
+    def find_by_cache_key(
+        self, cache_key: str, statuses: Sequence[str], newer_than: float = 0
+    ) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Exec mais recente com o `cache_key` e um dos `statuses`, criada apos `newer_than`"""
+
+    def _maybe_purge(self) -> None:
+        # retencao a cada 50 gravacoes para nao pesar no caminho quente
+        self._writes += 1
+        if self._writes % 50 == 0:
+            self.purge()
+
+
+class MemoryRunStore(RunStore):
+    """
+    Backend em memoria (um dict por processo) - usado em testes/dev
+    """
+
+    def __init__(self, retention_hours: float = 72, max_runs: int = 10000) -> None:
+        super().__init__(retention_hours, max_runs)
+        self._data: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            data = self._data.get(run_id)
+            return dict(data) if data is not None else None
+
+    def put(self, run_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            old = self._data.get(run_id)
+            record = {**data, "created_at": old["created_at"] if old else now, "updated_at": now}
+            self._data[run_id] = record
+        self._maybe_purge()
+        return dict(record)
+
+    def update(self, run_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            old = self._data.get(run_id)
+            if old is None:
+                return None
+            record = {**old, **fields, "updated_at": time.time()}
+            self._data[run_id] = record
+            return dict(record)
+
+    def increment(self, run_id: str, field: str, delta: int, default: int = 0) -> Optional[int]:
+        with self._lock:
+            old = self._data.get(run_id)
+            if old is None:
+                return None
+            value = int(old.get(field, default)) + delta
+            self._data[run_id] = {**old, field: value, "updated_at": time.time()}
+            return value
+
+    def delete(self, run_id: str) -> None:
+        with self._lock:
+            self._data.pop(run_id, None)
+
+    def purge(self) -> int:
+        cutoff = time.time() - self.retention_s
+        with self._lock:
+            old = [
+                rid for rid, d in self._data.items()
+                if d.get("status") in FINAL_STATUSES and d["updated_at"] < cutoff
+            ]
+            for rid in old:
+                del self._data[rid]
+            excess = len(self._data) - self.max_runs
+            if excess > 0:
+                final = sorted(
+                    (d["created_at"], rid) for rid, d in self._data.items()
+                    if d.get("status") in FINAL_STATUSES
+                )
+                for _, rid in final[:excess]:
+                    del self._data[rid]
+                    old.append(rid)
+            return len(old)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def find_by_cache_key(
+        self, cache_key: str, statuses: Sequence[str], newer_than: float = 0
+    ) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            found = [
+                (d["created_at"], rid, d) for rid, d in self._data.items()
+                if d.get("cache_key") == cache_key and d.get("status") in statuses and d["created_at"] >= newer_than
+            ]
+        if not found:
+            return None
+        _, rid, d = max(found, key=lambda item: item[0])
+        return rid, dict(d)
+
+
+class SQLiteRunStore(RunStore):
+    """
+    Backend SQLite em modo WAL, compartilhavel entre workers do uvicorn no mesmo host
+    Indices por run_id (PK), status, created_at e cache_key (memoizacao de resultados)
+    """
+
+    def __init__(self, path: str, retention_hours: float = 72, max_runs: int = 10000) -> None:
+        super().__init__(retention_hours, max_runs)
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._local = threading.local()  # uma conexao por thread
+        db = self._conn()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " cache_key TEXT,"
+            " data TEXT NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS idx_runs_status ON runs(status)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_runs_created ON runs(created_at)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_runs_cache_key ON runs(cache_key, created_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("PRAGMA busy_timeout=10000")
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def _row_to_record(row) -> Dict[str, Any]:
+        data = json.loads(row[0])
+        data["created_at"], data["updated_at"] = row[1], row[2]
+        return data
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT data, created_at, updated_at FROM runs WHERE run_id = ?", (run_id,)
+        ).fetchone()
+        return self._row_to_record(row) if row else None
+
+    def _write(self, db: sqlite3.Connection, run_id: str, data: Dict[str, Any], created_at: float, now: float) -> Dict[str, Any]:
+        body = {k: v for k, v in data.items() if k not in ("created_at", "updated_at")}
+        db.execute(
+            "INSERT OR REPLACE INTO runs (run_id, status, created_at, updated_at, cache_key, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (run_id, str(body.get("status") or ""), created_at, now, body.get("cache_key"), json.dumps(body, ensure_ascii=False)),
+        )
+        return {**body, "created_at": created_at, "updated_at": now}
+
+    def put(self, run_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        db = self._conn()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT created_at FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            record = self._write(db, run_id, data, row[0] if row else now, now)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._maybe_purge()
+        return record
+
+    def update(self, run_id: str, **fields: Any) -> Optional[Dict[str, Any]]:
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT data, created_at, updated_at FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+            if row is None:
+                db.execute("ROLLBACK")
+                return None
+            old = self._row_to_record(row)
+            record = self._write(db, run_id, {**old, **fields}, old["created_at"], time.time())
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return record
+
+    def increment(self, run_id: str, field: str, delta: int, default: int = 0) -> Optional[int]:
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT data, created_at, updated_at FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+            if row is None:
+                db.execute("ROLLBACK")
+                return None
+            old = self._row_to_record(row)
+            value = int(old.get(field, default)) + delta
+            self._write(db, run_id, {**old, field: value}, old["created_at"], time.time())
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return value
+
+    def delete(self, run_id: str) -> None:
+        self._conn().execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+    def purge(self) -> int:
+        db = self._conn()
+        marks = ",".join("?" * len(FINAL_STATUSES))
+        removed = db.execute(
+            f"DELETE FROM runs WHERE status IN ({marks}) AND updated_at < ?",
+            (*FINAL_STATUSES, time.time() - self.retention_s),
+        ).rowcount
+        excess = self.count() - self.max_runs
+        if excess > 0:
+            removed += db.execute(
+                f"DELETE FROM runs WHERE run_id IN ("
+                f" SELECT run_id FROM runs WHERE status IN ({marks}) ORDER BY created_at ASC LIMIT ?)",
+                (*FINAL_STATUSES, excess),
+            ).rowcount
+        return removed
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def find_by_cache_key(
+        self, cache_key: str, statuses: Sequence[str], newer_than: float = 0
+    ) -> Optional[Tuple[str, Dict[str, Any]]]:
+        marks = ",".join("?" * len(statuses))
+        row = self._conn().execute(
+            f"SELECT run_id, data, created_at, updated_at FROM runs"
+            f" WHERE cache_key = ? AND status IN ({marks}) AND created_at >= ?"
+            f" ORDER BY created_at DESC LIMIT 1",
+            (cache_key, *statuses, newer_than),
+        ).fetchone()
+        return (row[0], self._row_to_record(row[1:])) if row else None
+
+
+def build_store() -> RunStore:
+    """
+    Cria o store configurado em `Settings` (RUN_STORE_BACKEND = "sqlite" | "memory")
+    """
+    if settings.RUN_STORE_BACKEND == "memory":
+        return MemoryRunStore(settings.RUN_RETENTION_HOURS, settings.RUN_STORE_MAX_RUNS)
+    return SQLiteRunStore(settings.RUN_STORE_PATH, settings.RUN_RETENTION_HOURS, settings.RUN_STORE_MAX_RUNS)
+
+
+# Store compartilhado para armazenar o status e os resultados das exec
+DB: RunStore = build_store()
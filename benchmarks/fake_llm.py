@@ -0,0 +1,122 @@
+"""
+LLM determinístico para rodar a crew sem Ollama.
+
+Responde no formato ReAct que o CrewAI espera: quando o agente tem as tools do
+Wikipedia, primeiro pede `wikipedia_search` e `wikipedia_fetch` (exercitando as
+tools contra o stub) e depois dá a resposta final; os demais agentes respondem
+direto com um artigo Markdown de tamanho configurável.
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from crewai.events.types.llm_events import LLMCallType
+from crewai.llms.base_llm import BaseLLM
+
+_TOPIC_RE = re.compile(r'the topic "([^"]+)"')
+
+_FILLER = (
+    "The subject is described in the referenced Wikipedia pages, which outline its origins, "
+    "main ideas and the way it evolved over time, together with the people and places involved."
+).split()
+
+
+def _paragraph(words: int) -> str:
+    out = [_FILLER[i % len(_FILLER)] for i in range(words)]
+    return " ".join(out).rstrip(",.") + "."
+
+
+class FakeLLM(BaseLLM):
+    """
+    - `latency_s`: atraso por chamada (simula o tempo de geração)
+    - `body_words`: palavras no corpo do artigo (abaixo de MIN_BODY_WORDS força a expansão)
+    - `stream`: emite a resposta final em chunks (`LLMStreamChunkEvent`), como `LLM(stream=True)`
+    """
+
+    def __init__(
+        self,
+        latency_s: float = 0.0,
+        body_words: int = 360,
+        stream: bool = False,
+        chunk_words: int = 8,
+        use_tools: bool = True,
+    ) -> None:
+        super().__init__(model="fake/bench", provider="fake")
+        self.latency_s = latency_s
+        self.body_words = body_words
+        self.stream = stream
+        self.chunk_words = chunk_words
+        self.use_tools = use_tools
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def call(
+        self,
+        messages: Any,
+        tools: Optional[List[dict]] = None,
+        callbacks: Optional[List[Any]] = None,
+        available_functions: Optional[Dict[str, Any]] = None,
+        from_task: Any = None,
+        from_agent: Any = None,
+    ) -> str:
+        msgs = self._format_messages(messages)
+        self._emit_call_started_event(messages=msgs, from_task=from_task, from_agent=from_agent)
+        with self._lock:
+            self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        response = self._respond(msgs)
+        if self.stream:
+            words = response.split(" ")
+            for i in range(0, len(words), self.chunk_words):
+                chunk = " ".join(words[i:i + self.chunk_words]) + " "
+                self._emit_stream_chunk_event(chunk=chunk, from_task=from_task, from_agent=from_agent)
+        self._emit_call_completed_event(
+            response=response, call_type=LLMCallType.LLM_CALL,
+            from_task=from_task, from_agent=from_agent, messages=msgs,
+        )
+        return response
+
+    def get_context_window_size(self) -> int:
+        return 32768
+
+    def _respond(self, msgs: List[Dict[str, Any]]) -> str:
+        prompt = "\n".join(str(m.get("content", "")) for m in msgs)
+        match = _TOPIC_RE.search(prompt)
+        topic = match.group(1) if match else "Benchmark topic"
+        # cada ação já executada volta como mensagem do assistente (com a Observation)
+        done = sum(1 for m in msgs if m.get("role") == "assistant")
+        plan = [name for name in ("wikipedia_search", "wikipedia_fetch") if self.use_tools and name in prompt]
+
+        if done < len(plan):
+            tool = plan[done]
+            args = {"query": topic} if tool == "wikipedia_search" else {"title": topic.title()}
+            return (
+                f"Thought: I should use {tool} to gather facts.\n"
+                f"Action: {tool}\n"
+                f"Action Input: {json.dumps(args)}"
+            )
+        if plan:
+            return "Thought: I now know the final answer\nFinal Answer: " + self._research(topic)
+        return "Thought: I now know the final answer\nFinal Answer: " + self._article(topic)
+
+    def _research(self, topic: str) -> str:
+        url = f"https://en.wikipedia.org/wiki/{topic.title().replace(' ', '_')}"
+        bullets = [f"- Fact {i} about {topic}: {_paragraph(14)} ({url})" for i in range(1, 7)]
+        return "\n".join(bullets) + f"\n\nReferences (Wikipedia)\n- {url}"
+
+    def _article(self, topic: str) -> str:
+        url = f"https://en.wikipedia.org/wiki/{topic.title().replace(' ', '_')}"
+        per_section = max(1, self.body_words // 4)
+        sections = "\n\n".join(
+            f"## {name}\n\n{_paragraph(per_section)}"
+            for name in ("Introduction", "Background", "Key ideas", "Conclusion")
+        )
+        return (
+            f"# {topic.title()}\n\n## TL;DR\n{_paragraph(30)}\n\n{sections}\n\n"
+            f"## References (Wikipedia)\n- {url}"
+        )
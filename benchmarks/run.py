@@ -0,0 +1,363 @@
+"""
+Benchmarks da crew e da API, sem rede e sem Ollama.
+
+    python -m benchmarks.run                                  # todas as suites
+    python -m benchmarks.run --suites tools,sse --output out.json
+    python -m benchmarks.run --baseline out.json              # compara com um resultado anterior
+
+Suites:
+- tools: latência das tools do Wikipedia (sync e async) contra o stub local
+- crew:  tempo ponta a ponta de `ContentCreationCrewCrew` com o LLM falso
+- api:   execs/s pela app FastAPI (POST /runs + polling) com carga concorrente
+- sse:   custo do fan-out de eventos para N assinantes de `sse_iter`
+
+O resultado é um JSON ({"meta": ..., "results": {"suite.caso": {métricas}}}).
+Métricas terminadas em `_ms` são "menor é melhor"; `_per_s` são "maior é melhor".
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.wiki_stub import StubConfig, WikiStub
+
+SUITES = ("tools", "crew", "api", "sse")
+
+
+def _summary(samples_s: List[float]) -> Dict[str, Any]:
+    """Estatísticas de uma lista de durações (em segundos) convertidas para ms."""
+    ms = sorted(s * 1000 for s in samples_s)
+    if not ms:
+        return {"n": 0}
+    return {
+        "n": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p50_ms": round(ms[len(ms) // 2], 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def _timed(fn: Callable[[], Any], n: int) -> Dict[str, Any]:
+    """Roda `fn` n vezes; chamadas que levantam exceção (ex: erro injetado) contam em `errors`."""
+    samples, errors = [], 0
+    for _ in range(n):
+        t0 = time.perf_counter()
+        try:
+            fn()
+        except Exception:
+            errors += 1
+            continue
+        samples.append(time.perf_counter() - t0)
+    return {**_summary(samples), "errors": errors}
+
+
+def _prepare_env(stub: WikiStub, args: argparse.Namespace) -> None:
+    """
+    Aponta as tools para o stub e deixa a app em modo isolado; precisa rodar antes
+    de importar `content_creation_crew`/`api.app` (ambos leem o ambiente no import).
+    """
+    os.environ["WIKI_API_URL"] = stub.url
+    os.environ.setdefault("WIKI_CACHE_DISABLED", "0" if args.wiki_cache else "1")
+    os.environ.setdefault("WIKI_CACHE_PATH", "")
+    # sem limite de taxa contra o stub (os bloqueios de Retry-After continuam valendo)
+    os.environ.setdefault("WIKI_RATE_LIMIT_PATH", "")
+    os.environ.setdefault("WIKI_RATE_PER_SECOND", "0")
+    os.environ.setdefault("RUN_STORE_BACKEND", "memory")
+    os.environ.setdefault("RESULT_CACHE_TTL_HOURS", "0")  # sem memoização: cada POST roda a crew
+    os.environ.setdefault("MAX_CONCURRENT_RUNS", str(args.concurrency))
+    os.environ.setdefault("MAX_QUEUED_RUNS", str(max(50, args.api_runs)))
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+    os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+
+def _fake_llm(args: argparse.Namespace):
+    from benchmarks.fake_llm import FakeLLM
+
+    return FakeLLM(latency_s=args.llm_latency_ms / 1000, body_words=args.body_words)
+
+
+# ---- suites ---------------------------------------------------------------------------
+
+def bench_tools(args: argparse.Namespace, stub: WikiStub) -> Dict[str, Any]:
+    from content_creation_crew.tools.wikipedia_tool import WikipediaFetchTool, WikipediaSearchTool
+
+    search = WikipediaSearchTool()
+    fetch = WikipediaFetchTool()
+    extract_fetch = WikipediaFetchTool(section_mode="extract")
+    n = args.iterations
+    titles = [f"Bench page {i}" for i in range(10)]
+    results: Dict[str, Any] = {}
+
+    stub.reset_stats()
+    cases = {
+        "search_sync": lambda i: search._run(f"bench query {i}"),
+        "fetch_page_sync": lambda i: fetch._run(title=f"Bench page {i}"),
+        "fetch_section_parse_sync": lambda i: fetch._run(title=f"Bench page {i}", section="History"),
+        "fetch_section_extract_sync": lambda i: extract_fetch._run(title=f"Bench page {i}", section="History"),
+        "fetch_batch10_sync": lambda i: fetch._run(titles=[f"{t} {i}" for t in titles]),
+    }
+    for name, fn in cases.items():
+        counter = iter(range(10**9))
+        results[f"tools.{name}"] = _timed(lambda: fn(next(counter)), n)
+
+    async def concurrent_searches() -> float:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(search._arun(f"async query {i}") for i in range(n)), return_exceptions=True)
+        return time.perf_counter() - t0
+
+    elapsed = asyncio.run(concurrent_searches())
+    results["tools.search_async_concurrent"] = {
+        "n": n, "wall_ms": round(elapsed * 1000, 3), "calls_per_s": round(n / elapsed, 2),
+    }
+    results["tools.stub"] = stub.stats.as_dict()
+    return results
+
+
+def bench_crew(args: argparse.Namespace, stub: WikiStub) -> Dict[str, Any]:
+    from content_creation_crew.factory import CrewFactory
+
+    llm = _fake_llm(args)
+    factory = CrewFactory(llm=llm)
+    t0 = time.perf_counter()
+    factory.warm()
+    warm_s = time.perf_counter() - t0
+
+    stub.reset_stats()
+    samples = []
+    for i in range(args.crew_runs):
+        t0 = time.perf_counter()
+        crew = factory.new_crew()
+        result = crew.crew().kickoff(inputs={"topic": f"bench topic {i}"})
+        crew.enforce_min_words(str(result))
+        samples.append(time.perf_counter() - t0)
+    return {
+        "crew.warm": {"wall_ms": round(warm_s * 1000, 3)},
+        "crew.run": {
+            **_summary(samples),
+            "llm_calls_per_run": round(llm.calls / max(1, args.crew_runs), 2),
+            "wiki_requests_per_run": round(stub.stats.requests / max(1, args.crew_runs), 2),
+        },
+    }
+
+
+def bench_api(args: argparse.Namespace, stub: WikiStub) -> Dict[str, Any]:
+    import httpx
+
+    from content_creation_crew import factory as factory_mod
+    from content_creation_crew.factory import CrewFactory
+
+    factory_mod._FACTORY = CrewFactory(llm=_fake_llm(args))  # a app usa o LLM falso
+    from api.app.main import app
+
+    async def scenario() -> Dict[str, Any]:
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                latencies: List[float] = []
+                statuses: Dict[str, int] = {}
+
+                async def one(i: int) -> None:
+                    t0 = time.perf_counter()
+                    r = await client.post("/runs", json={"topic": f"api bench {uuid.uuid4().hex[:8]} {i}"})
+                    if r.status_code != 200:
+                        statuses[str(r.status_code)] = statuses.get(str(r.status_code), 0) + 1
+                        return
+                    run_id = r.json()["run_id"]
+                    while True:
+                        await asyncio.sleep(args.poll_ms / 1000)
+                        data = (await client.get(f"/runs/{run_id}")).json()
+                        if data.get("status") not in ("queued", "running"):
+                            break
+                    statuses[data["status"]] = statuses.get(data["status"], 0) + 1
+                    latencies.append(time.perf_counter() - t0)
+
+                t0 = time.perf_counter()
+                await asyncio.gather(*(one(i) for i in range(args.api_runs)))
+                wall = time.perf_counter() - t0
+        return {
+            "api.runs": {
+                **_summary(latencies),
+                "runs": args.api_runs,
+                "concurrency": args.concurrency,
+                "wall_ms": round(wall * 1000, 3),
+                "runs_per_s": round(len(latencies) / wall, 3),
+                "statuses": statuses,
+            }
+        }
+
+    return asyncio.run(scenario())
+
+
+def bench_sse(args: argparse.Namespace, stub: WikiStub) -> Dict[str, Any]:
+    from api.app.routers.stream import sse_iter
+    from api.app.services.events import BUS
+    from api.app.services.store import DB
+
+    results: Dict[str, Any] = {}
+    for subscribers in args.sse_subscribers:
+        run_id = f"bench-sse-{uuid.uuid4().hex[:8]}"
+        DB.put(run_id, {"status": "running", "step": "writing"})
+        published: Dict[int, float] = {}
+        delays: List[float] = []
+
+        async def consume(ready: asyncio.Event, counter: List[int]) -> None:
+            seen = 0
+            async for chunk in sse_iter(run_id):
+                seen += 1
+                if seen == 2:  # ping inicial, depois o snapshot (já com a assinatura no bus)
+                    counter[0] += 1
+                    if counter[0] == subscribers:
+                        ready.set()
+                if chunk.startswith("id: "):
+                    event_id = int(chunk[4:chunk.index("\n")])
+                    delays.append(time.perf_counter() - published[event_id])
+
+        def publisher() -> None:
+            # canal novo: os ids começam em 1, então o instante é registrado antes do publish
+            for i in range(1, args.sse_events + 1):
+                published[i] = time.perf_counter()
+                BUS.publish(run_id, "token", {"text": f"chunk {i} "})
+            published[args.sse_events + 1] = time.perf_counter()
+            BUS.publish(run_id, "update", {"status": "finished", "step": None, "error": None}, final=True)
+
+        async def scenario() -> float:
+            ready = asyncio.Event()
+            counter = [0]
+            tasks = [asyncio.create_task(consume(ready, counter)) for _ in range(subscribers)]
+            await ready.wait()
+            await asyncio.sleep(0.05)  # deixa todos chegarem ao loop de espera do bus
+            t0 = time.perf_counter()
+            await asyncio.to_thread(publisher)
+            await asyncio.gather(*tasks)
+            return time.perf_counter() - t0
+
+        wall = asyncio.run(scenario())
+        DB.delete(run_id)
+        delivered = len(delays)
+        results[f"sse.fanout_{subscribers}"] = {
+            **_summary(delays),
+            "subscribers": subscribers,
+            "events": args.sse_events + 1,
+            "wall_ms": round(wall * 1000, 3),
+            "deliveries_per_s": round(delivered / wall, 1) if wall else None,
+        }
+    return results
+
+
+# ---- comparação -----------------------------------------------------------------------
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Linhas com as variações em relação ao baseline; marcam REGRESSION quando pioram mais que `threshold`.
+    """
+    lines = []
+    for case, metrics in sorted(current.get("results", {}).items()):
+        base = baseline.get("results", {}).get(case)
+        if not isinstance(base, dict):
+            continue
+        for key, value in metrics.items():
+            old = base.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            if key.endswith("_ms"):
+                change = (value - old) / old
+            elif key.endswith("_per_s"):
+                change = (old - value) / old
+            else:
+                continue
+            flag = "REGRESSION" if change > threshold else ""
+            lines.append(f"{case:38} {key:18} {old:>12.3f} -> {value:>12.3f}  {change:+7.1%} {flag}".rstrip())
+    return lines
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--suites", default=",".join(SUITES), help="lista separada por vírgula: " + ",".join(SUITES))
+    p.add_argument("--iterations", type=int, default=50, help="chamadas por caso na suite tools")
+    p.add_argument("--wiki-latency-ms", type=float, default=20.0)
+    p.add_argument("--wiki-jitter-ms", type=float, default=0.0)
+    p.add_argument("--wiki-error-rate", type=float, default=0.0, help="fração de respostas com erro")
+    p.add_argument("--wiki-error-status", type=int, default=429, choices=(403, 429))
+    p.add_argument("--wiki-retry-after", type=int, default=None)
+    p.add_argument("--wiki-cache", action="store_true", help="mantém o cache de respostas do Wikipedia")
+    p.add_argument("--llm-latency-ms", type=float, default=50.0)
+    p.add_argument("--body-words", type=int, default=360)
+    p.add_argument("--crew-runs", type=int, default=5)
+    p.add_argument("--api-runs", type=int, default=20)
+    p.add_argument("--concurrency", type=int, default=4, help="MAX_CONCURRENT_RUNS da app")
+    p.add_argument("--poll-ms", type=float, default=20.0)
+    p.add_argument("--sse-subscribers", default="1,10,100", help="lista de quantidades de assinantes")
+    p.add_argument("--sse-events", type=int, default=500)
+    p.add_argument("--output", help="arquivo JSON de saída (padrão: stdout)")
+    p.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    p.add_argument("--threshold", type=float, default=0.10, help="piora tolerada na comparação (0.10 = 10%%)")
+    args = p.parse_args(argv)
+    args.sse_subscribers = [int(x) for x in args.sse_subscribers.split(",") if x.strip()]
+
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        p.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    config = StubConfig(
+        latency_s=args.wiki_latency_ms / 1000,
+        jitter_s=args.wiki_jitter_ms / 1000,
+        error_rate=args.wiki_error_rate,
+        error_status=args.wiki_error_status,
+        retry_after=args.wiki_retry_after,
+    )
+    runners = {"tools": bench_tools, "crew": bench_crew, "api": bench_api, "sse": bench_sse}
+    results: Dict[str, Any] = {}
+    with WikiStub(config) as stub:
+        _prepare_env(stub, args)
+        for suite in suites:
+            results.update(runners[suite](args, stub))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "suites": suites,
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            lines = compare(report, json.load(f), args.threshold)
+        print("\n".join(lines), file=sys.stderr)
+        if any(line.endswith("REGRESSION") for line in lines):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Servidor local que imita a API do MediaWiki usada pelas tools do Wikipedia.
+
+Respostas determinísticas (geradas a partir do título) para `list=search`,
+`prop=extracts` (com `exintro`, `exsectionformat=wiki` e `revisions`) e
+`action=parse` (`sections|revid` e `text`), com latência configurável e
+injeção de erros 429/403.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+_WORDS = (
+    "theory system history language model science field research early modern "
+    "development structure process energy particle network method culture period "
+    "state concept practice example data function form order value group result"
+).split()
+
+_SECTIONS = ("History", "Overview", "Applications", "Criticism", "See also")
+
+
+def _text(seed: str, words: int) -> str:
+    """Texto pseudo-aleatório, sempre o mesmo para a mesma semente."""
+    rnd = random.Random(hashlib.sha1(seed.encode("utf-8")).hexdigest())
+    out = []
+    for i in range(words):
+        w = rnd.choice(_WORDS)
+        out.append(w.capitalize() if i % 12 == 0 else w)
+        if i % 12 == 11:
+            out[-1] += "."
+    return " ".join(out) + "."
+
+
+@dataclass
+class StubConfig:
+    latency_s: float = 0.0  # atraso fixo por requisição
+    jitter_s: float = 0.0  # atraso extra uniforme em [0, jitter_s]
+    error_rate: float = 0.0  # fração das requisições que falham com `error_status`
+    error_status: int = 429  # 429 (rate limit) ou 403
+    retry_after: Optional[int] = None  # cabeçalho Retry-After nas respostas de erro
+    paragraph_words: int = 120  # palavras por parágrafo/seção
+    seed: int = 0
+
+
+@dataclass
+class StubStats:
+    requests: int = 0
+    errors: int = 0
+    by_endpoint: Dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "errors": self.errors, "by_endpoint": dict(self.by_endpoint)}
+
+
+class WikiStub:
+    """
+    Stub da API em uma thread própria. `url` segue o formato de `WIKI_API_URL`
+    (com `{lang}`), então pode ser usado direto pelas tools.
+
+        with WikiStub(StubConfig(latency_s=0.05)) as stub:
+            os.environ["WIKI_API_URL"] = stub.url
+    """
+
+    def __init__(self, config: Optional[StubConfig] = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config or StubConfig()
+        self.stats = StubStats()
+        self._lock = threading.Lock()
+        self._rnd = random.Random(self.config.seed)
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/{{lang}}/w/api.php"
+
+    def start(self) -> "WikiStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="wiki-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats = StubStats()
+
+    def __enter__(self) -> "WikiStub":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    # ---- respostas -------------------------------------------------------------------
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            return self.config.error_rate > 0 and self._rnd.random() < self.config.error_rate
+
+    def _record(self, endpoint: str, failed: bool) -> None:
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.errors += int(failed)
+            self.stats.by_endpoint[endpoint] = self.stats.by_endpoint.get(endpoint, 0) + 1
+
+    def respond(self, params: Dict[str, str]) -> Dict[str, Any]:
+        """Resposta JSON da API para os parâmetros (sem latência nem erros)."""
+        action = params.get("action")
+        if action == "query" and params.get("list") == "search":
+            return self._search(params)
+        if action == "query" and "extracts" in params.get("prop", ""):
+            return self._extracts(params)
+        if action == "parse":
+            return self._parse(params)
+        return {"error": {"code": "badvalue", "info": "Unsupported request in WikiStub"}}
+
+    def _search(self, params: Dict[str, str]) -> Dict[str, Any]:
+        q = params.get("srsearch", "").strip()
+        limit = int(params.get("srlimit") or 10)
+        results = []
+        for i in range(limit):
+            title = q.title() if i == 0 else f"{q.title()} ({_WORDS[i % len(_WORDS)]})"
+            snippet = _text(f"snippet:{title}", 25).replace(
+                _WORDS[0], f'<span class="searchmatch">{_WORDS[0]}</span>', 1
+            )
+            results.append({"ns": 0, "title": title, "pageid": 1000 + i, "snippet": snippet})
+        return {"batchcomplete": "", "query": {"searchinfo": {"totalhits": limit}, "search": results}}
+
+    def _page_text(self, title: str, wiki_sections: bool) -> str:
+        words = self.config.paragraph_words
+        parts = [_text(f"intro:{title}", words)]
+        for name in _SECTIONS:
+            body = _text(f"{name}:{title}", words)
+            parts.append(f"== {name} ==\n{body}" if wiki_sections else body)
+        return "\n\n".join(parts)
+
+    def _extracts(self, params: Dict[str, str]) -> Dict[str, Any]:
+        titles = [t for t in params.get("titles", "").split("|") if t]
+        query: Dict[str, Any] = {"pages": {}}
+        normalized = []
+        for i, raw in enumerate(titles):
+            title = raw[:1].upper() + raw[1:]
+            if title != raw:
+                normalized.append({"from": raw, "to": title})
+            if title.lower().startswith("missing"):
+                query["pages"][str(-1 - i)] = {"ns": 0, "title": title, "missing": ""}
+                continue
+            if "exintro" in params:
+                extract = _text(f"intro:{title}", self.config.paragraph_words)
+            else:
+                extract = self._page_text(title, params.get("exsectionformat") == "wiki")
+            page: Dict[str, Any] = {"pageid": 2000 + i, "ns": 0, "title": title, "extract": extract}
+            if "revisions" in params.get("prop", ""):
+                page["revisions"] = [{"revid": 90000 + i}]
+            query["pages"][str(2000 + i)] = page
+        if normalized:
+            query["normalized"] = normalized
+        return {"batchcomplete": "", "query": query}
+
+    def _parse(self, params: Dict[str, str]) -> Dict[str, Any]:
+        prop = params.get("prop", "")
+        title = params.get("page") or f"Revision {params.get('oldid', '0')}"
+        if "sections" in prop:
+            sections = [
+                {"toclevel": 1, "level": "2", "line": name, "number": str(i), "index": str(i)}
+                for i, name in enumerate(_SECTIONS, start=1)
+            ]
+            return {"parse": {"title": title, "pageid": 3000, "revid": 91000, "sections": sections}}
+        section = int(params.get("section") or 0)
+        name = _SECTIONS[section - 1] if 0 < section <= len(_SECTIONS) else "Intro"
+        paragraphs = "".join(
+            f"<p>{_text(f'{name}:{title}:{i}', self.config.paragraph_words)}<sup class=\"reference\">[{i}]</sup></p>"
+            for i in range(3)
+        )
+        html = f'<div class="mw-parser-output"><h2>{name}</h2>{paragraphs}</div>'
+        return {"parse": {"title": title, "pageid": 3000, "text": {"*": html}}}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # cabeçalho e corpo vão em writes separados
+
+            def do_GET(self) -> None:  # noqa: N802
+                params = {k: v[-1] for k, v in parse_qs(urlparse(self.path).query).items()}
+                cfg = stub.config
+                delay = cfg.latency_s + (stub._rnd.uniform(0, cfg.jitter_s) if cfg.jitter_s else 0.0)
+                if delay:
+                    time.sleep(delay)
+                endpoint = params.get("list") or params.get("action") or "unknown"
+                if params.get("action") == "query" and "extracts" in params.get("prop", ""):
+                    endpoint = "extracts"
+                if stub._should_fail():
+                    stub._record(endpoint, True)
+                    body = b'{"error": {"code": "ratelimited"}}'
+                    self.send_response(cfg.error_status)
+                    if cfg.retry_after is not None:
+                        self.send_header("Retry-After", str(cfg.retry_after))
+                else:
+                    stub._record(endpoint, False)
+                    body = json.dumps(stub.respond(params)).encode("utf-8")
+                    self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
@@ -1,8 +1,132 @@
+import copy
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+import yaml
 from crewai import Agent, Crew, Process, Task
-from crewai.project import CrewBase, agent, crew, task
+from crewai.project import CrewBase, agent, before_kickoff, crew, task
 from crewai import LLM
-from content_creation_crew.tools.wordcount_tool import BodyWordCountTool  
+from crewai.llm import CONTEXT_WINDOW_USAGE_RATIO
+from content_creation_crew import tracing
+from content_creation_crew.ollama import http_handler, ollama_model_name
+from content_creation_crew.tools.wordcount_tool import BodyWordCountTool, body_word_count  
 from content_creation_crew.tools.wikipedia_tool import WikipediaSearchTool, WikipediaFetchTool  
+from content_creation_crew.tools.wiki_prefetch import prefetch_research, research_context
+
+# tasks da crew, na ordem em que rodam (Process.sequential)
+CREW_TASKS = ("research", "writing", "editing")
+# etapas de uma exec: as tasks da crew + o pós-processamento de contagem de palavras
+RUN_STEPS = CREW_TASKS + ("enforce_min_words",)
+
+# mínimo de palavras no CORPO do artigo (exclui título, TL;DR, headings e referências)
+DEFAULT_MIN_BODY_WORDS = 300
+
+# páginas lidas antes do pesquisador rodar (ver `prefetch_research`); 0 desativa
+DEFAULT_PREFETCH_PAGES = 3
+
+# LLM padrão (sobrescrito por MODEL_ID / OLLAMA_BASE_URL, os mesmos nomes da config da API)
+DEFAULT_MODEL_ID = "ollama/mistral"
+DEFAULT_BASE_URL = "http://localhost:11434"
+
+# agentes da crew; o editor (revisão e expansão) usa o LLM com streaming
+AGENTS = ("researcher", "writer", "editor")
+STREAMING_AGENT = "editor"
+# chaves aceitas em `llm_settings` (agents.yaml) e nos overrides por exec
+LLM_SETTINGS_KEYS = ("model", "context_window", "max_tokens")
+
+
+@lru_cache(maxsize=None)
+def _parse_yaml(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        content = yaml.safe_load(f)
+    return content if isinstance(content, dict) else {}
+
+
+def load_yaml_cached(config_path: Path) -> Dict[str, Any]:
+    """
+    YAML de config parseado uma vez por processo; cada instância recebe uma cópia
+    (o CrewBase altera o dict ao mapear llm/tools dos agentes).
+    """
+    return copy.deepcopy(_parse_yaml(str(config_path)))
+
+
+def build_llm(
+    model_id: Optional[str] = None,
+    base_url: Optional[str] = None,
+    stream: bool = False,
+    context_window: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+) -> LLM:
+    """
+    LLM da crew; sem argumentos usa MODEL_ID / OLLAMA_BASE_URL do ambiente.
+    Modelos do Ollama usam o cliente HTTP compartilhado do processo (conexões reaproveitadas).
+    Com `stream=True` a resposta chega em chunks (`LLMStreamChunkEvent`).
+    `context_window` vira o `num_ctx` do Ollama e o limite que o CrewAI usa para resumir o histórico;
+    `max_tokens` limita cada resposta.
+    """
+    model_id = model_id or os.getenv("MODEL_ID") or DEFAULT_MODEL_ID
+    extra: Dict[str, Any] = {}
+    if ollama_model_name(model_id):
+        extra["client"] = http_handler()
+        if context_window:
+            extra["num_ctx"] = context_window
+    llm = LLM(
+        model=model_id,
+        base_url=base_url or os.getenv("OLLAMA_BASE_URL") or DEFAULT_BASE_URL,
+        stream=stream,
+        max_tokens=max_tokens,
+        **extra,
+    )
+    if context_window:
+        llm.context_window_size = int(context_window * CONTEXT_WINDOW_USAGE_RATIO)
+    return llm
+
+
+def llm_settings(agent_config: Dict[str, Any], overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    `llm_settings` do agente no agents.yaml (model, context_window, max_tokens) com os
+    overrides aplicados por cima; valores vazios ficam de fora.
+    """
+    merged = {**(agent_config.get("llm_settings") or {}), **(overrides or {})}
+    unknown = set(merged) - set(LLM_SETTINGS_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown llm_settings keys: {sorted(unknown)}")
+    return {k: v for k, v in merged.items() if v is not None}
+
+
+def agent_llm(settings: Dict[str, Any], base_url: Optional[str] = None, stream: bool = False) -> LLM:
+    """
+    LLM de um agente a partir do `llm_settings` (ver `llm_settings`).
+    """
+    return build_llm(
+        settings.get("model"), base_url, stream=stream,
+        context_window=settings.get("context_window"), max_tokens=settings.get("max_tokens"),
+    )
+
+
+def streaming_llm(llm: Any) -> Any:
+    """
+    Variante com streaming de um LLM já montado (cópia rasa com `stream=True`),
+    usada pelo editor para que o texto final chegue aos clientes token a token.
+    """
+    if not hasattr(llm, "stream") or llm.stream:
+        return llm
+    clone = copy.copy(llm)
+    clone.stream = True
+    return clone
+
+
+def build_tools() -> Dict[str, Any]:
+    """
+    Instâncias das tools (sem estado por exec, podem ser compartilhadas entre crews).
+    """
+    return {
+        "wiki_search": WikipediaSearchTool(lang="en", max_chars=1800),
+        "wiki_fetch": WikipediaFetchTool(lang="en", max_chars=6000),
+        "word_count": BodyWordCountTool(),  # Instância do tool de contagem de palavras
+    }
+
 
 @CrewBase
 class ContentCreationCrewCrew():
@@ -11,21 +135,72 @@ class ContentCreationCrewCrew():
     agents_config = 'config/agents.yaml'
     tasks_config = 'config/tasks.yaml'
 
-    def __init__(self) -> None:
-        self.llm = LLM(
-            model="ollama/mistral",
-            base_url="http://localhost:11434"
-        )
+    def __init__(
+        self,
+        step_callback: Optional[Callable[[Any], None]] = None,
+        task_callback: Optional[Callable[[Any], None]] = None,
+        llm: Optional[LLM] = None,
+        tools: Optional[Dict[str, Any]] = None,
+        min_body_words: int = DEFAULT_MIN_BODY_WORDS,
+        agent_llms: Optional[Dict[str, Any]] = None,
+        prefetch_pages: Optional[int] = None,
+    ) -> None:
+        # callbacks de progresso: cada passo dos agentes (ex: chamada de tool) e cada task concluida
+        self.step_callback = step_callback
+        self.task_callback = task_callback
+        self.min_body_words = min_body_words
+        if prefetch_pages is None:
+            prefetch_pages = int(os.getenv("RESEARCH_PREFETCH_PAGES") or DEFAULT_PREFETCH_PAGES)
+        self.prefetch_pages = max(0, prefetch_pages)
+        # o CrewBase carrega os YAML depois do __init__ chamando self.load_yaml:
+        # a versão em cache evita reparsear os arquivos a cada instância
+        self.load_yaml = load_yaml_cached
+        # LLMs e tools podem vir prontos (ver CrewFactory) para não recriá-los a cada exec:
+        # `agent_llms` por agente, ou um `llm` único para todos; sem nada, cada agente
+        # monta o seu a partir do `llm_settings` do agents.yaml
+        self.llm = llm
+        self.agent_llms: Dict[str, Any] = dict(agent_llms or {})
         # ✅ instâncias de BaseTool do CrewAI
-        self.wiki_search = WikipediaSearchTool(lang="en", max_chars=1800)
-        self.wiki_fetch  = WikipediaFetchTool(lang="en", max_chars=6000)
-        self.word_count_tool = BodyWordCountTool()  # Instância do tool de contagem de palavras
+        tools = tools or build_tools()
+        self.wiki_search = tools["wiki_search"]
+        self.wiki_fetch  = tools["wiki_fetch"]
+        self.word_count_tool = tools["word_count"]
+
+    def _agent_llm(self, name: str) -> Any:
+        """
+        LLM do agente; o editor gera o artigo final (revisão e expansão) e usa streaming
+        para o texto sair enquanto é gerado.
+        """
+        llm = self.agent_llms.get(name)
+        if llm is None:
+            stream = name == STREAMING_AGENT
+            if self.llm is not None:
+                llm = streaming_llm(self.llm) if stream else self.llm
+            else:
+                llm = agent_llm(llm_settings(self.agents_config[name]), stream=stream)
+            self.agent_llms[name] = llm
+        return llm
+
+    @before_kickoff
+    def prefetch(self, inputs: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Preenche `{research_context}` da research_task: com `prefetch_pages`, o material do
+        Wikipedia sobre o tema já buscado em paralelo (o pesquisador sintetiza em vez de navegar).
+        """
+        inputs = dict(inputs or {})
+        if "research_context" not in inputs:
+            topic = str(inputs.get("topic") or "").strip()
+            material = ""
+            if self.prefetch_pages and topic:
+                material = prefetch_research(topic, self.wiki_search, self.wiki_fetch, pages=self.prefetch_pages)
+            inputs["research_context"] = research_context(material)
+        return inputs
 
     @agent
     def researcher(self) -> Agent:
         return Agent(
             config=self.agents_config['researcher'],
-            llm=self.llm,
+            llm=self._agent_llm('researcher'),
             tools=[self.wiki_search, self.wiki_fetch],  # apenas Wikipedia
             allow_delegation=False, #nao permite delegar para outro agente
             verbose=True,
@@ -35,7 +210,7 @@ class ContentCreationCrewCrew():
     def writer(self) -> Agent:
         return Agent(
             config=self.agents_config['writer'],
-            llm=self.llm,
+            llm=self._agent_llm('writer'),
             tools=[self.word_count_tool],  # Adiciona a ferramenta de contagem de palavras
             allow_delegation=False,
             verbose=True,
@@ -45,7 +220,7 @@ class ContentCreationCrewCrew():
     def editor(self) -> Agent:
         return Agent(
             config=self.agents_config['editor'],
-            llm=self.llm,
+            llm=self._agent_llm('editor'),
             tools=[],
             allow_delegation=False,
             verbose=True,
@@ -74,34 +249,65 @@ class ContentCreationCrewCrew():
             context=[self.writing_task()],
         )
 
-    @task
-    def enforce_min_words_task(self) -> Task:
+    def expand_body_task(self, article: str, body_words: int) -> Task:
         """
-        Esta task usa a tool `body_word_count` para medir o corpo do artigo
-        (exclui Title, TL;DR, headings e a seção "References (Wikipedia)").
-        Se < 300, expande SOMENTE o corpo até ≥ 300 palavras, mantendo título,
-        headings e a lista de referências/URLs exatamente como estão.
+        Task de expansão, usada só quando o corpo medido ficou abaixo do mínimo:
+        expande SOMENTE o corpo, mantendo título, headings e a lista de referências/URLs
+        exatamente como estão. Não entra na crew sequencial (ver `enforce_min_words`).
         """
+        target = self.min_body_words
         return Task(
             description=(
-                "Use the `body_word_count` tool to compute the BODY word count of the Markdown article below "
-                "(exclude Title, TL;DR, all headings, and the 'References (Wikipedia)' section). "
-                "If the BODY has 300 words or more, return the article EXACTLY as-is. "
-                "If the BODY has fewer than 300 words, expand ONLY the BODY to reach at least 300 words, "
+                f"The BODY of the Markdown article below has {body_words} words "
+                "(excluding Title, TL;DR, all headings, and the 'References (Wikipedia)' section). "
+                f"Expand ONLY the BODY to reach at least {target} words, "
                 "preserving the existing Title, all headings, and keeping the 'References (Wikipedia)' list "
                 "identical (same entries, same URLs). Do NOT add new links or sources; only elaborate using "
-                "the already-present research facts and explanations."
+                "the already-present research facts and explanations. Return the full article.\n\n"
+                "--- ARTICLE ---\n" + article
             ),
-            agent=self.editor(),                 # o editor já tem a tool
-            context=[self.editing_task()],       # pega o artigo já editado
-            expected_output="A Markdown article whose BODY is ≥ 300 words (or unchanged if already ≥ 300).",
+            agent=self.editor(),
+            expected_output=f"The full Markdown article whose BODY is ≥ {target} words.",
         )
 
+    def enforce_min_words(self, markdown: str) -> Tuple[str, int]:
+        """
+        Mede o corpo do artigo em Python (`body_word_count`) e só chama o LLM para
+        expandir quando está abaixo de `min_body_words`.
+        Retorna (artigo final, palavras no corpo).
+        """
+        with tracing.span("enforce_min_words", "task", min_words=self.min_body_words) as sp:
+            with tracing.span("word_count", "tool", chars=len(markdown)):
+                words = body_word_count(markdown)
+            sp.set(words_before=words, expanded=False)
+            if words >= self.min_body_words:
+                return markdown, words
+            task = self.expand_body_task(markdown, words)
+            trace = tracing.current()
+            if trace is not None:
+                trace.register_task(task, sp)  # chamadas ao LLM da expansão entram neste span
+            expander = Crew(
+                agents=[self.editor()],
+                tasks=[task],
+                process=Process.sequential,
+                step_callback=self.step_callback,
+                verbose=True,
+            )
+            expanded = str(expander.kickoff()).strip()  # sem inputs: o artigo não é interpolado
+            with tracing.span("word_count", "tool", chars=len(expanded)):
+                expanded_words = body_word_count(expanded)
+            if expanded_words <= words:
+                return markdown, words  # a expansão não ajudou; mantém o artigo revisado
+            sp.set(expanded=True, words_after=expanded_words)
+            return expanded, expanded_words
+
     @crew
     def crew(self) -> Crew:
         return Crew(
             agents=self.agents,
-            tasks=self.tasks,        # a enforce_min_words_task vem por último (sequencial)
+            tasks=self.tasks,        # research -> writing -> editing (sequencial)
             process=Process.sequential,
+            step_callback=self.step_callback,
+            task_callback=self.task_callback,
             verbose=True,
         )
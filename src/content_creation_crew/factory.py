@@ -0,0 +1,203 @@
+from __future__ import annotations
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+from content_creation_crew.crew import (
+    AGENTS,
+    ContentCreationCrewCrew,
+    CREW_TASKS,
+    DEFAULT_BASE_URL,
+    DEFAULT_MIN_BODY_WORDS,
+    DEFAULT_MODEL_ID,
+    DEFAULT_PREFETCH_PAGES,
+    STREAMING_AGENT,
+    agent_llm,
+    build_tools,
+    llm_settings,
+    load_yaml_cached,
+)
+from content_creation_crew.ollama import OllamaPool
+
+# campos obrigatórios nos YAML de config
+_REQUIRED_AGENT_FIELDS = ("role", "goal", "backstory")
+_REQUIRED_TASK_FIELDS = ("description", "expected_output")
+
+
+class CrewFactory:
+    """
+    Prepara uma vez o que é caro na criação da crew (imports, YAML, LLM e tools)
+    e entrega instâncias baratas por exec.
+
+    Cada exec recebe agentes e tasks novos (eles guardam estado da execução);
+    LLM e tools não têm estado por exec e são compartilhados entre crews concorrentes.
+
+    Sem `llm` pronto, cada agente usa o LLM do seu `llm_settings` (agents.yaml, com
+    `model_id` como modelo padrão), montado por endpoint do Ollama (`base_urls`); cada
+    exec roda no endpoint alugado com `endpoint()` (o com menos execs em andamento).
+    `prefetch_pages`: páginas do Wikipedia lidas antes do pesquisador (0 desativa).
+    """
+
+    def __init__(
+        self,
+        llm: Optional[Any] = None,
+        tools: Optional[Dict[str, Any]] = None,
+        model_id: Optional[str] = None,
+        base_urls: Optional[Sequence[str]] = None,
+        keep_alive: str = "30m",
+        prefetch_pages: Optional[int] = None,
+    ) -> None:
+        base = ContentCreationCrewCrew.base_directory
+        self.agents_config = load_yaml_cached(base / ContentCreationCrewCrew.original_agents_config_path)
+        self.tasks_config = load_yaml_cached(base / ContentCreationCrewCrew.original_tasks_config_path)
+        self.validate()
+        self.model_id = model_id or os.getenv("MODEL_ID") or DEFAULT_MODEL_ID
+        # LLM injetado (ex: benchmarks) vale para todos os agentes e não passa pelo pool de endpoints
+        self.pool: Optional[OllamaPool] = None
+        if llm is None:
+            urls = base_urls or [os.getenv("OLLAMA_BASE_URL") or DEFAULT_BASE_URL]
+            models = [(s["model"], s.get("context_window")) for s in self.agent_settings().values()]
+            self.pool = OllamaPool(urls, models, keep_alive=keep_alive)
+        self.llm = llm
+        self._llms: Dict[Tuple[Any, ...], Any] = {}
+        self.tools = tools or build_tools()
+        if prefetch_pages is None:
+            prefetch_pages = int(os.getenv("RESEARCH_PREFETCH_PAGES") or DEFAULT_PREFETCH_PAGES)
+        self.prefetch_pages = prefetch_pages
+        self._warm = False
+        self._lock = threading.Lock()
+
+    def agent_settings(self, overrides: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        `llm_settings` de cada agente: agents.yaml + `overrides` (ex: `agent_models` do request),
+        sempre com `model` (padrão: `model_id`).
+        """
+        overrides = overrides or {}
+        unknown = set(overrides) - set(AGENTS)
+        if unknown:
+            raise ValueError(f"Unknown agents: {sorted(unknown)}")
+        return {
+            name: {"model": self.model_id, **llm_settings(self.agents_config[name], overrides.get(name))}
+            for name in AGENTS
+        }
+
+    def llm_for(self, endpoint: str, settings: Dict[str, Any], stream: bool = False) -> Any:
+        """
+        LLM de um `llm_settings` no endpoint (um por endpoint/settings/streaming, reaproveitado entre execs).
+        """
+        key = (endpoint, stream) + tuple(sorted(settings.items()))
+        llm = self._llms.get(key)
+        if llm is None:
+            with self._lock:
+                llm = self._llms.get(key)
+                if llm is None:
+                    llm = self._llms[key] = agent_llm(settings, endpoint, stream=stream)
+        return llm
+
+    @contextmanager
+    def endpoint(self) -> Iterator[Optional[str]]:
+        """
+        Aluga o endpoint do Ollama para uma exec (None com LLM injetado).
+        """
+        if self.pool is None:
+            yield None
+            return
+        with self.pool.lease() as endpoint:
+            yield endpoint
+
+    def validate(self) -> None:
+        """
+        Confere se agentes/tasks esperados existem no YAML com os campos obrigatórios.
+        """
+        problems = []
+        for name in AGENTS:
+            cfg = self.agents_config.get(name) or {}
+            problems += [f"agents.yaml: {name}.{f} missing" for f in _REQUIRED_AGENT_FIELDS if not cfg.get(f)]
+            try:
+                llm_settings(cfg)
+            except ValueError as e:
+                problems.append(f"agents.yaml: {name}.llm_settings: {e}")
+        for name in ("research_task", "writing_task", "editing_task"):
+            cfg = self.tasks_config.get(name) or {}
+            problems += [f"tasks.yaml: {name}.{f} missing" for f in _REQUIRED_TASK_FIELDS if not cfg.get(f)]
+        if problems:
+            raise ValueError("Invalid crew config: " + "; ".join(problems))
+
+    def warm(self) -> None:
+        """
+        Monta uma crew completa uma vez (valida agentes/tasks e aquece os imports do CrewAI).
+        """
+        if self._warm:
+            return
+        crew = self.new_crew()
+        with self._lock:
+            if self._warm:
+                return
+            built = crew.crew()
+            if len(built.tasks) != len(CREW_TASKS):
+                raise ValueError(f"Expected {len(CREW_TASKS)} tasks, got {len(built.tasks)}")
+            self._warm = True
+
+    def new_crew(
+        self,
+        step_callback: Optional[Callable[[Any], None]] = None,
+        task_callback: Optional[Callable[[Any], None]] = None,
+        min_body_words: int = DEFAULT_MIN_BODY_WORDS,
+        endpoint: Optional[str] = None,
+        agent_models: Optional[Dict[str, Dict[str, Any]]] = None,
+    ) -> ContentCreationCrewCrew:
+        """
+        Instância por exec, reaproveitando LLMs, tools e YAML já carregados.
+        `endpoint`: endpoint do Ollama alugado com `endpoint()` (padrão: o primeiro).
+        `agent_models`: overrides de `llm_settings` por agente (ver `agent_settings`).
+        """
+        agent_llms = None
+        if self.pool is not None:
+            endpoint = endpoint or self.pool.endpoints[0]
+            agent_llms = {
+                name: self.llm_for(endpoint, settings, stream=name == STREAMING_AGENT)
+                for name, settings in self.agent_settings(agent_models).items()
+            }
+        return ContentCreationCrewCrew(
+            step_callback=step_callback,
+            task_callback=task_callback,
+            llm=self.llm,
+            tools=self.tools,
+            min_body_words=min_body_words,
+            agent_llms=agent_llms,
+            prefetch_pages=self.prefetch_pages,
+        )
+
+
+_FACTORY: Optional[CrewFactory] = None
+_FACTORY_LOCK = threading.Lock()
+# argumentos da factory compartilhada (ver `configure_crew_factory`)
+_FACTORY_CONFIG: Dict[str, Any] = {}
+
+
+def configure_crew_factory(
+    model_id: str,
+    base_urls: Sequence[str],
+    keep_alive: str = "30m",
+    prefetch_pages: Optional[int] = None,
+) -> None:
+    """
+    Modelo, endpoints e pré-busca da factory compartilhada (a API passa os da sua config
+    no startup). Não substitui uma factory já criada.
+    """
+    _FACTORY_CONFIG.update(
+        model_id=model_id, base_urls=list(base_urls), keep_alive=keep_alive, prefetch_pages=prefetch_pages,
+    )
+
+
+def get_crew_factory() -> CrewFactory:
+    """
+    Factory compartilhada do processo (criada na primeira chamada).
+    """
+    global _FACTORY
+    if _FACTORY is None:
+        with _FACTORY_LOCK:
+            if _FACTORY is None:
+                _FACTORY = CrewFactory(**_FACTORY_CONFIG)
+    return _FACTORY
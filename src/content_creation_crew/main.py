@@ -2,6 +2,7 @@ from dotenv import load_dotenv
 load_dotenv()
 import sys
 from content_creation_crew.crew import ContentCreationCrewCrew
+from content_creation_crew.tools.wiki_chunks import topic_scope
 
 def run():
     """
@@ -26,11 +27,16 @@ def run():
     }
     
     try:
-        result = ContentCreationCrewCrew().crew().kickoff(inputs=inputs)
+        crew = ContentCreationCrewCrew()
+        with topic_scope(topic):  # as tools do Wikipedia ranqueiam os trechos pelo tema
+            result = crew.crew().kickoff(inputs=inputs)
+        # garante o mínimo de palavras no corpo (o LLM só é chamado se faltar texto)
+        result, body_words = crew.enforce_min_words(str(result))
         print("\n" + "="*50)
         print("FINAL RESULT:")
         print("="*50)
         print(result)
+        print(f"\n(body: {body_words} words)")
     except Exception as e:
         print(f"An error occurred: {e}")
         print("Make sure Ollama is running and the mistral model is available.")
@@ -0,0 +1,178 @@
+from __future__ import annotations
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# prefixos do LiteLLM para modelos servidos pelo Ollama
+OLLAMA_PREFIXES = ("ollama/", "ollama_chat/")
+
+# pool de conexões compartilhado por todos os LLMs do processo (keep-alive entre chamadas)
+POOL_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=300)
+# geração longa: só a conexão tem prazo curto
+LLM_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+# carregar o modelo do disco pode levar dezenas de segundos
+PRELOAD_TIMEOUT = httpx.Timeout(180.0, connect=5.0)
+# endpoint que falhou no preload fica fora do roteamento por esse tempo
+DOWN_RETRY_S = 60.0
+
+_CLIENT: Optional[httpx.Client] = None
+_HANDLER: Any = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def ollama_model_name(model_id: str) -> Optional[str]:
+    """
+    Nome do modelo no Ollama ("ollama/mistral" -> "mistral"); None se o modelo não é do Ollama.
+    """
+    for prefix in OLLAMA_PREFIXES:
+        if model_id.startswith(prefix):
+            return model_id[len(prefix):]
+    return None
+
+
+def http_client() -> httpx.Client:
+    """
+    Cliente httpx do processo para o Ollama (conexões reaproveitadas entre chamadas e execs).
+    """
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = httpx.Client(limits=POOL_LIMITS, timeout=LLM_TIMEOUT)
+    return _CLIENT
+
+
+def http_handler() -> Any:
+    """
+    O mesmo cliente embrulhado no handler do LiteLLM (`LLM(client=...)` repassa para `litellm.completion`).
+    """
+    global _HANDLER
+    if _HANDLER is None:
+        from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+        client = http_client()
+        with _CLIENT_LOCK:
+            if _HANDLER is None:
+                _HANDLER = HTTPHandler(client=client)
+    return _HANDLER
+
+
+def close_http_client() -> None:
+    global _CLIENT, _HANDLER
+    with _CLIENT_LOCK:
+        client, _CLIENT, _HANDLER = _CLIENT, None, None
+    if client is not None:
+        client.close()
+
+
+class OllamaPool:
+    """
+    Endpoints do Ollama que servem os mesmos modelos.
+
+    Cada exec aluga um endpoint (`lease`) e usa só ele do começo ao fim (o modelo e o
+    cache de prompt ficam quentes naquela máquina); o escolhido é o com menos execs em
+    andamento, em rodízio no empate. `preload` carrega os modelos com `keep_alive` em todos
+    os endpoints; quem falha sai do roteamento por DOWN_RETRY_S (se todos falharem, todos valem).
+    A contagem de execs é do processo: com vários workers do uvicorn cada um escolhe o endpoint
+    só pelas próprias execs (o balanceamento não enxerga a carga dos outros workers).
+    `models`: (model_id, context_window) usados pelos agentes; o preload usa o mesmo `num_ctx`
+    das chamadas (com outro valor o Ollama recarregaria o modelo na primeira exec).
+    """
+
+    def __init__(
+        self,
+        base_urls: Sequence[str],
+        models: Sequence[Tuple[str, Optional[int]]],
+        keep_alive: str = "30m",
+    ) -> None:
+        self.endpoints: List[str] = list(dict.fromkeys(u.rstrip("/") for u in base_urls if u.strip()))
+        if not self.endpoints:
+            raise ValueError("OllamaPool needs at least one base URL")
+        self.models = [(name, ctx) for name, ctx in dict.fromkeys(
+            (ollama_model_name(model_id), ctx) for model_id, ctx in models
+        ) if name]
+        self.keep_alive = keep_alive
+        self._lock = threading.Lock()
+        self._in_flight = {u: 0 for u in self.endpoints}
+        self._down_until = {u: 0.0 for u in self.endpoints}
+        self._next = 0
+
+    def acquire(self) -> str:
+        with self._lock:
+            now = time.monotonic()
+            healthy = [u for u in self.endpoints if self._down_until[u] <= now] or self.endpoints
+            n = len(self.endpoints)
+            order = [self.endpoints[(self._next + i) % n] for i in range(n)]
+            endpoint = min((u for u in order if u in healthy), key=lambda u: self._in_flight[u])
+            self._next = (self.endpoints.index(endpoint) + 1) % n
+            self._in_flight[endpoint] += 1
+            return endpoint
+
+    def release(self, endpoint: str) -> None:
+        with self._lock:
+            if self._in_flight.get(endpoint, 0) > 0:
+                self._in_flight[endpoint] -= 1
+
+    @contextmanager
+    def lease(self) -> Iterator[str]:
+        endpoint = self.acquire()
+        try:
+            yield endpoint
+        finally:
+            self.release(endpoint)
+
+    def mark_down(self, endpoint: str, seconds: float = DOWN_RETRY_S) -> None:
+        with self._lock:
+            if endpoint in self._down_until:
+                self._down_until[endpoint] = time.monotonic() + seconds
+
+    def mark_up(self, endpoint: str) -> None:
+        with self._lock:
+            if endpoint in self._down_until:
+                self._down_until[endpoint] = 0.0
+
+    def preload(self) -> Dict[str, bool]:
+        """
+        Carrega os modelos em cada endpoint e renova o `keep_alive` (request sem prompt do
+        `/api/generate`). Chamado no startup da API e periodicamente enquanto ela roda.
+        Retorna endpoint -> sucesso; não faz nada sem modelos do Ollama.
+        """
+        if not self.models:
+            return {}
+        client = http_client()
+        result: Dict[str, bool] = {}
+        for endpoint in self.endpoints:
+            ok = True
+            for model, ctx in self.models:
+                payload: Dict[str, Any] = {"model": model, "keep_alive": self.keep_alive}
+                if ctx:
+                    payload["options"] = {"num_ctx": ctx}
+                started = time.perf_counter()
+                try:
+                    r = client.post(f"{endpoint}/api/generate", json=payload, timeout=PRELOAD_TIMEOUT)
+                    r.raise_for_status()
+                except httpx.HTTPError as e:
+                    logger.warning("ollama preload of %s failed at %s: %s", model, endpoint, e)
+                    ok = False
+                    continue
+                logger.info("ollama model %s resident at %s (%.1fs)", model, endpoint, time.perf_counter() - started)
+            if ok:
+                self.mark_up(endpoint)
+            else:
+                self.mark_down(endpoint)
+            result[endpoint] = ok
+        return result
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                u: {"in_flight": self._in_flight[u], "up": self._down_until[u] <= now}
+                for u in self.endpoints
+            }
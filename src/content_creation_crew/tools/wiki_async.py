@@ -0,0 +1,132 @@
+from __future__ import annotations
+import asyncio
+import importlib.util
+from typing import Optional, Dict, Any
+from urllib.parse import urlparse
+
+import httpx
+
+from content_creation_crew import tracing
+from content_creation_crew.tools.wiki_cache import endpoint_of
+from content_creation_crew.tools.wiki_ratelimit import RATE_LIMITER, RateLimiter, retry_delay
+from content_creation_crew.tools.wiki_stats import REQUEST_STATS
+
+
+class AsyncWikiClient:
+    """
+    Cliente HTTP assíncrono com pool de conexões (keep-alive, HTTP/2 se `h2` estiver
+    instalado) e concorrência limitada por host. A vez de cada tentativa vem do
+    limitador de taxa compartilhado (`limiter`), que também recebe os Retry-After/maxlag.
+    Um cliente por event loop, compartilhado por todas as execuções desse loop.
+    """
+
+    def __init__(
+        self,
+        headers: Dict[str, str],
+        max_per_host: int = 4,
+        timeout: float = 20.0,
+        retries: int = 3,
+        limiter: Optional[RateLimiter] = None,
+    ) -> None:
+        self.max_per_host = max(1, max_per_host)
+        self.retries = retries
+        self.limiter = limiter or RATE_LIMITER
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(max_connections=self.max_per_host * 4, max_keepalive_connections=self.max_per_host * 2),
+        )
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._closer: Optional["asyncio.Task[None]"] = None  # fecha o cliente quando o loop encerra
+
+    def _limit_for(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        sem = self._host_limits.get(host)
+        if sem is None:
+            sem = self._host_limits[host] = asyncio.Semaphore(self.max_per_host)
+        return sem
+
+    async def get(self, url: str, params: Dict[str, Any]) -> httpx.Response:
+        """
+        GET com retry; lança `httpx.HTTPStatusError` se o último status for erro.
+        """
+        host = urlparse(url).netloc
+        waited = 0.0
+        async with self._limit_for(url):
+            attempt = 0
+            while True:
+                waited += await self.limiter.acquire_async(host)
+                r = await self._client.get(url, params=params)
+                delay = retry_delay(r.status_code, r.headers, r.content, attempt)
+                if delay is None or attempt >= self.retries:
+                    break
+                # o host fica bloqueado para todos (threads, loops e processos) até o Retry-After
+                await self.limiter.penalize_async(host, *delay)
+                attempt += 1
+        tracing.annotate(retries=attempt, rate_wait_s=round(waited, 3))
+        REQUEST_STATS.add_retries(endpoint_of(params), attempt)
+        r.raise_for_status()
+        return r
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+# um cliente por event loop (httpx.AsyncClient não pode ser usado entre loops); referência
+# forte: o cliente sai daqui quando é fechado, junto com o seu loop ou no shutdown
+_CLIENTS: Dict[asyncio.AbstractEventLoop, AsyncWikiClient] = {}
+
+
+async def _close_with_loop(loop: asyncio.AbstractEventLoop, client: AsyncWikiClient) -> None:
+    """
+    Fica pendente enquanto o loop vive. Quando ele encerra (ex: `asyncio.run` cancela as
+    tarefas pendentes), fecha o cliente no próprio loop, devolvendo as conexões do pool.
+    """
+    try:
+        await loop.create_future()
+    finally:
+        if _CLIENTS.get(loop) is client:
+            del _CLIENTS[loop]
+        await client.aclose()
+
+
+def get_async_client(headers: Dict[str, str]) -> AsyncWikiClient:
+    """
+    Cliente compartilhado do event loop atual (criado na primeira chamada).
+    """
+    loop = asyncio.get_running_loop()
+    client = _CLIENTS.get(loop)
+    if client is None:
+        # loops fechados sem cancelar as tarefas (sem a chance de fechar o cliente neles)
+        for old in [lp for lp in _CLIENTS if lp.is_closed()]:
+            del _CLIENTS[old]
+        client = _CLIENTS[loop] = AsyncWikiClient(headers)
+        client._closer = loop.create_task(_close_with_loop(loop, client))
+    return client
+
+
+async def _close_now(client: AsyncWikiClient) -> None:
+    # roda no loop do cliente: encerra a tarefa que o fecharia junto com o loop
+    if client._closer is not None:
+        client._closer.cancel()
+        await asyncio.gather(client._closer, return_exceptions=True)
+    await client.aclose()
+
+
+async def close_async_clients(timeout: float = 5.0) -> None:
+    """
+    Fecha os clientes de todos os loops (ex: no shutdown da API): o do loop atual aqui,
+    os dos outros loops ainda abertos no loop de cada um.
+    """
+    current = asyncio.get_running_loop()
+    for loop, client in list(_CLIENTS.items()):
+        _CLIENTS.pop(loop, None)
+        if loop is current:
+            await _close_now(client)
+        elif not loop.is_closed():
+            try:
+                future = asyncio.run_coroutine_threadsafe(_close_now(client), loop)
+                await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            except Exception:
+                pass  # o loop encerrou no meio: o cliente fecha com ele
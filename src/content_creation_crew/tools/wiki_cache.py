@@ -0,0 +1,259 @@
+from __future__ import annotations
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# TTL (segundos) por endpoint da API MediaWiki
+DEFAULT_TTLS: Dict[str, int] = {
+    "search": 6 * 3600,  # resultados de busca mudam com mais frequência
+    "extracts": 24 * 3600,
+    "parse": 24 * 3600,
+}
+DEFAULT_TTL = 3600
+
+# parâmetros que não alteram a resposta e ficam fora da chave
+_IGNORED_PARAMS = frozenset({"origin", "utf8", "format"})
+# parâmetros com títulos: "_" e espaços são equivalentes na MediaWiki
+_TITLE_PARAMS = frozenset({"titles", "page"})
+
+
+def endpoint_of(params: Dict[str, Any]) -> str:
+    """
+    Nome do endpoint usado para escolher o TTL (ex: 'search', 'extracts', 'parse').
+    """
+    action = str(params.get("action") or "")
+    if action == "query":
+        return str(params.get("list") or params.get("prop") or "query")
+    return action or "unknown"
+
+
+def _norm_value(key: str, value: Any) -> str:
+    s = " ".join(str(value).split())  # espaços simples
+    if key in _TITLE_PARAMS:
+        s = s.replace("_", " ")
+    return s
+
+
+def cache_key(lang: str, params: Dict[str, Any]) -> str:
+    """
+    Chave estável para (idioma, parâmetros normalizados).
+    """
+    items = sorted(
+        (str(k).lower(), _norm_value(str(k).lower(), v))
+        for k, v in params.items()
+        if str(k).lower() not in _IGNORED_PARAMS
+    )
+    payload = json.dumps([(lang or "en").strip().lower(), items], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class WikiCache:
+    """
+    Cache de respostas JSON da API MediaWiki em duas camadas:
+    LRU em memória na frente de um SQLite em disco (opcional).
+
+    - TTL por endpoint (`ttls`), expiração verificada na leitura
+    - tamanho limitado nas duas camadas (remove os menos usados)
+    - contadores de hit/miss em `stats()`
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_memory_entries: int = 512,
+        max_disk_entries: int = 20000,
+        ttls: Optional[Dict[str, int]] = None,
+    ) -> None:
+        self.max_memory_entries = max(1, int(max_memory_entries))
+        self.max_disk_entries = max(1, int(max_disk_entries))
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self._mem: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        self._stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+        if path:
+            self._db = self._open_db(path)
+
+    @staticmethod
+    def _open_db(path: str) -> Optional[sqlite3.Connection]:
+        """
+        Abre (ou cria) o SQLite. Em caso de falha segue só com a memória.
+        """
+        try:
+            folder = os.path.dirname(path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " endpoint TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " payload TEXT NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+            return db
+        except Exception as e:
+            logger.warning("Wikipedia cache em disco desativado (%s): %s", path, e)
+            return None
+
+    def ttl_for(self, params: Dict[str, Any]) -> int:
+        return int(self.ttls.get(endpoint_of(params), DEFAULT_TTL))
+
+    def get(self, lang: str, params: Dict[str, Any]) -> Optional[Any]:
+        """
+        Retorna a resposta em cache ou None (miss/expirada).
+        """
+        key = cache_key(lang, params)
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > now:
+                    self._mem.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["memory_hits"] += 1
+                    return value
+                del self._mem[key]
+
+            if self._db is not None:
+                value = self._disk_get(key, now)
+                if value is not None:
+                    self._mem_put(key, value[0], value[1])
+                    self._stats["hits"] += 1
+                    self._stats["disk_hits"] += 1
+                    return value[1]
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, lang: str, params: Dict[str, Any], value: Any) -> None:
+        """
+        Armazena a resposta com o TTL do endpoint.
+        """
+        ttl = self.ttl_for(params)
+        if ttl <= 0:
+            return
+        key = cache_key(lang, params)
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._mem_put(key, expires_at, value)
+            self._stats["sets"] += 1
+            if self._db is not None:
+                self._disk_set(key, endpoint_of(params), expires_at, now, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM responses")
+                except sqlite3.Error as e:
+                    logger.warning("Falha ao limpar o cache em disco: %s", e)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Contadores de hit/miss e tamanho atual da camada em memória.
+        """
+        with self._lock:
+            return {**self._stats, "memory_size": len(self._mem)}
+
+    # --- camadas internas (chamadas com o lock adquirido) ---
+
+    def _mem_put(self, key: str, expires_at: float, value: Any) -> None:
+        self._mem[key] = (expires_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_memory_entries:
+            self._mem.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, Any]]:
+        try:
+            row = self._db.execute(
+                "SELECT expires_at, payload FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[0] <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return (row[0], json.loads(row[1]))
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning("Falha ao ler o cache em disco: %s", e)
+            return None
+
+    def _disk_set(self, key: str, endpoint: str, expires_at: float, now: float, value: Any) -> None:
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, expires_at, accessed_at, payload)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, endpoint, expires_at, now, json.dumps(value, ensure_ascii=False)),
+            )
+            self._writes += 1
+            # poda periódica: expirados primeiro, depois os menos acessados
+            if self._writes % 100 == 0:
+                self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                excess = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_disk_entries
+                if excess > 0:
+                    self._db.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        " SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                        (excess,),
+                    )
+                    self._stats["evictions"] += excess
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning("Falha ao gravar o cache em disco: %s", e)
+
+
+class NullCache:
+    """
+    Cache desativado: nunca armazena, sempre miss.
+    """
+
+    def get(self, lang: str, params: Dict[str, Any]) -> Optional[Any]:
+        return None
+
+    def set(self, lang: str, params: Dict[str, Any], value: Any) -> None:
+        return None
+
+    def clear(self) -> None:
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {}
+
+
+def build_cache_from_env():
+    """
+    Monta o cache a partir das variáveis de ambiente:
+    WIKI_CACHE_DISABLED, WIKI_CACHE_PATH, WIKI_CACHE_MEMORY_ENTRIES,
+    WIKI_CACHE_DISK_ENTRIES e WIKI_CACHE_TTL_<ENDPOINT> (ex: WIKI_CACHE_TTL_SEARCH).
+    """
+    if os.getenv("WIKI_CACHE_DISABLED", "").strip().lower() in ("1", "true", "yes"):
+        return NullCache()
+    ttls = {}
+    for endpoint in DEFAULT_TTLS:
+        raw = os.getenv(f"WIKI_CACHE_TTL_{endpoint.upper()}")
+        if raw and raw.strip().isdigit():
+            ttls[endpoint] = int(raw)
+    return WikiCache(
+        path=os.getenv("WIKI_CACHE_PATH", ".cache/wikipedia.sqlite3").strip() or None,
+        max_memory_entries=int(os.getenv("WIKI_CACHE_MEMORY_ENTRIES", "512")),
+        max_disk_entries=int(os.getenv("WIKI_CACHE_DISK_ENTRIES", "20000")),
+        ttls=ttls,
+    )
@@ -0,0 +1,187 @@
+"""
+Seleção de trechos relevantes de páginas do Wikipedia dentro de um orçamento de tokens.
+
+Em vez de cortar o extract nos primeiros `max_chars`, a página é dividida em trechos
+(parágrafos agrupados por seção), cada trecho recebe um score BM25 contra a consulta
+(o tema da exec por padrão) e só os melhores entram, na ordem da página, cada um com a
+URL da âncora da sua seção.
+"""
+from __future__ import annotations
+import contextvars
+import re
+from contextlib import contextmanager
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from content_creation_crew.tools.wiki_offline import B, K1, tokenize
+
+# estimativa de tokens por caractere (texto em inglês, tokenizers BPE)
+CHARS_PER_TOKEN = 4
+# tamanho alvo de um trecho (parágrafos da mesma seção são agrupados até aqui)
+CHUNK_TOKENS = 160
+# nome do trecho antes do primeiro heading
+LEAD_SECTION = "Introduction"
+
+_HEADING_RE = re.compile(r"^(={2,6})\s*(.*?)\s*\1\s*$")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+# tema da exec em andamento: consulta padrão quando o agente não passa `query`
+_TOPIC: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("wiki_topic", default=None)
+
+
+@contextmanager
+def topic_scope(topic: Optional[str]) -> Iterator[None]:
+    """
+    Define o tema usado para ranquear os trechos nas chamadas de tool dentro do bloco.
+    """
+    token = _TOPIC.set(topic)
+    try:
+        yield
+    finally:
+        _TOPIC.reset(token)
+
+
+def current_topic() -> Optional[str]:
+    return _TOPIC.get()
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def section_url(lang: str, title: str, section: Optional[str] = None) -> str:
+    """
+    URL da página com a âncora da seção (mesmo formato das URLs que as tools já devolvem).
+    """
+    url = f"https://{lang}.wikipedia.org/wiki/{title.replace(' ', '_')}"
+    if section and section != LEAD_SECTION:
+        url += "#" + "_".join(section.split())
+    return url
+
+
+class Chunk(NamedTuple):
+    position: int  # ordem na página
+    section: str
+    text: str
+
+
+def _split_long(paragraph: str, max_chars: int) -> List[str]:
+    """
+    Parágrafo maior que o trecho alvo, dividido em frases agrupadas até `max_chars`.
+    """
+    parts, current = [], ""
+    for sentence in _SENTENCE_RE.split(paragraph):
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            parts.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        parts.append(current)
+    return parts
+
+
+def split_chunks(text: str, lead_section: str = LEAD_SECTION, chunk_tokens: int = CHUNK_TOKENS) -> List[Chunk]:
+    """
+    Divide um extract (headings `== Seção ==`) em trechos de até ~`chunk_tokens`,
+    sem misturar seções; cada trecho guarda a seção mais interna onde está.
+    """
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    chunks: List[Chunk] = []
+    section = lead_section
+    buffer: List[str] = []
+
+    def flush() -> None:
+        if buffer:
+            chunks.append(Chunk(len(chunks), section, "\n".join(buffer)))
+            buffer.clear()
+
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        heading = _HEADING_RE.match(line)
+        if heading:
+            flush()
+            section = heading.group(2) or section
+            continue
+        for part in _split_long(line, max_chars) if len(line) > max_chars else [line]:
+            if buffer and sum(len(p) + 1 for p in buffer) + len(part) > max_chars:
+                flush()
+            buffer.append(part)
+    flush()
+    return chunks
+
+
+def score_chunks(chunks: Sequence[Chunk], query: str) -> np.ndarray:
+    """
+    Score BM25 de cada trecho para a consulta (o heading da seção conta como texto do trecho).
+    Matriz trechos x termos da consulta montada uma vez e pontuada de forma vetorizada.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    n = len(chunks)
+    if not terms or not n:
+        return np.zeros(n)
+    column = {t: i for i, t in enumerate(terms)}
+    tf = np.zeros((n, len(terms)))
+    lengths = np.empty(n)
+    for i, chunk in enumerate(chunks):
+        tokens = tokenize(f"{chunk.section} {chunk.text}")
+        lengths[i] = len(tokens)
+        hits = [column[t] for t in tokens if t in column]
+        if hits:
+            tf[i] = np.bincount(hits, minlength=len(terms))
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    norm = K1 * (1 - B + B * lengths / max(lengths.mean(), 1.0))
+    return (idf * tf * (K1 + 1) / (tf + norm[:, None])).sum(axis=1)
+
+
+def select_chunks(chunks: Sequence[Chunk], query: Optional[str], token_budget: int, top_k: int = 8) -> List[Chunk]:
+    """
+    Até `top_k` trechos com score > 0 que cabem em `token_budget`, na ordem da página.
+    O primeiro trecho (o resumo da página/seção) sempre entra se couber; sem nenhum
+    trecho relevante, os trechos seguem a ordem da página (como o corte antigo).
+    """
+    if not chunks:
+        return []
+    scores = score_chunks(chunks, query or "")
+    ranked = [int(i) for i in np.argsort(-scores, kind="stable") if scores[i] > 0 and i != 0]
+    if not ranked:
+        ranked = list(range(1, len(chunks)))
+    chosen, used = [], 0
+    for i in [0] + ranked:
+        cost = estimate_tokens(chunks[i].text)
+        if used + cost > token_budget:
+            continue
+        chosen.append(i)
+        used += cost
+        if len(chosen) >= top_k:
+            break
+    if not chosen:  # nenhum trecho cabe inteiro: corta o mais relevante no orçamento
+        best = chunks[int(np.argmax(scores)) if scores.max() > 0 else 0]
+        return [best._replace(text=best.text[: token_budget * CHARS_PER_TOKEN].rstrip() + "...")]
+    return [chunks[i] for i in sorted(chosen)]
+
+
+def relevant_text(
+    text: str,
+    lang: str,
+    title: str,
+    query: Optional[str],
+    token_budget: int,
+    top_k: int = 8,
+    lead_section: str = LEAD_SECTION,
+) -> str:
+    """
+    O texto inteiro se couber no orçamento; senão os trechos mais relevantes para `query`
+    (padrão: o tema da exec, ou o título), cada um com a URL da âncora da sua seção.
+    """
+    if estimate_tokens(text) <= token_budget:
+        return text
+    query = query or current_topic() or title
+    chunks = split_chunks(text, lead_section=lead_section)
+    chosen = select_chunks(chunks, query, token_budget, top_k=top_k)
+    blocks = [f"[{c.section}] {section_url(lang, title, c.section)}\n{c.text}" for c in chosen]
+    blocks.append(f"(showing {len(chosen)} of {len(chunks)} passages, the most relevant to \"{query}\")")
+    return "\n\n".join(blocks)
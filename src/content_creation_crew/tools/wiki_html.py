@@ -0,0 +1,148 @@
+"""
+HTML do `action=parse` -> texto, em uma passada e com parada antecipada.
+
+Descarta o que não é conteúdo (marcadores de referência, infobox, navbox, links de
+edição, listas de referências, CSS/JS) e mantém a estrutura: parágrafos em linhas
+próprias, itens de lista com "- " e headings como `== Seção ==` (o mesmo formato dos
+extracts). A conversão para assim que o texto atinge `max_chars`, sem percorrer o resto
+do HTML da página.
+"""
+from __future__ import annotations
+import re
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+
+# HTML entregue ao parser por vez (a parada antecipada é verificada entre as fatias)
+FEED_CHARS = 16_384
+
+# elementos descartados inteiros (com tudo o que tiverem dentro)
+_DROP_TAGS = frozenset({"script", "style", "noscript", "link", "meta", "figure", "math"})
+_DROP_CLASSES = frozenset({
+    "reference", "mw-ref", "mw-editsection", "mw-cite-backlink", "reflist", "references",
+    "infobox", "navbox", "navbox-inner", "vertical-navbox", "sidebar", "metadata", "ambox",
+    "hatnote", "toc", "thumb", "gallery", "noprint", "mw-empty-elt", "mw-references-wrap",
+    "shortdescription", "navigation-not-searchable", "mwe-math-element",
+})
+_DROP_IDS = frozenset({"toc", "coordinates"})
+_VOID_TAGS = frozenset({"br", "img", "hr", "input", "meta", "link", "wbr", "source", "area", "col", "embed", "track"})
+_BLOCK_TAGS = frozenset({
+    "p", "div", "ul", "ol", "dl", "li", "dd", "dt", "blockquote", "pre", "table", "tr",
+    "section", "h1", "h2", "h3", "h4", "h5", "h6",
+})
+_HEADING_TAGS = {f"h{n}": n for n in range(2, 7)}
+_SPACES_RE = re.compile(r"\s+")
+
+
+def _dropped(tag: str, attrs: List[Tuple[str, Optional[str]]]) -> bool:
+    if tag in _DROP_TAGS:
+        return True
+    for name, value in attrs:
+        if not value:
+            continue
+        if name == "class" and not _DROP_CLASSES.isdisjoint(value.split()):
+            return True
+        if name == "id" and value in _DROP_IDS:
+            return True
+        if name == "style" and "display:none" in value.replace(" ", ""):
+            return True
+    return False
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self, max_chars: Optional[int]) -> None:
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.lines: List[str] = []
+        self.size = 0
+        self.done = False
+        self._line: List[str] = []
+        self._prefix = ""
+        self._skip = 0  # profundidade dentro do elemento descartado (só tags com o nome dele)
+        self._skip_tag = ""
+        self._heading = 0
+
+    def _flush(self) -> None:
+        text = _SPACES_RE.sub(" ", "".join(self._line)).strip()
+        self._line = []
+        if text:
+            if self._heading:
+                text = f"{'=' * self._heading} {text} {'=' * self._heading}"
+            else:
+                text = self._prefix + text
+            self.lines.append(text)
+            self.size += len(text) + 1
+            if self.max_chars is not None and self.size >= self.max_chars:
+                self.done = True
+        self._prefix = ""
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if self.done:
+            return
+        if self._skip:
+            # <p>/<li> sem fechamento lá dentro não desalinham a contagem
+            if tag == self._skip_tag:
+                self._skip += 1
+            return
+        if _dropped(tag, attrs):
+            if tag not in _VOID_TAGS:
+                self._skip, self._skip_tag = 1, tag
+            return
+        if tag in _BLOCK_TAGS or tag == "br":
+            self._flush()
+            if tag == "li":
+                self._prefix = "- "
+            if tag != "br":
+                self._heading = _HEADING_TAGS.get(tag, 0)
+        elif tag in ("td", "th"):
+            self._line.append(" ")
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if not self._skip and tag == "br" and not self.done:
+            self._flush()
+
+    def handle_endtag(self, tag: str) -> None:
+        if self.done:
+            return
+        if self._skip:
+            if tag == self._skip_tag:
+                self._skip -= 1
+            return
+        if tag in _BLOCK_TAGS:
+            self._flush()
+            self._heading = 0
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip and not self.done:
+            self._line.append(data)
+
+    def text(self) -> str:
+        if not self.done:
+            self._flush()
+        text = "\n".join(self.lines)
+        if self.max_chars is not None and len(text) > self.max_chars:
+            head = text[: self.max_chars]
+            start = head.rfind("\n") + 1  # início da linha que estoura o limite
+            space = head.rfind(" ", start)
+            if start and text[start] == "=":
+                head = head[: start - 1]  # heading não é cortado pela metade: sai inteiro
+            elif space > start:
+                head = head[:space]  # corta entre palavras
+            elif start:
+                head = head[: start - 1]  # nem a primeira palavra da linha cabe: sai inteira
+            # start == 0: a primeira linha estoura (heading ou não) e é cortada entre palavras
+            text = head.rstrip() + "..."
+        return text
+
+
+def html_to_text(html: str, max_chars: Optional[int] = None) -> str:
+    """
+    Texto limpo do HTML, no máximo `max_chars` caracteres (com "..." quando cortado).
+    """
+    parser = _TextExtractor(max_chars)
+    for i in range(0, len(html), FEED_CHARS):
+        parser.feed(html[i:i + FEED_CHARS])
+        if parser.done:
+            break
+    else:
+        parser.close()
+    return parser.text()
@@ -0,0 +1,754 @@
+"""
+Corpus offline do Wikipedia: indexador (CLI) e leitor com índice BM25 em disco.
+
+O indexador lê um dump (XML do MediaWiki, `.xml`/`.bz2`/`.gz`, ou JSONL com
+`{"title", "text"}`) e grava um diretório com:
+
+- `text.bin`: texto de cada artigo (formato do extract com `== Seção ==`)
+- `docs.bin`: tabela de offsets por artigo (texto, título, seções)
+- `doclens.bin`: tamanho em termos de cada artigo, em sequência (o BM25 lê direto com numpy)
+- `sections.bin`: offsets de cada seção dentro do texto do artigo
+- `titles.bin` / `tkeys.bin` / `tkeys.idx`: títulos e chaves normalizadas (com redirects) ordenadas
+- `terms.bin` / `terms.idx` / `postings.bin`: índice invertido (doc ids + frequências por termo)
+- `meta.json`: idioma, número de artigos e tamanho médio (BM25)
+
+O leitor (`OfflineWiki`) abre tudo com mmap (nada é carregado na memória) e responde
+os mesmos parâmetros da API MediaWiki que as tools emitem, com JSON no mesmo formato:
+as tools não mudam a saída com `WIKI_BACKEND=offline`.
+
+Uso:
+    python -m content_creation_crew.tools.wiki_offline build enwiki-pages-articles.xml.bz2 --out .data/wiki
+    python -m content_creation_crew.tools.wiki_offline search .data/wiki "string theory"
+"""
+from __future__ import annotations
+import argparse
+import bz2
+import gzip
+import heapq
+import html
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# tabelas de tamanho fixo (little-endian, sem padding)
+# artigo: offset/tamanho do texto, offset/tamanho do título, primeira seção, nº de seções
+_DOC = struct.Struct("<QIQHIH")
+# seção (relativa ao texto do artigo): início do heading, início do corpo, fim, nível
+_SEC = struct.Struct("<IIIB")
+# chave de título: offset/tamanho da chave, doc id, 1 se for redirect
+_TKEY = struct.Struct("<QHIB")
+# termo: offset/tamanho do termo, offset da lista de postings, df
+_TERM = struct.Struct("<QHQI")
+
+# BM25
+K1 = 1.2
+B = 0.75
+# termos do título contam como se aparecessem várias vezes no texto
+TITLE_BOOST = 5
+# termos presentes em mais que essa fração dos artigos pouco separam os resultados e dominam o
+# custo da consulta: ficam de fora quando a consulta tem algum termo mais raro
+COMMON_DF_RATIO = 0.05
+# postings em memória antes de gravar um lote ordenado em disco (o build usa memória limitada)
+SPILL_POSTINGS = 20_000_000
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_HEADING_RE = re.compile(r"^(={2,6})\s*(.*?)\s*\1\s*$", re.MULTILINE)
+STOPWORDS = frozenset(
+    "a an and are as at be been but by for from has have in into is it its of on or that the their "
+    "this to was were which with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Termos para o índice e para as consultas: minúsculas, sem stopwords e sem tokens de 1 caractere.
+    """
+    return [t for t in _TOKEN_RE.findall(text.casefold()) if 1 < len(t) <= 64 and t not in STOPWORDS]
+
+
+def title_key(title: str) -> str:
+    """
+    Chave de busca do título ("_" = espaço, espaços simples, sem diferença de maiúsculas).
+    """
+    return " ".join(title.replace("_", " ").split()).casefold()
+
+
+def split_sections(text: str) -> List[Tuple[int, int, int, int, str]]:
+    """
+    Seções do texto com marcadores `== Heading ==`: (início do heading, início do corpo, fim,
+    nível, heading). Cada seção vai até o próximo heading de mesmo nível ou superior
+    (inclui as subseções, como o `action=parse`).
+    """
+    heads = [(m.start(), m.end(), len(m.group(1)), m.group(2)) for m in _HEADING_RE.finditer(text)]
+    out = []
+    for i, (start, body, level, line) in enumerate(heads):
+        end = len(text)
+        for next_start, _body, next_level, _line in heads[i + 1:]:
+            if next_level <= level:
+                end = next_start
+                break
+        out.append((start, body, end, level, line))
+    return out
+
+
+# --- wikitext -> texto ------------------------------------------------------
+
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+_REF_RE = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.DOTALL | re.IGNORECASE)
+_DROP_TAGS_RE = re.compile(r"<(gallery|math|score|timeline|syntaxhighlight|source)[^>]*>.*?</\1>", re.DOTALL | re.IGNORECASE)
+_TEMPLATE_RE = re.compile(r"\{\{[^{}]*\}\}")
+_TABLE_RE = re.compile(r"\{\|(?:(?!\{\|).)*?\|\}", re.DOTALL)
+_LINK_RE = re.compile(r"\[\[([^\[\]]*)\]\]")
+_EXT_LINK_RE = re.compile(r"\[(?:https?:)?//[^\s\]]+(?:\s+([^\]]*))?\]")
+_TAG_RE = re.compile(r"<[^>]+>")
+_QUOTES_RE = re.compile(r"'{2,5}")
+_MAGIC_RE = re.compile(r"__[A-Z]+__")
+_LIST_RE = re.compile(r"^[*#:;]+\s*", re.MULTILINE)
+_BLANKS_RE = re.compile(r"\n{3,}")
+_DROP_LINK_PREFIXES = ("file:", "image:", "category:", "media:")
+
+
+def _replace_link(m: "re.Match[str]") -> str:
+    inner = m.group(1)
+    target, _, label = inner.partition("|")
+    if target.strip().lower().startswith(_DROP_LINK_PREFIXES):
+        return ""
+    if ":" in target and not label and len(target.split(":", 1)[0]) <= 3:
+        return ""  # interwiki (ex: [[de:Titel]])
+    return (label.rsplit("|", 1)[-1] if label else target).strip()
+
+
+def _strip_nested(pattern: "re.Pattern[str]", text: str, repl: Any = "", max_rounds: int = 20) -> str:
+    for _ in range(max_rounds):
+        text, n = pattern.subn(repl, text)
+        if not n:
+            break
+    return text
+
+
+def wikitext_to_text(wikitext: str) -> str:
+    """
+    Wikitext -> texto simples com headings `== Seção ==` (aproximação do extract da API):
+    remove referências, templates (infobox/navbox), tabelas, arquivos e categorias.
+    """
+    text = _COMMENT_RE.sub("", wikitext)
+    text = _REF_RE.sub("", text)
+    text = _DROP_TAGS_RE.sub("", text)
+    text = _strip_nested(_TEMPLATE_RE, text)
+    text = _strip_nested(_TABLE_RE, text)
+    text = _strip_nested(_LINK_RE, text, _replace_link)
+    text = _EXT_LINK_RE.sub(lambda m: m.group(1) or "", text)
+    text = _TAG_RE.sub("", text)
+    text = _QUOTES_RE.sub("", text)
+    text = _MAGIC_RE.sub("", text)
+    text = _LIST_RE.sub("", text)
+    text = html.unescape(text)
+    text = _HEADING_RE.sub(lambda m: f"{m.group(1)} {m.group(2).strip()} {m.group(1)}", text)
+    lines = [" ".join(line.split()) for line in text.split("\n")]
+    return _BLANKS_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+# --- leitura dos dumps ------------------------------------------------------
+
+def _open_dump(path: str) -> BinaryIO:
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_xml_dump(path: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """
+    (título, texto, destino do redirect) de cada página do namespace principal do dump XML.
+    """
+    with _open_dump(path) as f:
+        root = None
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if root is None:
+                root = elem  # <mediawiki>: as páginas processadas são removidas dele
+            if event != "end" or _local(elem.tag) != "page":
+                continue
+            title, ns, redirect, text = "", "0", None, ""
+            for child in elem.iter():
+                name = _local(child.tag)
+                if name == "title":
+                    title = child.text or ""
+                elif name == "ns":
+                    ns = (child.text or "0").strip()
+                elif name == "redirect":
+                    redirect = child.get("title")
+                elif name == "text":
+                    text = child.text or ""
+            elem.clear()
+            root.clear()
+            if ns == "0" and title:
+                yield title, ("" if redirect else wikitext_to_text(text)), redirect
+
+
+def iter_jsonl(path: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """
+    JSONL com `{"title", "text"}` (texto já limpo, headings `== Seção ==` opcionais)
+    e, opcionalmente, `"redirects": [títulos]` ou `"redirect": destino`.
+    """
+    with _open_dump(path) as f:
+        for raw in f:
+            if not raw.strip():
+                continue
+            item = json.loads(raw)
+            title = str(item.get("title") or "").strip()
+            if not title:
+                continue
+            if item.get("redirect"):
+                yield title, "", str(item["redirect"])
+                continue
+            yield title, str(item.get("text") or ""), None
+            for alias in item.get("redirects") or ():
+                yield str(alias), "", title
+
+
+def iter_dump(path: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+    name = path[:-4] if path.endswith(".bz2") else path[:-3] if path.endswith(".gz") else path
+    if name.endswith((".jsonl", ".json", ".ndjson")):
+        return iter_jsonl(path)
+    return iter_xml_dump(path)
+
+
+# --- indexador --------------------------------------------------------------
+
+def _byte_offsets(text: str, positions: Iterable[int]) -> Dict[int, int]:
+    """
+    Posição em caracteres -> posição em bytes UTF-8 (uma passada pelo texto).
+    """
+    out: Dict[int, int] = {}
+    prev = prev_bytes = 0
+    for pos in sorted(positions):
+        prev_bytes += len(text[prev:pos].encode("utf-8"))
+        out[pos] = prev_bytes
+        prev = pos
+    return out
+
+
+def _write_run(path: str, postings: Dict[bytes, Tuple[array, array]]) -> None:
+    with open(path, "wb") as f:
+        for term in sorted(postings):
+            docs, tfs = postings[term]
+            f.write(struct.pack("<HI", len(term), len(docs)))
+            f.write(term)
+            f.write(docs.tobytes())
+            f.write(tfs.tobytes())
+
+
+def _read_run(path: str) -> Iterator[Tuple[bytes, bytes, bytes]]:
+    with open(path, "rb") as f:
+        while True:
+            head = f.read(6)
+            if not head:
+                return
+            term_len, n = struct.unpack("<HI", head)
+            yield f.read(term_len), f.read(4 * n), f.read(2 * n)
+
+
+class IndexBuilder:
+    """
+    Grava o corpus em `out_dir`. Os postings ficam em memória até SPILL_POSTINGS e então
+    vão para lotes ordenados em disco, intercalados no final (dumps maiores que a RAM).
+    """
+
+    def __init__(self, out_dir: str, lang: str = "en", min_chars: int = 0) -> None:
+        self.out_dir = out_dir
+        self.lang = lang
+        self.min_chars = min_chars
+        os.makedirs(out_dir, exist_ok=True)
+        self._tmp = tempfile.mkdtemp(prefix="wiki-index-", dir=out_dir)
+        self._text = open(os.path.join(out_dir, "text.bin"), "wb")
+        self._titles = open(os.path.join(out_dir, "titles.bin"), "wb")
+        self._docs = open(os.path.join(out_dir, "docs.bin"), "wb")
+        self._sections = open(os.path.join(out_dir, "sections.bin"), "wb")
+        self._doclens = open(os.path.join(out_dir, "doclens.bin"), "wb")
+        self._text_off = 0
+        self._title_off = 0
+        self._n_sections = 0
+        self._total_len = 0
+        self.docs = 0
+        self._keys: Dict[str, int] = {}  # chave do título -> doc id
+        self._redirects: List[Tuple[str, str]] = []
+        self._postings: Dict[bytes, Tuple[array, array]] = {}
+        self._buffered = 0
+        self._runs: List[str] = []
+
+    def add(self, title: str, text: str, redirect: Optional[str] = None) -> None:
+        if redirect:
+            self._redirects.append((title, redirect))
+            return
+        text = text.strip()
+        if len(text) < self.min_chars or title_key(title) in self._keys:
+            return
+        doc_id = self.docs
+        self.docs += 1
+        self._keys[title_key(title)] = doc_id
+
+        counts: Dict[str, int] = {}
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0) + 1
+        length = sum(counts.values())
+        for term in tokenize(title):
+            counts[term] = counts.get(term, 0) + TITLE_BOOST
+        for term, tf in counts.items():
+            key = term.encode("utf-8")
+            entry = self._postings.get(key)
+            if entry is None:
+                entry = self._postings[key] = (array("I"), array("H"))
+            entry[0].append(doc_id)
+            entry[1].append(min(tf, 0xFFFF))
+        self._buffered += len(counts)
+        if self._buffered >= SPILL_POSTINGS:
+            self._spill()
+
+        sections = split_sections(text)
+        data = text.encode("utf-8")
+        byte_off = _byte_offsets(text, {p for s in sections for p in s[:3]})
+        for start, body, end, level, _line in sections:
+            # offsets em bytes (o leitor fatia o mmap)
+            self._sections.write(_SEC.pack(byte_off[start], byte_off[body], byte_off[end], level))
+        title_bytes = title.encode("utf-8")[:0xFFFF]
+        self._docs.write(_DOC.pack(
+            self._text_off, len(data), self._title_off, len(title_bytes),
+            self._n_sections, min(len(sections), 0xFFFF),
+        ))
+        self._doclens.write(struct.pack("<I", length))
+        self._text.write(data)
+        self._titles.write(title_bytes)
+        self._text_off += len(data)
+        self._title_off += len(title_bytes)
+        self._n_sections += len(sections)
+        self._total_len += length
+
+    def _spill(self) -> None:
+        if not self._postings:
+            return
+        path = os.path.join(self._tmp, f"run-{len(self._runs):05d}.bin")
+        _write_run(path, self._postings)
+        self._runs.append(path)
+        self._postings = {}
+        self._buffered = 0
+
+    def _write_title_keys(self) -> None:
+        entries: Dict[str, Tuple[int, int]] = {k: (doc_id, 0) for k, doc_id in self._keys.items()}
+        for source, target in self._redirects:
+            doc_id = self._keys.get(title_key(target))
+            key = title_key(source)
+            if doc_id is not None and key not in entries:
+                entries[key] = (doc_id, 1)
+        ordered = sorted((k.encode("utf-8")[:0xFFFF], v) for k, v in entries.items())
+        with open(os.path.join(self.out_dir, "tkeys.bin"), "wb") as blob, \
+                open(os.path.join(self.out_dir, "tkeys.idx"), "wb") as idx:
+            off = 0
+            for key, (doc_id, is_redirect) in ordered:
+                blob.write(key)
+                idx.write(_TKEY.pack(off, len(key), doc_id, is_redirect))
+                off += len(key)
+
+    def _write_terms(self) -> int:
+        self._spill()
+        runs = [_read_run(p) for p in self._runs]
+        terms = 0
+        with open(os.path.join(self.out_dir, "terms.bin"), "wb") as blob, \
+                open(os.path.join(self.out_dir, "terms.idx"), "wb") as idx, \
+                open(os.path.join(self.out_dir, "postings.bin"), "wb") as postings:
+            term_off = post_off = 0
+            current: Optional[bytes] = None
+            docs: List[bytes] = []
+            tfs: List[bytes] = []
+
+            def flush() -> None:
+                nonlocal term_off, post_off, terms
+                doc_bytes, tf_bytes = b"".join(docs), b"".join(tfs)
+                df = len(doc_bytes) // 4
+                blob.write(current)
+                idx.write(_TERM.pack(term_off, len(current), post_off, df))
+                postings.write(doc_bytes)
+                postings.write(tf_bytes)
+                term_off += len(current)
+                post_off += len(doc_bytes) + len(tf_bytes)
+                terms += 1
+
+            # heapq.merge é estável: para o mesmo termo, os lotes saem em ordem (doc ids crescentes)
+            for term, doc_bytes, tf_bytes in heapq.merge(*runs, key=lambda r: r[0]):
+                if term != current:
+                    if current is not None:
+                        flush()
+                    current, docs, tfs = term, [], []
+                docs.append(doc_bytes)
+                tfs.append(tf_bytes)
+            if current is not None:
+                flush()
+        return terms
+
+    def finish(self) -> Dict[str, Any]:
+        for f in (self._text, self._titles, self._docs, self._sections, self._doclens):
+            f.close()
+        self._write_title_keys()
+        terms = self._write_terms()
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        meta = {
+            "version": FORMAT_VERSION,
+            "lang": self.lang,
+            "docs": self.docs,
+            "terms": terms,
+            "redirects": len(self._redirects),
+            "avgdl": self._total_len / self.docs if self.docs else 0.0,
+            "built_at": time.time(),
+        }
+        with open(os.path.join(self.out_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+
+def build_index(
+    source: str,
+    out_dir: str,
+    lang: str = "en",
+    limit: Optional[int] = None,
+    min_chars: int = 0,
+    progress_every: int = 10_000,
+) -> Dict[str, Any]:
+    """
+    Indexa o dump `source` em `out_dir` (ver o docstring do módulo). Retorna o meta.json.
+    """
+    builder = IndexBuilder(out_dir, lang=lang, min_chars=min_chars)
+    started = time.time()
+    for title, text, redirect in iter_dump(source):
+        builder.add(title, text, redirect)
+        if limit and builder.docs >= limit:
+            break
+        if progress_every and builder.docs and builder.docs % progress_every == 0 and not redirect:
+            print(f"{builder.docs} articles ({time.time() - started:.0f}s)", file=sys.stderr)
+    return builder.finish()
+
+
+# --- leitor -----------------------------------------------------------------
+
+def _map(path: str) -> Optional[mmap.mmap]:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class _Table:
+    """
+    Tabela de registros de tamanho fixo num mmap, com busca binária pela chave em outro blob.
+    """
+
+    def __init__(self, data: Optional[mmap.mmap], record: struct.Struct) -> None:
+        self.data = data
+        self.record = record
+        self.size = len(data) // record.size if data is not None else 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, i: int) -> Tuple[Any, ...]:
+        return self.record.unpack_from(self.data, i * self.record.size)
+
+    def bisect(self, key: bytes, blob: mmap.mmap) -> Optional[Tuple[Any, ...]]:
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            row = self[mid]
+            current = blob[row[0]:row[0] + row[1]]
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return row
+        return None
+
+
+class OfflineWiki:
+    """
+    Corpus indexado por `build_index`, aberto com mmap (seguro entre threads: só leitura).
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported offline index version {self.meta.get('version')} at {path}")
+        self.path = path
+        self.lang = self.meta.get("lang") or "en"
+        self.avgdl = float(self.meta.get("avgdl") or 1.0)
+        self._maps = {name: _map(os.path.join(path, name)) for name in (
+            "text.bin", "titles.bin", "docs.bin", "doclens.bin", "sections.bin", "tkeys.bin", "tkeys.idx",
+            "terms.bin", "terms.idx", "postings.bin",
+        )}
+        self.docs = _Table(self._maps["docs.bin"], _DOC)
+        # tamanho em termos por artigo (vetor numpy sobre o mmap, sem cópia)
+        lengths = self._maps["doclens.bin"]
+        self.doc_lengths = np.frombuffer(lengths, dtype="<u4") if lengths is not None else np.zeros(0, dtype="<u4")
+        self.sections_table = _Table(self._maps["sections.bin"], _SEC)
+        self.title_keys = _Table(self._maps["tkeys.idx"], _TKEY)
+        self.terms = _Table(self._maps["terms.idx"], _TERM)
+
+    def close(self) -> None:
+        self.doc_lengths = np.zeros(0, dtype="<u4")  # solta a visão sobre o mmap
+        for m in self._maps.values():
+            if m is not None:
+                m.close()
+
+    # documentos
+
+    def title(self, doc_id: int) -> str:
+        _off, _len, title_off, title_len, *_rest = self.docs[doc_id]
+        return self._maps["titles.bin"][title_off:title_off + title_len].decode("utf-8")
+
+    def text(self, doc_id: int, start: int = 0, end: Optional[int] = None) -> str:
+        off, size, *_rest = self.docs[doc_id]
+        end = size if end is None else min(end, size)
+        return self._maps["text.bin"][off + start:off + end].decode("utf-8", errors="ignore")
+
+    def sections(self, doc_id: int) -> List[Tuple[int, int, int, int]]:
+        """
+        (início do heading, início do corpo, fim, nível) de cada seção, em bytes do texto.
+        """
+        *_head, first, count = self.docs[doc_id]
+        return [self.sections_table[first + i] for i in range(count)]
+
+    def section_line(self, doc_id: int, section: Tuple[int, int, int, int]) -> str:
+        start, body, _end, level = section
+        return self.text(doc_id, start, body).strip().strip("=").strip()
+
+    def find_title(self, title: str) -> Optional[Tuple[int, bool]]:
+        """
+        (doc id, é redirect) do título; None se não existe no corpus.
+        """
+        if self._maps["tkeys.bin"] is None:
+            return None
+        row = self.title_keys.bisect(title_key(title).encode("utf-8"), self._maps["tkeys.bin"])
+        return (row[2], bool(row[3])) if row else None
+
+    # busca
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (doc ids, frequências) do termo, como vetores numpy sobre o mmap (sem cópia).
+        """
+        row = self.terms.bisect(term.encode("utf-8"), self._maps["terms.bin"]) if self._maps["terms.bin"] is not None else None
+        if row is None:
+            return np.zeros(0, dtype="<u4"), np.zeros(0, dtype="<u2")
+        _off, _len, post_off, df = row
+        data = self._maps["postings.bin"]
+        docs = np.frombuffer(data, dtype="<u4", count=df, offset=post_off)
+        tfs = np.frombuffer(data, dtype="<u2", count=df, offset=post_off + 4 * df)
+        return docs, tfs
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[int, float]]:
+        """
+        Top `limit` artigos por BM25: (doc id, score). Cada termo é pontuado de uma vez
+        (numpy sobre os postings); termos muito comuns (COMMON_DF_RATIO) ficam de fora
+        quando há algum mais raro na consulta.
+        """
+        n = len(self.docs)
+        if not n:
+            return []
+        postings = [p for p in (self._postings(t) for t in dict.fromkeys(tokenize(query))) if len(p[0])]
+        if not postings:
+            return []
+        rare = [p for p in postings if len(p[0]) <= COMMON_DF_RATIO * n]
+        postings = rare or [min(postings, key=lambda p: len(p[0]))]
+        scores = np.zeros(n)
+        for docs, tfs in postings:
+            df = len(docs)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            tf = tfs.astype(np.float64)
+            norm = K1 * (1 - B + B * self.doc_lengths[docs] / self.avgdl)
+            np.add.at(scores, docs, idf * tf * (K1 + 1) / (tf + norm))
+        hits = np.flatnonzero(scores)
+        if len(hits) > limit:
+            # os `limit` maiores; no empate com o último, os de menor doc id
+            kth = np.partition(scores[hits], len(hits) - limit)[len(hits) - limit]
+            above = hits[scores[hits] > kth]
+            hits = np.concatenate([above, hits[scores[hits] == kth][:limit - len(above)]])
+        return sorted(((int(d), float(scores[d])) for d in hits), key=lambda kv: (-kv[1], kv[0]))
+
+    def snippet(self, doc_id: int, query: str, words: int = 30) -> str:
+        """
+        Trecho do artigo em volta da primeira ocorrência de um termo da consulta.
+        """
+        text = _HEADING_RE.sub(" ", self.text(doc_id, 0, 20_000))
+        tokens = text.split()
+        wanted = set(tokenize(query))
+        hit = next((i for i, w in enumerate(tokens) if set(tokenize(w)) & wanted), 0)
+        start = max(0, hit - words // 3)
+        return " ".join(tokens[start:start + words])
+
+    # respostas no formato da API MediaWiki (os parâmetros que as tools emitem)
+
+    def api(self, lang: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        action = params.get("action")
+        if action == "parse":
+            return self._api_parse(lang, params)
+        if action == "query" and params.get("list") == "search":
+            return self._api_search(lang, params)
+        if action == "query" and "extracts" in str(params.get("prop") or ""):
+            return self._api_extracts(lang, params)
+        return {"error": {"code": "badvalue", "info": "Unsupported request for the offline corpus."}}
+
+    def _lang_ok(self, lang: str) -> bool:
+        return (lang or "en").lower() == self.lang.lower()
+
+    def _api_search(self, lang: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        query = str(params.get("srsearch") or "")
+        limit = max(1, min(int(params.get("srlimit") or 10), 50))
+        hits = self.search(query, limit) if self._lang_ok(lang) else []
+        results = [
+            {"ns": 0, "title": self.title(doc_id), "pageid": doc_id + 1, "snippet": html.escape(self.snippet(doc_id, query))}
+            for doc_id, _score in hits
+        ]
+        return {"batchcomplete": "", "query": {"searchinfo": {"totalhits": len(results)}, "search": results}}
+
+    def _resolve(self, lang: str, title: str, redirects: bool = True) -> Tuple[Optional[int], Optional[str]]:
+        """
+        (doc id, título final) do título pedido; o título final difere em redirects/normalização.
+        Sem `redirects` (como na API), um redirect conta como página inexistente.
+        """
+        found = self.find_title(title) if self._lang_ok(lang) else None
+        if found is None or (found[1] and not redirects):
+            return None, None
+        return found[0], self.title(found[0])
+
+    def _api_extracts(self, lang: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        requested = [t for t in str(params.get("titles") or "").split("|") if t.strip()]
+        intro_only = bool(params.get("exintro"))
+        pages: Dict[str, Dict[str, Any]] = {}
+        normalized, redirects = [], []
+        missing = 0
+        for title in requested:
+            doc_id, final = self._resolve(lang, title, redirects=bool(params.get("redirects")))
+            if doc_id is None:
+                missing += 1
+                pages[str(-missing)] = {"ns": 0, "title": title.replace("_", " "), "missing": ""}
+                continue
+            found = self.find_title(title)
+            if final != title:
+                (redirects if found and found[1] else normalized).append({"from": title, "to": final})
+            text = self.text(doc_id)
+            if intro_only:
+                sections = self.sections(doc_id)
+                text = self.text(doc_id, 0, sections[0][0]) if sections else text
+            page: Dict[str, Any] = {"pageid": doc_id + 1, "ns": 0, "title": final, "extract": text.strip()}
+            if "revisions" in str(params.get("prop") or ""):
+                page["revisions"] = [{}]
+            pages[str(doc_id + 1)] = page
+        query: Dict[str, Any] = {"pages": pages}
+        if normalized:
+            query["normalized"] = normalized
+        if redirects:
+            query["redirects"] = redirects
+        return {"batchcomplete": "", "query": query}
+
+    def _api_parse(self, lang: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        title = str(params.get("page") or "")
+        doc_id, final = self._resolve(lang, title, redirects=bool(params.get("redirects"))) if title else (None, None)
+        if doc_id is None:
+            return {"error": {"code": "missingtitle", "info": "The page you specified doesn't exist."}}
+        sections = self.sections(doc_id)
+        prop = str(params.get("prop") or "")
+        if "section" in params:
+            i = int(params["section"]) - 1
+            if not 0 <= i < len(sections):
+                return {"error": {"code": "nosuchsection", "info": f"There is no section {params['section']}."}}
+            _start, body, end, _level = sections[i]
+            return {"parse": {"title": final, "pageid": doc_id + 1, "text": {"*": _to_html(self.text(doc_id, body, end))}}}
+        parsed: Dict[str, Any] = {"title": final, "pageid": doc_id + 1}
+        if "sections" in prop:
+            parsed["sections"] = [
+                {"toclevel": s[3] - 1, "level": str(s[3]), "line": self.section_line(doc_id, s), "index": str(i + 1)}
+                for i, s in enumerate(sections)
+            ]
+        if "text" in prop:
+            parsed["text"] = {"*": _to_html(self.text(doc_id))}
+        return {"parse": parsed}
+
+
+def _to_html(text: str) -> str:
+    """
+    Texto do corpus como o HTML do `action=parse`: um `<p>` por parágrafo, `<hN>` por heading.
+    """
+    out = []
+    for line in text.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        m = _HEADING_RE.match(line)
+        if m:
+            level = len(m.group(1))
+            out.append(f"<h{level}>{html.escape(m.group(2))}</h{level}>")
+        else:
+            out.append(f"<p>{html.escape(line)}</p>")
+    return "\n".join(out)
+
+
+_OPEN: Dict[str, OfflineWiki] = {}
+
+
+def open_offline(path: str) -> OfflineWiki:
+    """
+    Corpus compartilhado do processo para `path` (aberto na primeira chamada).
+    """
+    wiki = _OPEN.get(path)
+    if wiki is None:
+        wiki = _OPEN[path] = OfflineWiki(path)
+    return wiki
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline Wikipedia corpus: build and query the local index")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    build = sub.add_parser("build", help="index a MediaWiki XML dump (.xml/.bz2/.gz) or a JSONL file")
+    build.add_argument("source")
+    build.add_argument("--out", required=True, help="output directory (WIKI_OFFLINE_PATH)")
+    build.add_argument("--lang", default="en")
+    build.add_argument("--limit", type=int, default=None, help="stop after this many articles")
+    build.add_argument("--min-chars", type=int, default=200, help="skip articles shorter than this (stubs)")
+    search = sub.add_parser("search", help="query an index")
+    search.add_argument("path")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        meta = build_index(args.source, args.out, lang=args.lang, limit=args.limit, min_chars=args.min_chars)
+        print(json.dumps(meta, indent=2))
+        return
+    wiki = OfflineWiki(args.path)
+    started = time.perf_counter()
+    hits = wiki.search(args.query, args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    for doc_id, score in hits:
+        print(f"{score:7.3f}  {wiki.title(doc_id)}")
+    print(f"({len(hits)} results in {elapsed:.1f} ms)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
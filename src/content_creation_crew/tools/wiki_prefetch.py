@@ -0,0 +1,91 @@
+"""
+Pré-busca da pesquisa: antes do pesquisador rodar, busca o tema no Wikipedia e lê as
+melhores páginas em paralelo (threads), sem passar pelo LLM. O material entra na
+descrição da `research_task`; o agente sintetiza e só usa as tools para o que faltar.
+"""
+from __future__ import annotations
+import contextvars
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from content_creation_crew import tracing
+from content_creation_crew.tools.wikipedia_tool import WikipediaFetchTool, WikipediaSearchTool
+
+logger = logging.getLogger(__name__)
+
+# páginas lidas em paralelo no máximo
+PREFETCH_WORKERS = 4
+# orçamento total do material (dividido entre as páginas); cabe no contexto do pesquisador
+PREFETCH_TOKENS = 2400
+
+
+def _page(fetch: WikipediaFetchTool, title: str, topic: str) -> str:
+    # cada página volta com os trechos mais relevantes para o tema (com a âncora da seção)
+    with tracing.span("prefetch.page", "wiki", title=title):
+        return fetch._run(title=title, query=topic)
+
+
+def _search(search: WikipediaSearchTool, topic: str, lang: str, limit: int) -> Tuple[str, List[str]]:
+    """
+    Lista formatada pela tool de busca e os títulos encontrados (do JSON da própria busca).
+    """
+    responses: List[dict] = []
+    listing = search._drive(search._search_flow(json.dumps({"query": topic, "lang": lang, "limit": limit})), responses.append)
+    titles = [r["title"] for data in responses for r in data.get("query", {}).get("search", []) if r.get("title")]
+    return listing, titles
+
+
+def prefetch_research(
+    topic: str,
+    search: WikipediaSearchTool,
+    fetch: WikipediaFetchTool,
+    pages: int = 3,
+    token_budget: int = PREFETCH_TOKENS,
+) -> str:
+    """
+    Resultados da busca pelo tema + os trechos mais relevantes das `pages` primeiras
+    páginas, lidas em paralelo. Usa o cache/sessão compartilhados das tools.
+    Retorna "" se a busca não achar nada ou falhar (o pesquisador segue como antes).
+    """
+    lang = search.lang or "en"
+    with tracing.span("research_prefetch", "tool", pages=pages) as sp:
+        try:
+            listing, titles = _search(search, topic, lang, pages)
+            if not titles:
+                sp.set(found=0)
+                return ""
+            reader = WikipediaFetchTool(
+                lang=lang, section_mode=fetch.section_mode, top_k=fetch.top_k,
+                token_budget=max(1, token_budget // len(titles)),
+            )
+            # cada thread roda numa cópia do contexto (trace e tema da exec)
+            with ThreadPoolExecutor(max_workers=min(PREFETCH_WORKERS, len(titles))) as pool:
+                futures = [
+                    pool.submit(contextvars.copy_context().run, _page, reader, title, topic)
+                    for title in titles
+                ]
+                blocks = [f.result() for f in futures]
+        except Exception:
+            logger.warning("research prefetch failed for %r", topic, exc_info=True)
+            sp.set(error=True)
+            return ""
+        sp.set(found=len(titles))
+    return "\n\n".join([listing] + blocks)
+
+
+def research_context(material: Optional[str]) -> str:
+    """
+    Texto injetado na `research_task` (`{research_context}`); vazio sem material.
+    As chaves viram parênteses: a descrição da task ainda passa pela interpolação do CrewAI.
+    """
+    if not material:
+        return ""
+    material = material.replace("{", "(").replace("}", ")")
+    return (
+        "Wikipedia material already retrieved for this topic (search results and the most relevant "
+        "passages of the top pages, each tagged with its URL). Base your bullet points on it and cite "
+        "those URLs; call the tools only for facts that are missing.\n\n"
+        "--- RETRIEVED MATERIAL ---\n" + material + "\n--- END OF MATERIAL ---"
+    )
@@ -0,0 +1,254 @@
+"""
+Limite de taxa das requisições ao Wikipedia, compartilhado entre threads, execs e
+workers do uvicorn (estado num SQLite local).
+
+Cada host tem um token bucket (`rate` requisições/s, rajada de até `burst`), guardado
+como o instante teórico da próxima requisição (GCRA: um número por host, atualizado numa
+transação curta). Quem chega reserva sua vez e dorme até ela; nada de retry às cegas.
+Respostas 429/403/5xx e `maxlag` bloqueiam o host para TODOS até o `Retry-After`
+(ou um backoff exponencial, sem o cabeçalho), em vez de cada thread tentar de novo sozinha.
+"""
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# status que disparam nova tentativa (403 é o bloqueio transitório do Wikipedia)
+RETRY_STATUS = frozenset({403, 429, 500, 502, 503, 504})
+# backoff sem Retry-After: BACKOFF_BASE_S * 2^tentativa
+BACKOFF_BASE_S = 0.6
+# limites (segundos) dos buckets do histograma de espera
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class WikiRateLimited(RuntimeError):
+    """
+    A vez da requisição ficaria além de `max_wait` (host bloqueado por muito tempo).
+    """
+
+
+def retry_delay(status: int, headers: Mapping[str, str], body: bytes, attempt: int) -> Optional[Tuple[float, str]]:
+    """
+    (espera, motivo) se a resposta pede nova tentativa; None se não pede.
+    `maxlag` vem com status 200, erro "maxlag" no JSON e Retry-After.
+    """
+    raw = (headers.get("Retry-After") or "").strip()
+    retry_after = float(raw) if raw.isdigit() else None
+    if status == 200:
+        if retry_after is not None and b'"maxlag"' in body[:512]:
+            return retry_after, "maxlag"
+        return None
+    if status not in RETRY_STATUS:
+        return None
+    if retry_after is not None:
+        return retry_after, "retry_after"
+    return BACKOFF_BASE_S * (2 ** attempt), "backoff"
+
+
+class RateLimiter:
+    """
+    Token bucket por host. `path` (SQLite) coordena processos; sem `path` (ou se o
+    arquivo não abrir) vale só para o processo. `rate <= 0` desliga o limite de taxa,
+    mas os bloqueios de Retry-After/maxlag continuam valendo.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        rate: float = 5.0,
+        burst: float = 10.0,
+        max_wait: float = 60.0,
+    ) -> None:
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        # estado local (sem SQLite): host -> (instante teórico, bloqueado até)
+        self._state: Dict[str, Tuple[float, float]] = {}
+        self._db: Optional[sqlite3.Connection] = self._open_db(path) if path else None
+        self._db_errors = 0
+        # métricas do processo
+        self._waiting: Dict[str, int] = {}
+        self._waits: Dict[str, Tuple[List[int], float, int]] = {}
+        self._backoffs: Dict[Tuple[str, str], int] = {}
+        self._rejected: Dict[str, int] = {}
+
+    @staticmethod
+    def _open_db(path: str) -> Optional[sqlite3.Connection]:
+        try:
+            folder = os.path.dirname(path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " host TEXT PRIMARY KEY,"
+                " tat REAL NOT NULL,"
+                " blocked_until REAL NOT NULL)"
+            )
+            return db
+        except Exception as e:
+            logger.warning("Wikipedia rate limit entre processos desativado (%s): %s", path, e)
+            return None
+
+    def _update(self, host: str, change: Any) -> Any:
+        """
+        Lê o estado do host, aplica `change(tat, blocked_until) -> (novo estado | None, resultado)`
+        e grava, numa transação (SQLite) ou sob o lock (local). Com o SQLite ocupado além do
+        timeout ("database is locked"), a requisição segue com o último estado conhecido no processo.
+        """
+        with self._lock:
+            if self._db is not None:
+                try:
+                    return self._update_db(host, change)
+                except sqlite3.OperationalError as e:
+                    if not self._db_errors:
+                        logger.warning("Wikipedia rate limit: SQLite indisponível, usando o estado do processo: %s", e)
+                    self._db_errors += 1
+            new, result = change(*self._state.get(host, (0.0, 0.0)))
+            if new is not None:
+                self._state[host] = new
+            return result
+
+    def _update_db(self, host: str, change: Any) -> Any:
+        # chamado com o lock adquirido; o estado gravado também fica no processo (fallback)
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._db.execute("SELECT tat, blocked_until FROM buckets WHERE host = ?", (host,)).fetchone()
+            new, result = change(*(row or self._state.get(host, (0.0, 0.0))))
+            if new is not None:
+                self._db.execute(
+                    "INSERT INTO buckets (host, tat, blocked_until) VALUES (?, ?, ?)"
+                    " ON CONFLICT(host) DO UPDATE SET tat = excluded.tat, blocked_until = excluded.blocked_until",
+                    (host, *new),
+                )
+            self._db.execute("COMMIT")
+        except BaseException:
+            try:
+                self._db.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass  # a transação já foi encerrada pelo SQLite
+            raise
+        if new is not None:
+            self._state[host] = new
+        elif row is not None:
+            self._state[host] = tuple(row)
+        return result
+
+    def reserve(self, host: str) -> float:
+        """
+        Reserva a vez da próxima requisição ao host; retorna quanto esperar (segundos).
+        Lança WikiRateLimited (sem reservar) se a espera passar de `max_wait`.
+        """
+        now = time.time()
+        interval = 1.0 / self.rate if self.rate > 0 else 0.0
+        tolerance = (self.burst - 1.0) * interval
+
+        def change(tat: float, blocked_until: float) -> Tuple[Optional[Tuple[float, float]], float]:
+            start = max(now, blocked_until)
+            tat = max(tat, start)
+            send_at = max(start, tat - tolerance)
+            wait = send_at - now
+            if wait > self.max_wait:
+                return None, wait
+            return (tat + interval, blocked_until), wait
+
+        wait = self._update(host, change)
+        if wait > self.max_wait:
+            with self._lock:
+                self._rejected[host] = self._rejected.get(host, 0) + 1
+            raise WikiRateLimited(f"Wikipedia rate limit: {host} is blocked for {wait:.0f}s more")
+        return wait
+
+    def penalize(self, host: str, seconds: float, reason: str) -> None:
+        """
+        Bloqueia o host para todos os processos por `seconds` (Retry-After, maxlag ou backoff).
+        """
+        until = time.time() + max(0.0, seconds)
+        self._update(host, lambda tat, blocked: ((tat, max(blocked, until)), None))
+        with self._lock:
+            key = (host, reason)
+            self._backoffs[key] = self._backoffs.get(key, 0) + 1
+
+    def _record_wait(self, host: str, seconds: float) -> None:
+        with self._lock:
+            counts, total, n = self._waits.get(host) or ([0] * (len(WAIT_BUCKETS) + 1), 0.0, 0)
+            i = 0
+            while i < len(WAIT_BUCKETS) and seconds > WAIT_BUCKETS[i]:
+                i += 1
+            counts[i] += 1
+            self._waits[host] = (counts, total + seconds, n + 1)
+
+    def _queue(self, host: str, delta: int) -> None:
+        with self._lock:
+            self._waiting[host] = self._waiting.get(host, 0) + delta
+
+    def acquire(self, host: str) -> float:
+        """
+        Espera (bloqueando a thread) a vez da requisição; retorna o tempo esperado.
+        """
+        wait = self.reserve(host)
+        if wait > 0:
+            self._queue(host, 1)
+            try:
+                time.sleep(wait)
+            finally:
+                self._queue(host, -1)
+        self._record_wait(host, max(0.0, wait))
+        return max(0.0, wait)
+
+    async def acquire_async(self, host: str) -> float:
+        """
+        Versão assíncrona de `acquire`: a transação roda numa thread (não trava o event loop
+        com o SQLite ocupado por outro worker) e a espera dorme no loop.
+        """
+        wait = await asyncio.to_thread(self.reserve, host)
+        if wait > 0:
+            self._queue(host, 1)
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self._queue(host, -1)
+        self._record_wait(host, max(0.0, wait))
+        return max(0.0, wait)
+
+    async def penalize_async(self, host: str, seconds: float, reason: str) -> None:
+        """
+        Versão assíncrona de `penalize` (a transação roda numa thread).
+        """
+        await asyncio.to_thread(self.penalize, host, seconds, reason)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "waiting": dict(self._waiting),
+                "waits": {h: (list(c), s, n) for h, (c, s, n) in self._waits.items()},
+                "backoffs": dict(self._backoffs),
+                "rejected": dict(self._rejected),
+            }
+
+
+def build_limiter_from_env() -> RateLimiter:
+    """
+    Monta o limitador a partir das variáveis de ambiente:
+    WIKI_RATE_LIMIT_PATH (vazio = só o processo), WIKI_RATE_PER_SECOND (0 desliga a taxa),
+    WIKI_RATE_BURST e WIKI_RATE_MAX_WAIT.
+    """
+    return RateLimiter(
+        path=os.getenv("WIKI_RATE_LIMIT_PATH", ".cache/wikipedia-ratelimit.sqlite3").strip() or None,
+        rate=float(os.getenv("WIKI_RATE_PER_SECOND", "5")),
+        burst=float(os.getenv("WIKI_RATE_BURST", "10")),
+        max_wait=float(os.getenv("WIKI_RATE_MAX_WAIT", "60")),
+    )
+
+
+# limitador compartilhado pelas tools (caminhos síncrono e assíncrono)
+RATE_LIMITER = build_limiter_from_env()
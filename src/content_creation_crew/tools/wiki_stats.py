@@ -0,0 +1,51 @@
+from __future__ import annotations
+import threading
+from typing import Any, Dict, List, Tuple
+
+# limites (segundos) dos buckets de latência das requisições ao Wikipedia
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+
+class WikiRequestStats:
+    """
+    Contadores das requisições HTTP ao Wikipedia (caminhos síncrono e assíncrono),
+    por endpoint: status, retries e latência. Baratos o bastante para cada requisição;
+    `snapshot()` devolve uma cópia para quem exporta (ex: /metrics da API).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._requests: Dict[Tuple[str, str], int] = {}
+        self._retries: Dict[str, int] = {}
+        # por endpoint: (contagem por bucket + overflow, soma, total)
+        self._latency: Dict[str, Tuple[List[int], float, int]] = {}
+
+    def record(self, endpoint: str, status: str, seconds: float) -> None:
+        """
+        Uma requisição concluída; `status` é o código HTTP ("200", "429"), "error" (rede/timeout) ou "offline" (corpus local).
+        """
+        with self._lock:
+            key = (endpoint, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            counts, total, n = self._latency.get(endpoint) or ([0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0)
+            i = 0
+            while i < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[i]:
+                i += 1
+            counts[i] += 1
+            self._latency[endpoint] = (counts, total + seconds, n + 1)
+
+    def add_retries(self, endpoint: str, retries: int) -> None:
+        if retries:
+            with self._lock:
+                self._retries[endpoint] = self._retries.get(endpoint, 0) + retries
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": dict(self._requests),
+                "retries": dict(self._retries),
+                "latency": {ep: (list(c), s, n) for ep, (c, s, n) in self._latency.items()},
+            }
+
+
+REQUEST_STATS = WikiRequestStats()
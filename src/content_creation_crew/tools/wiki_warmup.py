@@ -0,0 +1,38 @@
+from __future__ import annotations
+import asyncio
+import logging
+from typing import Dict, Iterable
+
+from content_creation_crew.tools.wikipedia_tool import WikipediaFetchTool, WikipediaSearchTool
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_topics(topics: Iterable[str], lang: str = "en", fetch_top: bool = True, concurrency: int = 4) -> Dict[str, int]:
+    """
+    Aquece o cache compartilhado do Wikipedia para vários topics de uma vez: a busca pelo
+    topic (a mesma consulta padrão do pesquisador) e, com `fetch_top`, a página do primeiro
+    resultado. Usa o cliente assíncrono do loop atual; erros são contados e ignorados.
+    Retorna contadores: searched, fetched e errors.
+    """
+    search = WikipediaSearchTool(lang=lang)
+    fetch = WikipediaFetchTool(lang=lang)
+    sem = asyncio.Semaphore(max(1, concurrency))
+    stats = {"searched": 0, "fetched": 0, "errors": 0}
+
+    async def one(topic: str) -> None:
+        async with sem:
+            try:
+                data = await search._aget_json(lang, search.search_params(topic))
+                stats["searched"] += 1
+                results = data.get("query", {}).get("search", []) if isinstance(data, dict) else []
+                if fetch_top and results:
+                    await fetch._arun(title=results[0]["title"], lang=lang)
+                    stats["fetched"] += 1
+            except Exception:
+                stats["errors"] += 1
+                logger.debug("warm-up failed for topic %r", topic, exc_info=True)
+
+    unique = list(dict.fromkeys(t.strip() for t in topics if t and t.strip()))
+    await asyncio.gather(*(one(t) for t in unique))
+    return stats
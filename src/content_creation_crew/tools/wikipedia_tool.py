@@ -5,8 +5,10 @@ import re
 import time
 import html
 from pydantic import BaseModel, Field, PrivateAttr
-from typing import Optional, Dict, Any, Tuple, Type
+from typing import Optional, Dict, Any, List, Tuple, Type, ClassVar, Literal, Callable, Generator
 from urllib.parse import urlparse, unquote
+from collections import OrderedDict
+import threading
 
 try:
     from dotenv import load_dotenv
@@ -14,14 +16,31 @@ try:
 except Exception:
     pass
 
+import httpx
 import requests
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 from pydantic import BaseModel, Field
 from crewai.tools import BaseTool  
 
-# API do Wikipedia
-WIKI_API = "https://{lang}.wikipedia.org/w/api.php"
+from content_creation_crew import tracing
+from content_creation_crew.tools.wiki_cache import build_cache_from_env, endpoint_of
+from content_creation_crew.tools.wiki_async import get_async_client
+from content_creation_crew.tools.wiki_stats import REQUEST_STATS
+from content_creation_crew.tools.wiki_offline import open_offline
+from content_creation_crew.tools.wiki_chunks import CHARS_PER_TOKEN, Chunk, relevant_text, select_chunks
+from content_creation_crew.tools.wiki_html import html_to_text
+from content_creation_crew.tools.wiki_ratelimit import RATE_LIMITER, WikiRateLimited, retry_delay
+
+# API do Wikipedia ({lang} é preenchido por requisição); WIKI_API_URL permite apontar
+# para outro servidor compatível (ex: o stub local dos benchmarks)
+WIKI_API = os.getenv("WIKI_API_URL") or "https://{lang}.wikipedia.org/w/api.php"
+# "offline": as tools respondem do corpus local indexado por `wiki_offline` (sem rede nem cache)
+WIKI_BACKEND = (os.getenv("WIKI_BACKEND") or "api").strip().lower()
+WIKI_OFFLINE_PATH = os.getenv("WIKI_OFFLINE_PATH") or ".data/wiki"
+# a API recusa (com Retry-After) quando a replicação está atrasada mais que isso; vazio não envia
+WIKI_MAXLAG = os.getenv("WIKI_MAXLAG", "5").strip()
+# tentativas além da primeira em 403/429/5xx/maxlag (a espera é coordenada pelo RATE_LIMITER)
+WIKI_RETRIES = 3
 
 # Define o nome do agente de usuário e o contato para o cabeçalho HTTP
 APP_UA_NAME = os.getenv("APP_UA_NAME", "ContentCreationCrew/0.1")
@@ -46,6 +65,16 @@ def _format_contact(contact: str) -> str:
 # Formata o contato do usuário para o cabeçalho do User-Agent
 WIKI_CONTACT = _format_contact(WIKI_CONTACT_RAW)
 
+# Cabeçalhos usados pelos clientes síncrono e assíncrono
+_HEADERS = {
+    "User-Agent": f"{APP_UA_NAME} (+{WIKI_CONTACT})", 
+    "Accept": "application/json",  # Espera resposta em formato JSON
+}
+
+# Fluxo de uma ferramenta: emite (lang, params), recebe o JSON e devolve o texto final.
+# O mesmo fluxo roda no cliente síncrono (`_drive`) e no assíncrono (`_adrive`).
+_Flow = Generator[Tuple[str, Dict[str, Any]], Dict[str, Any], str]
+
 def _maybe_parse_json(payload: str) -> Optional[Dict[str, Any]]:
     """
     Tenta parsear o payload como JSON.
@@ -56,26 +85,43 @@ def _maybe_parse_json(payload: str) -> Optional[Dict[str, Any]]:
     except Exception:
         return None  
 
+def _as_bool(value: Any, default: bool) -> bool:
+    """
+    Booleano vindo do JSON do agente: aceita true/false, 1/0 e as strings "true"/"false",
+    "1"/"0", "yes"/"no"; qualquer outro valor fica com o padrão.
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in ("true", "1", "yes"):
+            return True
+        if text in ("false", "0", "no"):
+            return False
+    return default
+
+
 def _build_session() -> requests.Session:
     """
-    Cria uma sessão HTTP configurada para realizar requisições com retry em caso de falhas.
+    Cria a sessão HTTP compartilhada (pool de conexões). As novas tentativas ficam em
+    `_call_api`, coordenadas pelo limitador de taxa (não no urllib3).
 
     """
     s = requests.Session()  # nova sessão HTTP
-    retry = Retry(
-        total=3,  # Tenta 3 vezes
-        backoff_factor=0.6,  # Intervalo entre as tentativas
-        status_forcelist=[429, 500, 502, 503, 504],  # Lista de erros para retry
-        allowed_methods=frozenset(["GET"]),  # apenas metodos GET são configurados para retry
-        raise_on_status=False,  # nao lança excecão automaticamente
-    )
-    s.mount("https://", HTTPAdapter(max_retries=retry))  # adapter para retries
-    s.headers.update({
-        "User-Agent": f"{APP_UA_NAME} (+{WIKI_CONTACT})", 
-        "Accept": "application/json",  # Espera resposta em formato JSON
-    })
+    s.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    s.headers.update(_HEADERS)
     return s  # Retorna a sessão configurada
 
+
+def _request_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Parâmetros enviados à API (fora da chave do cache): CORS e `maxlag`.
+    """
+    extra = {"maxlag": WIKI_MAXLAG} if WIKI_MAXLAG else {}
+    return {"origin": "*", **extra, **params}
+
 def _strip_html(text: str) -> str:
     """
     Remove tags HTML do texto e realiza a decodificação de caracteres especiais.
@@ -88,6 +134,251 @@ def _strip_html(text: str) -> str:
 #uma unica sessão compartilhada
 _SHARED_SESSION = _build_session()
 
+# cache de respostas compartilhado (LRU em memória + SQLite em disco)
+_SHARED_CACHE = build_cache_from_env()
+
+
+# marcador de seção no extract com exsectionformat=wiki, ex: "== History =="
+_EXTRACT_HEADING_RE = re.compile(r"^(={2,6})\s*(.*?)\s*\1\s*$", re.MULTILINE)
+
+
+class _SectionIndex:
+    """
+    Índice das seções de uma página: heading normalizado -> índice da seção (MediaWiki).
+    Guarda a revisão indexada e, no modo "extract", o texto e os trechos de cada seção.
+    """
+
+    def __init__(self, title: str, revid: Optional[int]) -> None:
+        self.title = title
+        self.revid = revid
+        self.created_at = time.time()
+        self.entries: List[Tuple[str, str]] = []  # (heading normalizado, índice) em ordem
+        self.by_heading: Dict[str, str] = {}  # match exato
+        self.text = ""
+        self.spans: Dict[str, Tuple[int, int]] = {}
+        self._lookups: Dict[str, Optional[str]] = {}
+
+    def add(self, heading: str, index: str) -> None:
+        self.entries.append((heading, index))
+        self.by_heading.setdefault(heading, index)
+
+    def find(self, target: str) -> Optional[str]:
+        """
+        Exato, depois prefixo; repete sem parênteses no alvo.
+        """
+        if target in self._lookups:
+            return self._lookups[target]
+        found = None
+        for t in (target, re.sub(r"[\(\)]", "", target)):
+            found = self.by_heading.get(t)
+            if found is None:
+                found = next((idx for heading, idx in self.entries if heading.startswith(t)), None)
+            if found is not None:
+                break
+        self._lookups[target] = found
+        return found
+
+    def section_text(self, index: str) -> str:
+        start, end = self.spans.get(index, (0, 0))
+        return self.text[start:end].strip()
+
+    @classmethod
+    def from_extract(cls, title: str, revid: Optional[int], extract: str, norm: Callable[[str], str]) -> "_SectionIndex":
+        """
+        Monta o índice a partir do extract com marcadores; cada seção vai até o próximo
+        heading de mesmo nível ou superior (inclui as subseções, como no `action=parse`).
+        """
+        index = cls(title, revid)
+        index.text = extract
+        heads = [(len(m.group(1)), m.group(2), m.start(), m.end()) for m in _EXTRACT_HEADING_RE.finditer(extract)]
+        for i, (level, line, _start, body_start) in enumerate(heads):
+            end = len(extract)
+            for next_level, _line, next_start, _body in heads[i + 1:]:
+                if next_level <= level:
+                    end = next_start
+                    break
+            key = str(i + 1)
+            index.add(norm(line), key)
+            index.spans[key] = (body_start, end)
+        return index
+
+
+class _SectionIndexCache:
+    """
+    LRU com TTL de índices de seção por (idioma, título, modo).
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: int = 3600) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._items: "OrderedDict[Tuple[str, str, str], _SectionIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(lang: str, title: str, mode: str) -> Tuple[str, str, str]:
+        return (lang.lower(), " ".join(title.replace("_", " ").split()).lower(), mode)
+
+    def get(self, lang: str, title: str, mode: str) -> Optional[_SectionIndex]:
+        key = self._key(lang, title, mode)
+        with self._lock:
+            index = self._items.get(key)
+            if index is None:
+                return None
+            if time.time() - index.created_at > self.ttl:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return index
+
+    def put(self, lang: str, title: str, mode: str, index: _SectionIndex) -> None:
+        key = self._key(lang, title, mode)
+        with self._lock:
+            self._items[key] = index
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+_SECTION_INDEXES = _SectionIndexCache()
+
+# limite de títulos por requisição em prop=extracts
+_BATCH_MAX_TITLES = 20
+
+# HTML de seção convertido até N vezes o orçamento de texto: material suficiente para
+# ranquear os trechos sem converter páginas enormes inteiras
+_HTML_POOL_FACTOR = 4
+
+
+class _WikipediaBaseTool(BaseTool):
+    """
+    Base comum das ferramentas do Wikipedia: sessão HTTP e cache compartilhados.
+    """
+    _session: ClassVar[requests.Session] = _SHARED_SESSION  # HTTP compartilhada
+    _cache: ClassVar[Any] = _SHARED_CACHE  # qualquer objeto com get/set(lang, params[, value])
+
+    def _call_api(self, lang: str, params: Dict[str, Any]) -> requests.Response:
+        """
+        Chama a API do Wikipedia com os parâmetros fornecidos.
+
+        """
+        endpoint = endpoint_of(params)
+        params = _request_params(params)
+        url = WIKI_API.format(lang=lang)  # URL da API do Wikipedia
+        host = urlparse(url).netloc
+        started = time.perf_counter()
+        retries = 0
+        waited = 0.0
+        try:
+            while True:
+                # espera a vez no token bucket do host (compartilhado entre processos)
+                waited += RATE_LIMITER.acquire(host)
+                r = self._session.get(url, params=params, timeout=20)
+                delay = retry_delay(r.status_code, r.headers, r.content, retries)
+                if delay is None or retries >= WIKI_RETRIES:
+                    break
+                # 429/403/5xx/maxlag: o host fica bloqueado para todos até o Retry-After
+                RATE_LIMITER.penalize(host, *delay)
+                retries += 1
+        except WikiRateLimited:
+            REQUEST_STATS.record(endpoint, "ratelimited", time.perf_counter() - started)
+            raise
+        except requests.RequestException:
+            REQUEST_STATS.record(endpoint, "error", time.perf_counter() - started)
+            raise
+        REQUEST_STATS.record(endpoint, str(r.status_code), time.perf_counter() - started)
+        REQUEST_STATS.add_retries(endpoint, retries)
+        tracing.annotate(retries=retries, status=r.status_code, bytes=len(r.content), rate_wait_s=round(waited, 3))
+        r.raise_for_status() 
+        return r  
+
+    @staticmethod
+    def _offline_json(lang: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Resposta no formato da API vinda do corpus offline (WIKI_OFFLINE_PATH, via mmap).
+        """
+        endpoint = endpoint_of(params)
+        with tracing.span(f"wiki.{endpoint}", "wiki", endpoint=endpoint, lang=lang, backend="offline"):
+            started = time.perf_counter()
+            data = open_offline(WIKI_OFFLINE_PATH).api(lang, params)
+            REQUEST_STATS.record(endpoint, "offline", time.perf_counter() - started)
+            return data
+
+    def _get_json(self, lang: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Resposta JSON da API, passando pelo cache.
+        Respostas com 'error' (ex: página inexistente) não são armazenadas.
+        """
+        endpoint = endpoint_of(params)
+        if WIKI_BACKEND == "offline":
+            return self._offline_json(lang, params)
+        with tracing.span(f"wiki.{endpoint}", "wiki", endpoint=endpoint, lang=lang) as sp:
+            cached = self._cache.get(lang, params)
+            sp.set(cache_hit=cached is not None)
+            if cached is not None:
+                return cached
+            data = self._call_api(lang, params).json()
+            if isinstance(data, dict) and "error" not in data:
+                self._cache.set(lang, params, data)
+            return data
+
+    async def _aget_json(self, lang: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Versão assíncrona de `_get_json`, usando o cliente httpx compartilhado do loop.
+        """
+        endpoint = endpoint_of(params)
+        if WIKI_BACKEND == "offline":
+            return self._offline_json(lang, params)
+        with tracing.span(f"wiki.{endpoint}", "wiki", endpoint=endpoint, lang=lang) as sp:
+            cached = self._cache.get(lang, params)
+            sp.set(cache_hit=cached is not None)
+            if cached is not None:
+                return cached
+            client = get_async_client(_HEADERS)
+            started = time.perf_counter()
+            try:
+                r = await client.get(WIKI_API.format(lang=lang), _request_params(params))
+            except httpx.HTTPStatusError as e:
+                REQUEST_STATS.record(endpoint, str(e.response.status_code), time.perf_counter() - started)
+                raise
+            except WikiRateLimited:
+                REQUEST_STATS.record(endpoint, "ratelimited", time.perf_counter() - started)
+                raise
+            except httpx.HTTPError:
+                REQUEST_STATS.record(endpoint, "error", time.perf_counter() - started)
+                raise
+            REQUEST_STATS.record(endpoint, str(r.status_code), time.perf_counter() - started)
+            sp.set(status=r.status_code, bytes=len(r.content))
+            data = r.json()
+            if isinstance(data, dict) and "error" not in data:
+                self._cache.set(lang, params, data)
+            return data
+
+    def _drive(self, flow: _Flow, on_response: Optional[Callable[[Dict[str, Any]], None]] = None) -> str:
+        """
+        Executa o fluxo de forma síncrona (uma chamada à API por requisição emitida).
+        `on_response` recebe cada JSON da API antes de voltar ao fluxo.
+        """
+        try:
+            request = next(flow)
+            while True:
+                data = self._get_json(*request)
+                if on_response is not None:
+                    on_response(data)
+                request = flow.send(data)
+        except StopIteration as done:
+            return done.value
+
+    async def _adrive(self, flow: _Flow) -> str:
+        """
+        Executa o fluxo de forma assíncrona, sem bloquear uma thread durante o I/O.
+        """
+        try:
+            request = next(flow)
+            while True:
+                request = flow.send(await self._aget_json(*request))
+        except StopIteration as done:
+            return done.value
+
 
 class WikipediaSearchInput(BaseModel):
     """
@@ -96,12 +387,15 @@ class WikipediaSearchInput(BaseModel):
     """
     query: str = Field(..., description="Texto simples de pesquisa ou string JSON.")
 
-class WikipediaSearchTool(BaseTool):
+class WikipediaSearchTool(_WikipediaBaseTool):
     """
     pesquisa no Wikipedia utilizando a API MediaWiki
     """
     lang: str = "en"  
     max_chars: int = 1800  
+    # orçamento da lista de resultados (padrão: max_chars em tokens); resultados menos
+    # relevantes para a consulta saem quando a lista não cabe
+    token_budget: Optional[int] = None
 
     # Metadados da ferramenta
     name: str = "wikipedia_search"
@@ -113,26 +407,37 @@ class WikipediaSearchTool(BaseTool):
     )
 
     args_schema: Type[BaseModel] = WikipediaSearchInput  # esquema de entrada utilizando Pydantic
-    _session: ClassVar[requests.Session] = _SHARED_SESSION  # HTTP compartilhada
 
-    def _call_api(self, lang: str, params: Dict[str, Any]) -> requests.Response:
+    def _run(self, query: str) -> str:
         """
-        Chama a API do Wikipedia com os parâmetros fornecidos.
+        Executa a pesquisa no Wikipedia usando os dados fornecidos.
+   
+        """
+        return self._drive(self._search_flow(query))
 
+    async def _arun(self, query: str) -> str:
         """
-        params = {"origin": "*", **params}  # Adiciona o parametro de origem para CORS
-        url = WIKI_API.format(lang=lang)  # URL da API do Wikipedia
-        r = self._session.get(url, params=params, timeout=20)  
-        if r.status_code == 403:  
-            time.sleep(0.8)
-            r = self._session.get(url, params=params, timeout=20)
-        r.raise_for_status() 
-        return r  
+        Versão assíncrona da pesquisa (cliente httpx compartilhado).
+        """
+        return await self._adrive(self._search_flow(query))
 
-    def _run(self, query: str) -> str:
+    @staticmethod
+    def search_params(q: str, limit: int = 5) -> Dict[str, Any]:
         """
-        Executa a pesquisa no Wikipedia usando os dados fornecidos.
-   
+        Parâmetros da API para a busca (os mesmos que a ferramenta usa, portanto a mesma chave de cache).
+        """
+        return {
+            "action": "query",
+            "list": "search",
+            "srsearch": q,  # Parsmetro da pesquisa
+            "srlimit": max(1, min(limit, 20)),  # Limita o numero de resultados
+            "format": "json",  # Formato da resposta
+            "utf8": 1,  # Codificação UTF-8
+        }
+
+    def _search_flow(self, query: str) -> _Flow:
+        """
+        Monta os parâmetros da busca, recebe a resposta da API e formata os resultados.
         """
         data = _maybe_parse_json(query)  #tenta parsear a consulta como JSON
         if isinstance(data, dict):
@@ -148,41 +453,35 @@ class WikipediaSearchTool(BaseTool):
         if not q or not isinstance(q, str):
             return "No Wikipedia results for this query."  
 
-        params = {
-            "action": "query",
-            "list": "search",
-            "srsearch": q,  # Parsmetro da pesquisa
-            "srlimit": max(1, min(limit, 20)),  # Limita o numero de resultados
-            "format": "json",  # Formato da resposta
-            "utf8": 1,  # Codificação UTF-8
-        }
-
-        r = self._call_api(lang, params)  # API do Wikipedia com os parâmetros
-        results = r.json().get("query", {}).get("search", [])  
+        data = yield (lang, self.search_params(q, limit))  # API do Wikipedia (ou cache) com os parâmetros
+        results = data.get("query", {}).get("search", [])  
 
         if not results:
             return "No Wikipedia results for this query." 
 
         # Formata os resultados como uma lista
-        lines = []
+        entries = []
         for i, it in enumerate(results):
             title = it.get("title", "")
-            url = f"https://{lang}.wikipedia.org/wiki/{title.replace(' ', '_')}"
             snippet = it.get("snippet", "")
             snippet = snippet.replace('<span class="searchmatch">', "").replace("</span>", "")
             snippet = _strip_html(snippet)
             if len(snippet) > self.max_chars:
                 snippet = snippet[: self.max_chars].rstrip() + "..."
+            entries.append(Chunk(i, title, snippet))
+        budget = self.token_budget or self.max_chars // CHARS_PER_TOKEN
+        selected = select_chunks(entries, q, budget, top_k=len(entries))
+        lines = []
+        for i, title, snippet in selected:
+            url = f"https://{lang}.wikipedia.org/wiki/{title.replace(' ', '_')}"
             lines.append(f"- {i+1}. {title} – {url} — {snippet}")
+        # resultados que ficaram de fora (sem relevância ou sem espaço no orçamento) são avisados
+        omitted = len(entries) - len(selected)
+        if omitted:
+            lines.append(f"({omitted} more results omitted; refine the query to see them)")
 
         return "Wikipedia results (API)\n" + "\n".join(lines)  # Retorna os resultados como uma string
 
-    async def _arun(self, *_args, **_kwargs) -> str:
-        """
-        Método assíncrono não implementado para esta ferramenta.
-        """
-        raise NotImplementedError("WikipediaSearchTool does not support async.")
-
 class WikipediaFetchInput(BaseModel):
     # Aceita E/OU: title_or_json (string), ou campos separados
     title_or_json: Optional[str] = Field(
@@ -193,8 +492,16 @@ class WikipediaFetchInput(BaseModel):
     lang: Optional[str] = Field(default=None, description="Código de idioma, ex: 'en'")
     section: Optional[str] = Field(default=None, description="Nome da seção a ser buscada")
     url: Optional[str] = Field(default=None, description="URL completa do Wikipedia /wiki/, pode incluir #âncora")
+    titles: Optional[List[str]] = Field(
+        default=None,
+        description="Lista de títulos e/ou URLs do Wikipedia para buscar de uma só vez (modo em lote)"
+    )
+    query: Optional[str] = Field(
+        default=None,
+        description="Tema ou pergunta: páginas longas voltam só com os trechos mais relevantes para ele"
+    )
 
-class WikipediaFetchTool(BaseTool):
+class WikipediaFetchTool(_WikipediaBaseTool):
     """
     Ferramenta para buscar o texto completo ou uma seção específica
     Aceita título da página, string JSON ou URL completa
@@ -202,6 +509,16 @@ class WikipediaFetchTool(BaseTool):
     # Campos Pydantic
     lang: str = "en"  # Define o idioma (padrão é inglês)
     max_chars: int = 6000  # Número máximo de caracteres
+    # "parse": índice de seções + texto da seção (HTML); "extract": extract da página inteira
+    # em uma chamada, recortado localmente (melhor para várias seções da mesma página)
+    section_mode: Literal["parse", "extract"] = "parse"
+    # modo em lote: só a introdução de cada página (1 requisição a cada 20 títulos);
+    # com False a API devolve um extract completo por requisição (segue o `continue`)
+    batch_intro_only: bool = True
+    # páginas maiores que o orçamento (padrão: max_chars em tokens) voltam só com os
+    # `top_k` trechos mais relevantes para a consulta (ver wiki_chunks)
+    token_budget: Optional[int] = None
+    top_k: int = 8
 
     # Metadados da ferramenta
     name: str = "wikipedia_fetch"
@@ -209,26 +526,13 @@ class WikipediaFetchTool(BaseTool):
         "Busca o texto completo ou uma seção de uma página do Wikipedia usando a API MediaWiki. "
         "Você pode passar: (1) título ou JSON como string, (2) campos separados como "
         '{"title":"...","lang":"en","section":"History"}, ou (3) "url": '
-        "https://en.wikipedia.org/wiki/String_theory#Overview ."
+        "https://en.wikipedia.org/wiki/String_theory#Overview . "
+        'Para ler várias páginas de uma vez use "titles": ["Título A", "https://en.wikipedia.org/wiki/B"] '
+        '("title" junto com "titles" vira a primeira página; "section" não vale no lote). '
+        'Passe "query" com o tema para receber os trechos mais relevantes de páginas longas.'
     )
 
     args_schema: type[BaseModel] = WikipediaFetchInput  # Esquema de entrada utilizando Pydantic
-    _session: ClassVar[requests.Session] = _SHARED_SESSION  # Sessão HTTP compartilhada
-
-    def _call_api(self, lang: str, params: Dict[str, Any]) -> requests.Response:
-        """
-        Chama a API MediaWiki com os parâmetros fornecidos e retorna a resposta.
-
-        """
-        params = {"origin": "*", **params}  # Adiciona o parâmetro de origem para CORS
-        url = WIKI_API.format(lang=lang)  # Formata a URL da API do Wikipedia
-        r = self._session.get(url, params=params, timeout=20)  # Faz a requisição
-        if r.status_code == 403:  # Se o status for 403 (Forbidden), tenta novamente após 0.8 segundos
-            time.sleep(0.8)
-            r = self._session.get(url, params=params, timeout=20)
-        r.raise_for_status()  # Lança exceção se o código de status for um erro
-        return r  # Retorna a resposta da API
-
 
     @staticmethod
     def _is_wiki_url(s: str) -> bool:
@@ -277,6 +581,191 @@ class WikipediaFetchTool(BaseTool):
         section = self._clean_section_name(p.fragment) if p.fragment else None
         return (lang, title, section)
 
+    def _section_target(self, section: str) -> str:
+        return self._norm(self._clean_section_name(section))
+
+    def _section_index(self, lang: str, title: str) -> Generator[Tuple[str, Dict[str, Any]], Dict[str, Any], Optional["_SectionIndex"]]:
+        """
+        Índice de seções da página (via `prop=sections|revid`), reaproveitado entre chamadas.
+        """
+        index = _SECTION_INDEXES.get(lang, title, "parse")
+        if index is not None:
+            return index
+        params = {
+            "action": "parse",
+            "page": title,
+            "prop": "sections|revid",
+            "redirects": 1,
+            "format": "json",
+            "utf8": 1
+        }
+        parsed = (yield (lang, params)).get("parse")
+        if not parsed:
+            return None
+        index = _SectionIndex(parsed.get("title") or title, parsed.get("revid"))
+        for s in parsed.get("sections", []):
+            line = s.get("line", "")
+            if line:
+                index.add(self._section_target(line), str(s.get("index")))
+        _SECTION_INDEXES.put(lang, title, "parse", index)
+        return index
+
+    def _fetch_section_parse(self, lang: str, title: str, section: str, query: Optional[str] = None) -> _Flow:
+        """
+        Seção via `action=parse`: o índice fica em cache, então seções repetidas
+        da mesma página custam só a requisição do texto (fixada na revisão indexada).
+        """
+        index = yield from self._section_index(lang, title)
+        idx = index.find(self._section_target(section)) if index else None
+        if idx is None:
+            return f"Section '{section}' not found in '{title}' ({lang})."
+
+        params = {
+            "action": "parse",
+            "prop": "text",
+            "section": idx,
+            "format": "json",
+            "utf8": 1
+        }
+        if index.revid:
+            params["oldid"] = index.revid  # mesma revisão do índice
+        else:
+            params["page"] = index.title
+        html_text = (yield (lang, params)).get("parse", {}).get("text", {}).get("*", "")
+        # sem referências, infobox/navbox e links de edição; para ao juntar texto suficiente
+        budget = self.token_budget or self.max_chars // CHARS_PER_TOKEN
+        text = html_to_text(html_text, max_chars=budget * CHARS_PER_TOKEN * _HTML_POOL_FACTOR)
+        return self._format_section(lang, title, section, text, query)
+
+    def _fetch_section_from_extract(self, lang: str, title: str, section: str, query: Optional[str] = None) -> _Flow:
+        """
+        Seção recortada localmente do extract completo da página (uma única requisição
+        por página, com marcadores `== Seção ==`); as demais seções saem do cache.
+        """
+        index = _SECTION_INDEXES.get(lang, title, "extract")
+        if index is None:
+            params = {
+                "action": "query",
+                "prop": "extracts|revisions",
+                "rvprop": "ids",
+                "titles": title,
+                "redirects": 1,
+                "explaintext": 1,
+                "exsectionformat": "wiki",
+                "format": "json",
+                "utf8": 1
+            }
+            pages = (yield (lang, params)).get("query", {}).get("pages", {})
+            page = next(iter(pages.values()), {}) if pages else {}
+            extract = page.get("extract") or ""
+            if not extract:
+                return f"Section '{section}' not found in '{title}' ({lang})."
+            revid = (page.get("revisions") or [{}])[0].get("revid")
+            index = _SectionIndex.from_extract(page.get("title") or title, revid, extract, self._section_target)
+            _SECTION_INDEXES.put(lang, title, "extract", index)
+
+        idx = index.find(self._section_target(section))
+        if idx is None:
+            return f"Section '{section}' not found in '{title}' ({lang})."
+        return self._format_section(lang, title, section, index.section_text(idx), query)
+
+    def _fetch_batch(
+        self, default_lang: str, items: List[str], intro_only: bool, topic: Optional[str] = None
+    ) -> _Flow:
+        """
+        Busca vários títulos/URLs com `prop=extracts` agrupando até 20 títulos por requisição
+        (por idioma). Redirecionamentos e normalizações da API são resolvidos por título.
+        `topic`: consulta que escolhe os trechos de extracts longos (ver `_fit`).
+        """
+        requested: List[Tuple[str, str]] = []  # (idioma, título) na ordem pedida
+        for item in items:
+            item = item.strip()
+            if self._is_wiki_url(item):
+                url_lang, url_title, _sec = self._extract_title_and_section_from_url(item)
+                if url_title:
+                    requested.append((url_lang or default_lang, url_title))
+            else:
+                requested.append((default_lang, item.replace("_", " ")))
+        requested = list(dict.fromkeys(requested))  # remove duplicados mantendo a ordem
+        if not requested:
+            return "Please provide a valid Wikipedia page title or URL."
+
+        by_lang: Dict[str, List[str]] = {}
+        for req_lang, req_title in requested:
+            by_lang.setdefault(req_lang, []).append(req_title)
+
+        resolved: Dict[Tuple[str, str], str] = {}  # (idioma, pedido) -> título final
+        pages: Dict[Tuple[str, str], Dict[str, Any]] = {}  # (idioma, título final) -> página
+        for req_lang, lang_titles in by_lang.items():
+            for start in range(0, len(lang_titles), _BATCH_MAX_TITLES):
+                chunk = lang_titles[start:start + _BATCH_MAX_TITLES]
+                params: Dict[str, Any] = {
+                    "action": "query",
+                    "prop": "extracts",
+                    "titles": "|".join(chunk),
+                    "redirects": 1,
+                    "explaintext": 1,
+                    "exlimit": "max",
+                    "format": "json",
+                    "utf8": 1
+                }
+                if intro_only:
+                    params["exintro"] = 1
+                while True:
+                    data = yield (req_lang, params)
+                    query = data.get("query", {})
+                    mapping: Dict[str, str] = {}
+                    for step in ("normalized", "redirects"):
+                        for m in query.get(step, []):
+                            mapping[m.get("from", "")] = m.get("to", "")
+                    for t in chunk:
+                        final = t
+                        for _ in range(3):  # normalização -> redirecionamento
+                            if final not in mapping:
+                                break
+                            final = mapping[final]
+                        resolved[(req_lang, t)] = final
+                    for page in query.get("pages", {}).values():
+                        key = (req_lang, page.get("title", ""))
+                        if page.get("extract") or key not in pages:
+                            pages[key] = page
+                    # sem exintro a API devolve um extract por vez e pede continuação
+                    cont = data.get("continue")
+                    if not cont or "excontinue" not in cont:
+                        break
+                    params = {**params, **cont}
+
+        blocks = []
+        for req_lang, req_title in requested:
+            final = resolved.get((req_lang, req_title), req_title)
+            page = pages.get((req_lang, final))
+            if not page or "missing" in page or "invalid" in page:
+                blocks.append(f"Page '{req_title}' not found on Wikipedia ({req_lang}).")
+                continue
+            extract = (page.get("extract") or "").strip()
+            if not extract:
+                blocks.append(f"Page '{final}' found, but no extract available ({req_lang}).")
+                continue
+            extract = self._fit(extract, req_lang, final, topic)
+            note = f" (redirected from {req_title})" if final != req_title else ""
+            blocks.append(f"=== {final} (Wikipedia {req_lang}){note} ===\n{extract}")
+        return "\n\n".join(blocks)
+
+    def _fit(self, text: str, lang: str, title: str, query: Optional[str], section: Optional[str] = None) -> str:
+        """
+        Texto dentro do orçamento: inteiro se couber, senão os trechos mais relevantes para a consulta.
+        """
+        budget = self.token_budget or self.max_chars // CHARS_PER_TOKEN
+        if section:
+            return relevant_text(text, lang, title, query, budget, self.top_k, lead_section=section)
+        return relevant_text(text, lang, title, query, budget, self.top_k)
+
+    def _format_section(self, lang: str, title: str, section: str, text: str, query: Optional[str] = None) -> str:
+        if not text:
+            return f"Section '{section}' found but empty for '{title}' ({lang})."
+        text = self._fit(text, lang, title, query, section=section)
+        return f"=== {title} — Section: {section} ===\n{text}"
+
     def _run(
         self,
         title_or_json: Optional[str] = None,
@@ -284,12 +773,45 @@ class WikipediaFetchTool(BaseTool):
         lang: Optional[str] = None,
         section: Optional[str] = None,
         url: Optional[str] = None,
+        titles: Optional[List[str]] = None,
+        query: Optional[str] = None,
     ) -> str:
         """
         Executa a busca ou a extração de texto a partir de uma página ou seção do Wikipedia.
 
+        """
+        return self._drive(self._fetch_flow(title_or_json, title, lang, section, url, titles, query))
+
+    async def _arun(
+        self,
+        title_or_json: Optional[str] = None,
+        title: Optional[str] = None,
+        lang: Optional[str] = None,
+        section: Optional[str] = None,
+        url: Optional[str] = None,
+        titles: Optional[List[str]] = None,
+        query: Optional[str] = None,
+    ) -> str:
+        """
+        Versão assíncrona da busca (cliente httpx compartilhado).
+        """
+        return await self._adrive(self._fetch_flow(title_or_json, title, lang, section, url, titles, query))
+
+    def _fetch_flow(
+        self,
+        title_or_json: Optional[str],
+        title: Optional[str],
+        lang: Optional[str],
+        section: Optional[str],
+        url: Optional[str],
+        titles: Optional[List[str]] = None,
+        query: Optional[str] = None,
+    ) -> _Flow:
+        """
+        Resolve título/idioma/seção a partir das entradas e emite as requisições necessárias.
         """
         effective_lang = (lang or self.lang or "en").strip() or "en"
+        intro_only = self.batch_intro_only
 
         # Se URL, extrai titulo/ancora
         if url and self._is_wiki_url(url):
@@ -308,62 +830,37 @@ class WikipediaFetchTool(BaseTool):
                 sec = parsed.get("section")
                 if isinstance(sec, str):
                     section = self._clean_section_name(sec)
+                batch = parsed.get("titles")
+                if isinstance(batch, str):
+                    batch = batch.split("|")
+                if isinstance(batch, list):
+                    titles = batch
+                if "intro_only" in parsed:
+                    intro_only = _as_bool(parsed["intro_only"], intro_only)
+                if isinstance(parsed.get("query"), str):
+                    query = parsed["query"]
             else:
                 # Era um título simples
                 title = title or title_or_json.strip()
 
+        # Modo em lote (títulos e/ou URLs); `title` entra como o primeiro item do lote.
+        # Seção não vale no lote: a combinação é recusada em vez de ignorar a seção
+        if titles and section:
+            return 'Use "titles" to read several pages, or "title" with "section" for one section, not both.'
+        if titles:
+            items = [str(t) for t in titles if t and str(t).strip()]
+            if title:
+                items.insert(0, title)
+            return (yield from self._fetch_batch(effective_lang, items, intro_only, query))
+
         if not title:
             return "Please provide a valid Wikipedia page title or URL."
 
         # Seção específica?
         if section:
-            target = self._norm(self._clean_section_name(str(section)))
-            sec_params = {
-                "action": "parse",
-                "page": title,
-                "prop": "sections",
-                "format": "json",
-                "utf8": 1
-            }
-            rs = self._call_api(effective_lang, sec_params)
-            sections = rs.json().get("parse", {}).get("sections", [])
-
-            idx = None
-            for s in sections:
-                line = s.get("line", "")
-                if not line:
-                    continue
-                nline = self._norm(self._clean_section_name(line))
-                if nline == target or nline.startswith(target):
-                    idx = s.get("index")
-                    break
-            if idx is None:
-                # remove parênteses
-                alt = re.sub(r"[\(\)]", "", target)
-                for s in sections:
-                    nline = self._norm(self._clean_section_name(s.get("line", "")))
-                    if nline == alt or nline.startswith(alt):
-                        idx = s.get("index")
-                        break
-            if idx is None:
-                return f"Section '{section}' not found in '{title}' ({effective_lang})."
-
-            params = {
-                "action": "parse",
-                "page": title,
-                "prop": "text",
-                "section": idx,
-                "format": "json",
-                "utf8": 1
-            }
-            r = self._call_api(effective_lang, params)
-            html_text = r.json().get("parse", {}).get("text", {}).get("*", "")
-            text = _strip_html(html_text)
-            if not text:
-                return f"Section '{section}' found but empty for '{title}' ({effective_lang})."
-            if len(text) > self.max_chars:
-                text = text[: self.max_chars].rstrip() + "..."
-            return f"=== {title} — Section: {section} ===\n{text}"
+            if self.section_mode == "extract":
+                return (yield from self._fetch_section_from_extract(effective_lang, title, str(section), query))
+            return (yield from self._fetch_section_parse(effective_lang, title, str(section), query))
 
         #Página inteira (extract)
         params = {
@@ -374,8 +871,7 @@ class WikipediaFetchTool(BaseTool):
             "format": "json",
             "utf8": 1
         }
-        r = self._call_api(effective_lang, params)
-        pages = r.json().get("query", {}).get("pages", {})
+        pages = (yield (effective_lang, params)).get("query", {}).get("pages", {})
         if not pages:
             return f"Page '{title}' not found on Wikipedia ({effective_lang})."
 
@@ -383,12 +879,5 @@ class WikipediaFetchTool(BaseTool):
         extract = (page.get("extract") or "").strip()
         if not extract:
             return f"Page '{title}' found, but no extract available ({effective_lang})."
-        if len(extract) > self.max_chars:
-            extract = extract[: self.max_chars].rstrip() + "..."
+        extract = self._fit(extract, effective_lang, page.get("title") or title, query)
         return f"=== {title} (Wikipedia {effective_lang}) ===\n{extract}"
-
-    async def _arun(self, *_args, **_kwargs) -> str:
-        """
-        Método assíncrono não implementado para esta ferramenta.
-        """
-        raise NotImplementedError("WikipediaFetchTool does not support async.")
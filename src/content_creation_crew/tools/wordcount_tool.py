@@ -1,4 +1,7 @@
 import re
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from content_creation_crew import tracing
 
 try:
     from crewai_tools import BaseTool  
@@ -14,54 +17,150 @@ except Exception:
 
 
 #extracao do CORPO e contagem
-_HEADING_PREFIXES = ("#", "##", "###", "####", "#####", "######")
-
 _WORD_RE = re.compile(r"[A-Za-zÀ-ÖØ-öø-ÿ0-9_]+(?:['\-][A-Za-zÀ-ÖØ-öø-ÿ0-9_]+)?")
 
-def _is_heading(line: str) -> bool:
-    s = line.strip()
-    return any(s.startswith(p) for p in _HEADING_PREFIXES)
+# mesmas quebras de linha que str.splitlines()
+_LINE_BREAKS = "\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029"
+_LINE_END_RE = re.compile(rf"\r\n|[{_LINE_BREAKS}]")
 
-def extract_body(markdown: str) -> str:
-    """
-    Remove: título, TL;DR (seção completa), TODAS as linhas de heading
-    e tudo a partir de '## References' (inclusive).
-    """
-    lines = markdown.splitlines()
-    out = []
-    in_tldr = False
 
-    for raw in lines:
-        line = raw.rstrip()
-        low = line.strip().lower()
+# tipo do heading, sem criar substrings:
+# 1 = '## references', 2 = '## tl;dr', 3 = heading '## ...', 4 = qualquer outro heading '#'
+_HEADING_KIND_RE = re.compile(r"\s*(?:(?ai:(## references))|(?ai:(## tl;dr))|(## (?=\s*\S))|(#))")
 
-        # corta tudo a partir de '## references'
-        if low.startswith("## references"):
-            break
+# tipos de trecho emitidos por _classify
+_BODY, _HEADING, _SKIP, _REFERENCES = 0, 1, 2, 3
 
-        # TL;DR começa e termina no próximo heading '## '
-        if low.startswith("## tl;dr"):
+
+class BodySection(NamedTuple):
+    """Seção do corpo: heading (None antes do primeiro), nível, offsets no Markdown e palavras."""
+    heading: Optional[str]
+    level: int
+    start: int
+    end: int
+    words: int
+
+
+class BodyStats(NamedTuple):
+    """Resultado de `analyze_body`: total do corpo, seções e onde começam as referências."""
+    words: int
+    sections: Tuple[BodySection, ...]
+    references_at: Optional[int]
+
+
+def _heading_lines(text: str) -> Iterator[Tuple[int, int, int]]:
+    """
+    (início, fim, início da próxima linha) de cada linha cujo primeiro caractere não-espaço é '#'.
+    Só procura os '#' do texto (str.find); as demais linhas nem são visitadas.
+    """
+    n = len(text)
+    i = text.find("#")
+    while i >= 0:
+        s = i
+        while s > 0 and text[s - 1] not in _LINE_BREAKS and text[s - 1].isspace():
+            s -= 1
+        brk = _LINE_END_RE.search(text, i)
+        e, nxt = (brk.start(), brk.end()) if brk else (n, n)
+        if s == 0 or text[s - 1] in _LINE_BREAKS:
+            yield s, e, nxt
+        i = text.find("#", nxt)
+
+
+def _classify(markdown: str) -> Iterator[Tuple[int, int, int]]:
+    """
+    Uma passada pelo texto, pulando de heading em heading e emitindo (tipo, início, fim):
+    _BODY para o texto entre headings (várias linhas de uma vez), _HEADING para cada linha
+    de heading fora do TL;DR e _SKIP para o TL;DR (do '## TL;DR' até o próximo '## ', exclusive).
+    Para em '## References' (inclusive), emitindo _REFERENCES para a linha do heading.
+    """
+    in_tldr = False
+    pos = 0  # início do trecho ainda não emitido (sempre um início de linha)
+    for s, e, nxt in _heading_lines(markdown):
+        if s > pos:
+            yield (_SKIP if in_tldr else _BODY), pos, s
+        pos = nxt
+
+        kind = _HEADING_KIND_RE.match(markdown, s, e).lastindex
+        if kind == 1:  # corta tudo a partir de '## references'
+            yield _REFERENCES, s, e
+            return
+        if kind == 2:
             in_tldr = True
-            continue
-        if in_tldr and line.strip().startswith("## "):
+            yield _SKIP, s, e
+        elif in_tldr and kind != 3:
+            yield _SKIP, s, e
+        else:  # no TL;DR, só o próximo heading '## ' o encerra (e não entra na contagem)
             in_tldr = False
-            # nao inclui o heading
-            continue
+            yield _HEADING, s, e
+    if pos < len(markdown):
+        yield (_SKIP if in_tldr else _BODY), pos, len(markdown)
 
-        # remove todas as linhas de heading do count
-        if _is_heading(line):
-            continue
 
-        if not in_tldr:
-            out.append(line)
+def _count(text: str, start: int, end: int) -> int:
+    # conta sem materializar a lista de palavras (memória constante em artigos grandes)
+    return sum(1 for _ in _WORD_RE.finditer(text, start, end))
 
-    return "\n".join(out).strip()
+
+def extract_body(markdown: str) -> str:
+    """
+    Remove: título, TL;DR (seção completa), TODAS as linhas de heading
+    e tudo a partir de '## References' (inclusive).
+    """
+    body = "\n".join(
+        line.rstrip()
+        for kind, s, e in _classify(markdown) if kind == _BODY
+        for line in markdown[s:e].splitlines()
+    )
+    return body.strip()
 
 def count_words(text: str) -> int:
-    return len(_WORD_RE.findall(text))
+    return _count(text, 0, len(text))
 
 def body_word_count(markdown: str) -> int:
-    return count_words(extract_body(markdown))
+    """
+    Palavras do corpo em uma passada, sem montar o texto do corpo: só as linhas de heading
+    são inspecionadas; o texto entre elas é contado direto no Markdown original
+    (nenhuma palavra atravessa linhas).
+    """
+    return sum(_count(markdown, s, e) for kind, s, e in _classify(markdown) if kind == _BODY)
+
+def analyze_body(markdown: str) -> BodyStats:
+    """
+    Como `body_word_count`, mas também devolve as palavras por seção (com offsets no
+    Markdown original) e o offset do heading de referências, na mesma passada.
+    """
+    sections: List[BodySection] = []
+    total = 0
+    heading: Optional[str] = None
+    level = 0
+    sec_start = 0
+    sec_words = 0
+    in_section = True  # False dentro do TL;DR
+    references_at: Optional[int] = None
+
+    def close(end: int) -> None:
+        if in_section and (heading is not None or sec_words):
+            sections.append(BodySection(heading, level, sec_start, end, sec_words))
+
+    for kind, s, e in _classify(markdown):
+        if kind == _BODY:
+            n = _count(markdown, s, e)
+            total += n
+            sec_words += n
+        elif kind == _HEADING:
+            close(s)
+            line = markdown[s:e].strip()
+            stripped = line.lstrip("#")
+            heading, level = stripped.strip(), len(line) - len(stripped)
+            sec_start, sec_words, in_section = s, 0, True
+        elif kind == _REFERENCES:
+            references_at = s
+        elif in_section:  # início do TL;DR
+            close(s)
+            in_section = False
+
+    close(references_at if references_at is not None else len(markdown))
+    return BodyStats(total, tuple(sections), references_at)
 
 
 class BodyWordCountTool(BaseTool):
@@ -79,6 +178,9 @@ class BodyWordCountTool(BaseTool):
 
     def _run(self, markdown: str) -> str:  # type: ignore[override]
         try:
-            return str(body_word_count(markdown))
+            with tracing.span("word_count", "tool", chars=len(markdown)) as sp:
+                words = body_word_count(markdown)
+                sp.set(words=words)
+            return str(words)
         except Exception as e:
             return f"ERROR: {e}"
\ No newline at end of file
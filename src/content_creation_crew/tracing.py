@@ -0,0 +1,400 @@
+"""
+Spans por exec: tasks da crew, chamadas ao LLM, uso de tools, requisições ao
+Wikipedia e contagem de palavras.
+
+- O trace ativo fica num ContextVar: o código da crew e das tools chama `span(...)`
+  / `annotate(...)` sem saber de qual exec faz parte (sem trace ativo é no-op).
+- Chamadas ao LLM e uso de tools vêm dos eventos do CrewAI, que rodam em outra thread;
+  elas são ligadas à exec pelo `task_id` do evento (ver `Trace.register_task`) e usam
+  os timestamps do próprio evento.
+- Exportação opcional para OpenTelemetry (OTLP/HTTP) quando o SDK está instalado e
+  `OTEL_EXPORTER_OTLP_ENDPOINT` (ou `..._TRACES_ENDPOINT`) está definido.
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# limite de spans guardados por exec (os excedentes só são contados)
+MAX_SPANS = 2000
+# por quanto tempo eventos atrasados de uma exec encerrada ainda são aceitos
+LATE_EVENTS_S = 60.0
+
+_CURRENT: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("crew_trace", default=None)
+_PARENT: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("crew_trace_parent", default=None)
+
+
+class Span:
+    __slots__ = ("id", "parent", "name", "kind", "start", "end", "attrs")
+
+    def __init__(self, span_id: int, parent: Optional[int], name: str, kind: str, start: float, attrs: Dict[str, Any]) -> None:
+        self.id = span_id
+        self.parent = parent
+        self.name = name
+        self.kind = kind
+        self.start = start  # epoch (s)
+        self.end: Optional[float] = None
+        self.attrs = attrs
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "parent": self.parent,
+            "name": self.name,
+            "kind": self.kind,
+            "start": round(self.start, 6),
+            "duration_ms": round((self.end - self.start) * 1000, 3) if self.end is not None else None,
+            "attrs": self.attrs,
+        }
+
+
+class _NullSpan:
+    """Span usado quando não há trace ativo."""
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    """
+    Spans de uma exec (thread-safe). `on_change` é chamado quando um span chega
+    depois de `finish()` (eventos atrasados), para quem persistiu o trace regravar.
+    """
+
+    def __init__(self, run_id: str, max_spans: int = MAX_SPANS) -> None:
+        self.run_id = run_id
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self.attrs: Dict[str, Any] = {}  # dados da exec inteira (ex: uso de tokens)
+        self.finished_at: Optional[float] = None
+        self.on_change: Optional[Callable[["Trace"], None]] = None
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def open(self, name: str, kind: str, parent: Optional[Span] = None, start: Optional[float] = None, **attrs: Any) -> Span:
+        """Abre um span (filho de `parent` ou do span corrente do contexto)."""
+        parent = parent if parent is not None else _PARENT.get()
+        with self._lock:
+            span = Span(self._next_id, parent.id if parent else None, name, kind, start or time.time(), attrs)
+            self._next_id += 1
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+        return span
+
+    def close(self, span: Span, end: Optional[float] = None, **attrs: Any) -> None:
+        span.attrs.update(attrs)
+        span.end = end or time.time()
+        if self.finished_at is not None and self.on_change is not None:
+            self.on_change(self)
+
+    def record(self, name: str, kind: str, start: float, end: float, parent: Optional[Span] = None, **attrs: Any) -> Span:
+        """Span já concluído (ex: a partir dos timestamps de um evento)."""
+        span = self.open(name, kind, parent=parent, start=start, **attrs)
+        self.close(span, end)
+        return span
+
+    def register_task(self, task: Any, span: Span) -> None:
+        """Liga o `task.id` do CrewAI a este trace: eventos da task viram filhos de `span`."""
+        with _REGISTRY_LOCK:
+            _prune_registry()
+            _TASKS[str(task.id)] = (self, span)
+
+    def finish(self) -> None:
+        self.finished_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [s.to_dict() for s in self.spans]
+        return {"run_id": self.run_id, "spans": spans, "dropped": self.dropped, "attrs": dict(self.attrs)}
+
+
+# task_id do CrewAI -> (trace, span da task)
+_TASKS: Dict[str, Tuple[Trace, Span]] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _prune_registry() -> None:
+    # chamado com o lock adquirido
+    cutoff = time.time() - LATE_EVENTS_S
+    stale = [tid for tid, (tr, _s) in _TASKS.items() if tr.finished_at is not None and tr.finished_at < cutoff]
+    for tid in stale:
+        del _TASKS[tid]
+
+
+def _lookup(task_id: Optional[str]) -> Optional[Tuple[Trace, Span]]:
+    if not task_id:
+        return None
+    with _REGISTRY_LOCK:
+        return _TASKS.get(task_id)
+
+
+# ---- API usada pela crew/tools ----------------------------------------------------------
+
+def current() -> Optional[Trace]:
+    return _CURRENT.get()
+
+
+@contextmanager
+def activate(trace: Trace) -> Iterator[Trace]:
+    """Torna `trace` o trace ativo no contexto atual (thread da exec)."""
+    token = _CURRENT.set(trace)
+    try:
+        yield trace
+    finally:
+        _CURRENT.reset(token)
+
+
+@contextmanager
+def span(name: str, kind: str, **attrs: Any) -> Iterator[Any]:
+    """
+    Span no trace ativo (no-op sem trace). Spans abertos dentro dele viram filhos.
+    Exceções são registradas em `error` e propagadas.
+    """
+    trace = _CURRENT.get()
+    if trace is None:
+        yield _NULL_SPAN
+        return
+    sp = trace.open(name, kind, **attrs)
+    token = _PARENT.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.set(error=type(e).__name__)
+        raise
+    finally:
+        _PARENT.reset(token)
+        trace.close(sp)
+
+
+def set_parent(sp: Optional[Span]) -> None:
+    """Define o span pai corrente (ex: a task em andamento) no contexto atual."""
+    _PARENT.set(sp)
+
+
+def annotate(**attrs: Any) -> None:
+    """Adiciona atributos ao span corrente, se houver."""
+    sp = _PARENT.get()
+    if sp is not None and _CURRENT.get() is not None:
+        sp.set(**attrs)
+
+
+# ---- eventos do CrewAI ----------------------------------------------------------------
+
+_installed = False
+_install_lock = threading.Lock()
+# chamadas ao LLM em aberto por (task_id, agent_id): início e fim podem chegar em qualquer ordem
+_pending_llm: Dict[Tuple[str, str], Tuple[Deque[Any], Deque[Any]]] = {}
+_pending_lock = threading.Lock()
+
+
+def _chars(messages: Any) -> int:
+    if isinstance(messages, str):
+        return len(messages)
+    if isinstance(messages, list):
+        return sum(len(str(m.get("content") or "")) if isinstance(m, dict) else len(str(m)) for m in messages)
+    return 0
+
+
+def _llm_span(started: Any, ended: Any) -> None:
+    found = _lookup(getattr(started, "task_id", None))
+    if found is None:
+        return
+    trace, parent = found
+    prompt_chars = _chars(started.messages)
+    attrs: Dict[str, Any] = {
+        "model": started.model,
+        "agent": (getattr(started, "agent_role", None) or "").strip() or None,
+        "prompt_chars": prompt_chars,
+        "prompt_tokens_est": prompt_chars // 4,
+    }
+    if getattr(ended, "type", "") == "llm_call_failed":
+        attrs["error"] = str(ended.error)[:300]
+    else:
+        completion_chars = len(str(ended.response or ""))
+        attrs.update(completion_chars=completion_chars, completion_tokens_est=completion_chars // 4)
+    trace.record("llm.call", "llm", started.timestamp.timestamp(), ended.timestamp.timestamp(), parent=parent, **attrs)
+
+
+def _pair_llm(event: Any, is_start: bool) -> None:
+    key = (str(getattr(event, "task_id", "") or ""), str(getattr(event, "agent_id", "") or ""))
+    with _pending_lock:
+        starts, ends = _pending_llm.setdefault(key, (deque(), deque()))
+        other = ends if is_start else starts
+        if not other:
+            (starts if is_start else ends).append(event)
+            return
+        match = other.popleft()
+        if not starts and not ends:
+            del _pending_llm[key]
+    started, ended = (event, match) if is_start else (match, event)
+    _llm_span(started, ended)
+
+
+def install() -> None:
+    """Registra (uma vez por processo) os handlers de eventos do CrewAI que alimentam os traces."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        from crewai.events import (
+            crewai_event_bus,
+            LLMCallCompletedEvent,
+            LLMCallFailedEvent,
+            LLMCallStartedEvent,
+            ToolUsageErrorEvent,
+            ToolUsageFinishedEvent,
+        )
+
+        @crewai_event_bus.on(LLMCallStartedEvent)
+        def _on_llm_started(_source: Any, event: Any) -> None:
+            if _lookup(getattr(event, "task_id", None)):
+                _pair_llm(event, True)
+
+        @crewai_event_bus.on(LLMCallCompletedEvent)
+        def _on_llm_completed(_source: Any, event: Any) -> None:
+            if _lookup(getattr(event, "task_id", None)):
+                _pair_llm(event, False)
+
+        @crewai_event_bus.on(LLMCallFailedEvent)
+        def _on_llm_failed(_source: Any, event: Any) -> None:
+            if _lookup(getattr(event, "task_id", None)):
+                _pair_llm(event, False)
+
+        @crewai_event_bus.on(ToolUsageFinishedEvent)
+        def _on_tool_finished(_source: Any, event: Any) -> None:
+            found = _lookup(event.task_id)
+            if found:
+                trace, parent = found
+                trace.record(
+                    f"tool.{event.tool_name}", "tool",
+                    event.started_at.timestamp(), event.finished_at.timestamp(), parent=parent,
+                    tool=event.tool_name, agent=(event.agent_role or "").strip() or None, from_cache=event.from_cache,
+                    output_chars=len(str(event.output or "")),
+                )
+
+        @crewai_event_bus.on(ToolUsageErrorEvent)
+        def _on_tool_error(_source: Any, event: Any) -> None:
+            found = _lookup(event.task_id)
+            if found:
+                trace, parent = found
+                ts = event.timestamp.timestamp()
+                trace.record(
+                    f"tool.{event.tool_name}", "tool", ts, ts, parent=parent,
+                    tool=event.tool_name, agent=(event.agent_role or "").strip() or None, error=str(event.error)[:300],
+                )
+
+        _installed = True
+
+
+# ---- resumo e exportação ---------------------------------------------------------------
+
+def summarize(spans: List[Dict[str, Any]], top: int = 10) -> Dict[str, Any]:
+    """
+    Totais por tipo de span, por task e por agente, e os spans mais lentos.
+    """
+    by_kind: Dict[str, Dict[str, float]] = {}
+    by_agent: Dict[str, Dict[str, float]] = {}
+    by_id = {s["id"]: s for s in spans}
+    by_task: Dict[str, Dict[str, float]] = {}
+    for s in spans:
+        ms = s.get("duration_ms") or 0.0
+        k = by_kind.setdefault(s["kind"], {"count": 0, "total_ms": 0.0})
+        k["count"] += 1
+        k["total_ms"] = round(k["total_ms"] + ms, 3)
+        agent = (s.get("attrs") or {}).get("agent")
+        if agent and s["kind"] in ("llm", "tool"):
+            a = by_agent.setdefault(agent, {"llm_ms": 0.0, "tool_ms": 0.0})
+            a[f"{s['kind']}_ms"] = round(a[f"{s['kind']}_ms"] + ms, 3)
+        parent = by_id.get(s.get("parent"))
+        if parent and parent["kind"] == "task" and s["kind"] in ("llm", "tool", "wiki"):
+            t = by_task.setdefault(parent["name"], {"llm_ms": 0.0, "tool_ms": 0.0, "wiki_ms": 0.0})
+            t[f"{s['kind']}_ms"] = round(t[f"{s['kind']}_ms"] + ms, 3)
+    slowest = sorted((s for s in spans if s.get("duration_ms") is not None), key=lambda s: -s["duration_ms"])[:top]
+    return {
+        "by_kind": by_kind,
+        "by_task": by_task,
+        "by_agent": by_agent,
+        "slowest": [{"id": s["id"], "name": s["name"], "kind": s["kind"], "duration_ms": s["duration_ms"]} for s in slowest],
+    }
+
+
+_otel_tracer: Any = None
+_otel_lock = threading.Lock()
+
+
+def _get_otel_tracer() -> Any:
+    """Tracer OTLP próprio (não mexe no provider global); None se não configurado/instalado."""
+    global _otel_tracer
+    if _otel_tracer is not None:
+        return _otel_tracer or None
+    with _otel_lock:
+        if _otel_tracer is None:
+            endpoint = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT") or os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+            if not endpoint or os.getenv("OTEL_SDK_DISABLED", "").lower() == "true":
+                _otel_tracer = False
+                return None
+            try:
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+                from opentelemetry.sdk.resources import Resource
+                from opentelemetry.sdk.trace import TracerProvider
+                from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            except ImportError:
+                logger.info("opentelemetry-sdk/otlp exporter not installed; trace export disabled")
+                _otel_tracer = False
+                return None
+            service = os.getenv("OTEL_SERVICE_NAME", "content-creation-crew")
+            provider = TracerProvider(resource=Resource.create({"service.name": service}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            _otel_tracer = provider.get_tracer("content_creation_crew")
+    return _otel_tracer or None
+
+
+def export_otel(trace_data: Dict[str, Any]) -> bool:
+    """
+    Envia os spans de um trace (formato de `Trace.to_dict`) ao coletor OTLP, sob um span raiz
+    `crew.run`. Retorna False quando a exportação não está configurada.
+    """
+    tracer = _get_otel_tracer()
+    spans = trace_data.get("spans") or []
+    if tracer is None or not spans:
+        return False
+    from opentelemetry import trace as otel_trace
+
+    def ns(seconds: float) -> int:
+        return int(seconds * 1e9)
+
+    start = min(s["start"] for s in spans)
+    end = max(s["start"] + (s.get("duration_ms") or 0) / 1000 for s in spans)
+    root = tracer.start_span("crew.run", start_time=ns(start), attributes={"run_id": trace_data.get("run_id", "")})
+    created: Dict[int, Any] = {}
+    for s in sorted(spans, key=lambda s: (s["start"], s["id"])):
+        parent = created.get(s.get("parent")) or root
+        attrs = {k: v for k, v in (s.get("attrs") or {}).items() if isinstance(v, (str, bool, int, float))}
+        attrs["kind"] = s["kind"]
+        otel_span = tracer.start_span(
+            s["name"], context=otel_trace.set_span_in_context(parent),
+            start_time=ns(s["start"]), attributes=attrs,
+        )
+        created[s["id"]] = otel_span
+    for s in spans:
+        created[s["id"]].end(end_time=ns(s["start"] + (s.get("duration_ms") or 0) / 1000))
+    root.end(end_time=ns(end))
+    return True
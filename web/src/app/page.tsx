@@ -1,20 +1,27 @@
 "use client";
 
 import { useEffect, useRef, useState } from "react";
-import { API_BASE, createRun, getResult, getStatus } from "@/lib/api";
+import { API_BASE, cancelRun, createRun, getResult, getStatus } from "@/lib/api";
 
 type Data = {
-  status?: "queued" | "running" | "finished" | "failed";
+  status?: "queued" | "running" | "finished" | "failed" | "cancelled";
+  step?: string | null;
   error?: string;
 };
 
+// etapas da crew, na ordem (para a barra de progresso)
+const STEPS = ["research", "writing", "editing", "enforce_min_words"];
+
 export default function OnePageApp() {
   const [question, setQuestion] = useState("");  // pergunta do user
   const [runId, setRunId] = useState<string | null>(null);  // ID
   const [status, setStatus] = useState<Data>({});  // status
   const [answer, setAnswer] = useState<string>("");  // resposta gerada
   const [busy, setBusy] = useState(false);  // se a aplicacao esta ocupada processando
+  const [activity, setActivity] = useState<string>("");  // ultima tool chamada pelos agentes
+  const [streaming, setStreaming] = useState(false);  // resposta ainda sendo gerada pelo editor
   const esRef = useRef<EventSource | null>(null);  // ref para sse
+  const draftRef = useRef<string>("");  // artigo parcial montado com os eventos "token"
 
   // Fecha a SSE quando o componente for desmontado
   useEffect(() => {
@@ -29,7 +36,10 @@ export default function OnePageApp() {
     if (!question.trim()) return; 
     setBusy(true);  // ocupado enquanto processa
     setAnswer("");  // Limpa a resposta anterior
+    setStreaming(false);
+    draftRef.current = "";
     setStatus({ status: "queued" }); 
+    setActivity("");
     setRunId(null);  
 
     try {
@@ -55,12 +65,50 @@ export default function OnePageApp() {
           
             getResult(run_id)
               .then((r) => setAnswer(r.markdown))
-              .catch(() => {});
+              .catch(() => {})
+              .finally(() => setStreaming(false));
             es.close();  // Fecha SSE quando concluido
           }
-          if (d.status === "failed") {
-            es.close();  // Fecha SSE se falhar
+          if (d.status === "failed" || d.status === "cancelled") {
+            setStreaming(false);
+            es.close();  // Fecha SSE se falhar ou for cancelada
+          }
+        } catch {
+        }
+      });
+
+      // tool chamada por um agente
+      es.addEventListener("tool", (ev) => {
+        try {
+          const d = JSON.parse((ev as MessageEvent).data) as { tool: string };
+          setActivity(d.tool);
+        } catch {
+        }
+      });
+
+      // trecho do artigo em geracao: `offset` 0 recomeca o texto (ex: expansao do corpo)
+      es.addEventListener("token", (ev) => {
+        try {
+          const d = JSON.parse((ev as MessageEvent).data) as { text: string; offset: number };
+          const draft = draftRef.current;
+          if (d.offset === 0 || d.offset === draft.length) {
+            draftRef.current = draft.slice(0, d.offset) + d.text;
+          } else if (d.offset < draft.length) {
+            return;  // trecho repetido (reconexao)
+          } else {
+            // trechos perdidos: busca o parcial gravado no servidor
+            getResult(run_id)
+              .then((r) => {
+                if (r.partial && r.markdown.length > draftRef.current.length) {
+                  draftRef.current = r.markdown;
+                  setAnswer(r.markdown);
+                }
+              })
+              .catch(() => {});
+            return;
           }
+          setStreaming(true);
+          setAnswer(draftRef.current);
         } catch {
         }
       });
@@ -74,6 +122,15 @@ export default function OnePageApp() {
     }
   }
 
+  // cancelar a exec em andamento (libera o worker e o LLM)
+  async function onCancel() {
+    if (!runId) return;
+    try {
+      setStatus(await cancelRun(runId));
+    } catch {
+    }
+  }
+
   const shortId = runId ? runId.slice(0, 8) : "";  // primeiros 8 caracteres do ID da exec
 
   return (
@@ -105,12 +162,25 @@ export default function OnePageApp() {
         <section className="space-y-2">
           <div className="flex items-center justify-between">
             <h2 className="font-medium">Status</h2>
-            <span className="text-xs text-gray-500">ID {shortId}…</span>
+            <span className="text-xs text-gray-500">
+              ID {shortId}…
+              {(status.status === "queued" || status.status === "running") && (
+                <button onClick={onCancel} className="ml-3 underline">
+                  Cancel
+                </button>
+              )}
+            </span>
           </div>
           <div className="text-sm">
             <p>
               <b>Status:</b> {status.status || "—"}  {/* status */}
             </p>
+            {status.status === "running" && status.step && (
+              <p>
+                <b>Step:</b> {status.step}
+                {activity && <span className="opacity-70"> · {activity}</span>}
+              </p>
+            )}
             {status.error && (
               <p className="text-red-600">Error: {status.error}</p>  
             )}
@@ -127,7 +197,7 @@ export default function OnePageApp() {
                   status.status === "finished"
                     ? "100%"  
                     : status.status === "running"
-                    ? "50%"  
+                    ? `${Math.round(((STEPS.indexOf(status.step || "") + 1) / (STEPS.length + 1)) * 100) || 20}%`
                     : "10%",  
               }}
             />
@@ -137,7 +207,10 @@ export default function OnePageApp() {
 
       {/* Resposta final */}
       <section className="space-y-2">
-        <h2 className="font-medium">Answer</h2>
+        <h2 className="font-medium">
+          Answer
+          {streaming && <span className="ml-2 text-xs font-normal opacity-70">writing…</span>}
+        </h2>
         {answer ? (
           <textarea
             className="w-full h-96 border rounded-lg p-3 font-mono text-sm"
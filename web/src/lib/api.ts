@@ -1,14 +1,27 @@
 export const API_BASE = process.env.NEXT_PUBLIC_API_BASE || "http://127.0.0.1:8000";
 
-export type RunCreateReq = { topic: string; use_wikipedia?: boolean };
-export type RunCreateRes = { run_id: string };
+export type AgentLLMSettings = { model?: string; context_window?: number; max_tokens?: number };
+export type RunCreateReq = {
+  topic: string;
+  use_wikipedia?: boolean;
+  force_refresh?: boolean;
+  agent_models?: Partial<Record<"researcher" | "writer" | "editor", AgentLLMSettings>>;
+};
+export type RunCreateRes = {
+  run_id: string;
+  queue_position?: number | null;
+  cached?: boolean;  // resultado reaproveitado de uma exec ja concluida
+  coalesced?: boolean;  // juntou-se a uma exec igual em andamento
+};
 export type RunStatus = {
   run_id: string;
-  status: "queued" | "running" | "finished" | "failed";
-  step?: "research" | "writing" | "editing";
+  status: "queued" | "running" | "finished" | "failed" | "cancelled";
+  step?: "research" | "writing" | "editing" | "enforce_min_words" | null;
+  queue_position?: number | null;
   error?: string;
+  error_type?: string | null;  // classe do erro (ex: "RunTimedOut")
 };
-export type RunResult = { run_id: string; markdown: string };
+export type RunResult = { run_id: string; markdown: string; word_count?: number | null; partial?: boolean };
 
 export async function createRun(body: RunCreateReq): Promise<RunCreateRes> {
   const r = await fetch(`${API_BASE}/runs`, {
@@ -16,6 +29,7 @@ export async function createRun(body: RunCreateReq): Promise<RunCreateRes> {
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify(body),
   });
+  if (r.status === 429) throw new Error("Server is busy, please try again in a moment");
   if (!r.ok) throw new Error(`POST /runs ${r.status}`);
   return r.json();
 }
@@ -26,6 +40,12 @@ export async function getStatus(runId: string): Promise<RunStatus> {
   return r.json();
 }
 
+export async function cancelRun(runId: string): Promise<RunStatus> {
+  const r = await fetch(`${API_BASE}/runs/${runId}`, { method: "DELETE" });
+  if (!r.ok) throw new Error(`DELETE /runs/${runId} ${r.status}`);
+  return r.json();
+}
+
 export async function getResult(runId: string): Promise<RunResult> {
   const r = await fetch(`${API_BASE}/runs/${runId}/result`, { cache: "no-store" });
   if (!r.ok) throw new Error(`GET /runs/${runId}/result ${r.status}`);